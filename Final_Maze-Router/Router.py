@@ -1,47 +1,108 @@
+from concurrent.futures import ProcessPoolExecutor
 from heapq import heappop, heappush
-import sys  # For argc and argv
+from multiprocessing import shared_memory
+import argparse
+import logging
+import sys
+import time
+
+NET_ORDERINGS = ("length", "hpwl", "pins", "congestion")  # See MazeRouter.sort_nets
+
+log = logging.getLogger("maze_router")  # Summary at INFO, per-net/per-segment detail at DEBUG
 
 
 class MazeRouter:
     def __init__(self, grid_width, grid_height, bend_penalty, via_penalty):
-        print(f"Initializing MazeRouter with grid {grid_width}x{grid_height}, "
-              f"bend_penalty={bend_penalty}, via_penalty={via_penalty}")
+        log.debug("Initializing MazeRouter with grid %dx%d, bend_penalty=%s, via_penalty=%s",
+                  grid_width, grid_height, bend_penalty, via_penalty)
         self.grid_width = grid_width
         self.grid_height = grid_height
         self.bend_penalty = bend_penalty
         self.via_penalty = via_penalty
         self.initial_obstacles = set()  # To store original obstacles
-        self.obstacles = set()  # Set of tuples (layer, x, y)
-        self.used_pins = set()  # Set of pins used by other nets
+        # Base layer: one byte per cell (1 = blocked), written only by add_obstacle
+        self.base_grid = bytearray(2 * grid_width * grid_height)
+        # Overlay of routed cells on top of it, undone through the journal
+        self.overlay = bytearray(2 * grid_width * grid_height)
+        self.journal = []  # Overlay indices in the order they were claimed
+        self.net_spans = {}  # net_name -> (start, end) of its entries in the journal
         self.total_cost = 0  # Total routing cost
         self.total_wire_length = 0  # Total wire length
         self.longest_route_length = 0  # Length of the longest routed net
         self.total_vias = 0  # Total number of vias used
         self.net_costs = {}  # Dictionary to store costs of successfully routed nets
+        self.workers = 1  # Processes used by calculate_net_lengths
+        self.net_order = "length"  # Sort key for the routing order, one of NET_ORDERINGS
+        self.sort_order = "asc"  # "asc" or "desc"
 
     def add_obstacle(self, layer, x, y):
-        print(f"Adding obstacle at layer={layer}, ({x}, {y})")
-        self.obstacles.add((layer, x, y))
+        log.debug("Adding obstacle at layer=%d, (%d, %d)", layer, x, y)
+        if not (0 <= layer < 2 and 0 <= x < self.grid_width and 0 <= y < self.grid_height):
+            raise ValueError(f"obstacle ({layer}, {x}, {y}) is outside the "
+                             f"2x{self.grid_width}x{self.grid_height} grid")
+        self.base_grid[(layer * self.grid_height + y) * self.grid_width + x] = 1
         self.initial_obstacles.add((layer, x, y))  # Track initial obstacles
 
     def reset_state(self):
-        """Reset the router's state to its initial configuration."""
-        self.obstacles = self.initial_obstacles.copy()
-        self.used_pins = set()
+        """Reset the router's state to its initial configuration.
+
+        Only the overlay cells claimed since the last reset are cleared, so
+        the cost is the size of the routed nets, not of the design.
+        """
+        self.rollback(0)
         self.total_cost = 0
         self.total_wire_length = 0
         self.longest_route_length = 0
         self.total_vias = 0
 
+    def claim(self, pin):
+        """Mark a routed cell as used in the overlay and journal it."""
+        index = (pin[0] * self.grid_height + pin[2]) * self.grid_width + pin[1]
+        if not self.overlay[index]:
+            self.overlay[index] = 1
+            self.journal.append(index)
+
+    def checkpoint(self):
+        """Journal position to pass to rollback(); routing after it can be undone."""
+        return len(self.journal)
+
+    def rollback(self, mark):
+        """Free every cell claimed after checkpoint mark, newest first, and forget the nets routed since."""
+        journal = self.journal
+        overlay = self.overlay
+        while len(journal) > mark:
+            overlay[journal.pop()] = 0
+        for net_name, (start, end) in list(self.net_spans.items()):
+            if start >= mark:
+                del self.net_spans[net_name]
+            elif end > mark:
+                self.net_spans[net_name] = (start, mark)
+
+    def rip_up(self, net_name):
+        """Free the cells of one routed net, leaving every other net in place.
+
+        Its journal entries stay so the spans of later nets keep their
+        positions. A rollback() only reaches them after undoing every net
+        claimed since, so freeing them again then is harmless.
+        """
+        start, end = self.net_spans.pop(net_name)
+        overlay = self.overlay
+        for index in self.journal[start:end]:
+            overlay[index] = 0
+
+    def obstacle_buffer(self):
+        """Initial obstacles as one byte per cell (1 = blocked) at layer*W*H + y*W + x."""
+        return self.base_grid
+
     def is_valid(self, layer, x, y):
         """Check if the given position is valid for routing (not out of bounds or blocked)."""
-        return (0 <= x < self.grid_width and
-                0 <= y < self.grid_height and
-                (layer, x, y) not in self.obstacles and
-                (layer, x, y) not in self.used_pins)
+        if not (0 <= x < self.grid_width and 0 <= y < self.grid_height):
+            return False
+        index = (layer * self.grid_height + y) * self.grid_width + x
+        return not self.base_grid[index] and not self.overlay[index]
 
     def bfs(self, start, end):
-        print(f"Running BFS from {start} to {end}")
+        log.debug("Running BFS from %s to %s", start, end)
         directions = [
             (0, 1),  # Right
             (0, -1),  # Left
@@ -58,7 +119,7 @@ class MazeRouter:
 
             if current == end:
                 # Successfully routed the segment
-                print(f"Segment successfully routed with cost: {current_cost_segment}")
+                log.debug("Segment successfully routed with cost: %d", current_cost_segment)
 
                 # Backtrack to construct the path
                 path = []
@@ -67,7 +128,7 @@ class MazeRouter:
                     current = came_from[current]
                 path.reverse()
                 for pin in path:
-                    self.obstacles.add(pin)
+                    self.claim(pin)
                 # Return the cost for this segment
                 return path, current_cost_segment
 
@@ -100,7 +161,7 @@ class MazeRouter:
                             heappush(queue, (new_cost, neighbor, last_direction))
                             came_from[neighbor] = current
 
-        print(f"Failed to route from {start} to {end}")
+        log.debug("Failed to route from %s to %s", start, end)
         return None, None  # No path found
 
     def route_net(self, net_name, pins):
@@ -109,12 +170,13 @@ class MazeRouter:
         path = []
         current_net_cost = 0  # Track cost for the current net independently
         self.net_costs[net_name] = 0
+        start_mark = self.checkpoint()
         for i in range(len(pins) - 1):
             start = pins[i]
             end = pins[i + 1]
             segment, segment_cost = self.bfs(start, end)
             if segment is None:
-                print(f"Failed to route segment from {start} to {end}")
+                log.debug("Failed to route segment from %s to %s", start, end)
                 failed = True
                 return None  # Abort routing for this net if any segment fails
             path.extend(segment[:-1])  # Avoid duplication
@@ -128,47 +190,102 @@ class MazeRouter:
         self.total_vias += sum(1 for (layer1, _, _), (layer2, _, _) in zip(path, path[1:]) if layer1 != layer2)
 
         # Mark all visited points as used
-        self.used_pins.update(path)
-        self.obstacles.update(path)
+        for pin in path:
+            self.claim(pin)
+        self.net_spans[net_name] = (start_mark, self.checkpoint())
 
         if not failed:
         # Save the cost of the successfully routed net
             self.net_costs[net_name] = current_net_cost
-        print(f"Net {net_name} successfully routed. Current net cost: {current_net_cost}")
+        log.debug("Net %s successfully routed. Current net cost: %d", net_name, current_net_cost)
         return path
 
     def calculate_total_cost(self):
         """Recalculate total cost as the sum of successfully routed net costs."""
         self.total_cost = sum(self.net_costs.values())
-        print(f"Total cost recalculated: {self.total_cost}")
+        log.debug("Total cost recalculated: %d", self.total_cost)
 
     def calculate_net_lengths(self, nets):
-        """Calculate the length of each net independently and return sorted nets."""
-        net_lengths = []
-        for net_name, pins in nets.items():
-            self.reset_state()  # Reset to original state
-            path = self.route_net(net_name, pins)  # Pass both net_name and pins
-            if path:
-                net_lengths.append((net_name, pins, len(path) - 1))  # Store name, pins, and length
+        """Calculate the length of each net independently and return sorted nets.
+
+        With more than one worker the nets are routed in a process pool. The
+        obstacle grid is handed over once through shared memory, so each task
+        only carries a net name and its pins.
+        """
+        if self.workers > 1 and len(nets) > 1:
+            net_lengths = self._parallel_net_lengths(nets)
+        else:
+            net_lengths = []
+            for net_name, pins in nets.items():
+                self.reset_state()  # Reset to original state
+                path = self.route_net(net_name, pins)  # Pass both net_name and pins
+                if path:
+                    net_lengths.append((net_name, pins, len(path) - 1))  # Store name, pins, and length
         return sorted(net_lengths, key=lambda x: x[2])  # Sort by length
 
+    def _parallel_net_lengths(self, nets):
+        buffer = self.obstacle_buffer()
+        shm = shared_memory.SharedMemory(create=True, size=max(len(buffer), 1))
+        try:
+            shm.buf[:len(buffer)] = buffer
+            workers = min(self.workers, len(nets))
+            settings = (shm.name, self.grid_width, self.grid_height, self.bend_penalty, self.via_penalty)
+            with ProcessPoolExecutor(max_workers=workers, initializer=_init_length_worker,
+                                     initargs=settings) as pool:
+                results = pool.map(_route_net_length, nets.keys(), nets.values(),
+                                   chunksize=max(1, len(nets) // (4 * workers)))
+                return [result for result in results if result is not None]
+        finally:
+            shm.close()
+            shm.unlink()
+
+    def sort_nets(self, nets):
+        """Return [(net_name, pins, key)] in routing order for self.net_order and self.sort_order.
+
+        "length" routes every net alone (calculate_net_lengths) and drops the
+        nets that cannot be routed even then. The other orderings are
+        estimates that need no routing: half-perimeter wirelength, pin count,
+        or the share of blocked cells in the net's bounding box. Ties between
+        them go to the net needing fewer layer changes between its pins.
+        """
+        if self.net_order == "length":
+            sorted_nets = self.calculate_net_lengths(nets)
+            if self.sort_order == "desc":
+                sorted_nets.sort(key=lambda x: x[2], reverse=True)
+            return sorted_nets
+
+        if self.net_order == "hpwl":
+            estimate = net_hpwl
+        elif self.net_order == "pins":
+            estimate = len
+        elif self.net_order == "congestion":
+            buffer = self.obstacle_buffer()
+            estimate = lambda pins: net_congestion(pins, buffer, self.grid_width, self.grid_height)
+        else:
+            raise ValueError(f"unknown net ordering {self.net_order!r}, expected one of {NET_ORDERINGS}")
+        keyed = [(net_name, pins, estimate(pins), net_layer_changes(pins)) for net_name, pins in nets.items()]
+        keyed.sort(key=lambda x: (x[2], x[3]), reverse=self.sort_order == "desc")
+        return [(net_name, pins, key) for net_name, pins, key, _ in keyed]
+
     def route_all_sorted_nets(self, sorted_nets):
         """Route all nets in the order provided."""
         self.reset_state()
         routed_paths = []
         for net_name, pins in sorted_nets:
-            print(f"Routing sorted net: {net_name}")
+            log.debug("Routing sorted net: %s", net_name)
             path = self.route_net(net_name, pins)  # Pass both net_name and pins
             if path:
                 routed_paths.append((net_name, path))
             else:
-                print(f"Failed to route net: {net_name}")
+                log.debug("Failed to route net: %s", net_name)
         return routed_paths
 
     def generate_output(self, nets, output_file):
         """Generate the output file with routing results."""
-        print("Calculating net lengths and sorting them...")
-        sorted_nets = self.calculate_net_lengths(nets)
+        log.debug("Sorting nets by %s (%s)...", self.net_order, self.sort_order)
+        started = time.perf_counter()
+        sorted_nets = self.sort_nets(nets)
+        ordering_time = time.perf_counter() - started
 
         with open(output_file, 'w') as f:
             # Write grid info
@@ -179,7 +296,9 @@ class MazeRouter:
                 f.write(f"OBS({layer}, {x}, {y})\n")
 
             # Route sorted nets
+            started = time.perf_counter()
             routed_paths = self.route_all_sorted_nets([(net_name, pins) for net_name, pins, _ in sorted_nets])
+            routing_time = time.perf_counter() - started
             for net_name, path in routed_paths:
                 f.write(f"{net_name} ")
                 for (layer, x, y) in path:
@@ -189,14 +308,69 @@ class MazeRouter:
             self.calculate_total_cost()
             # Write summary
             f.write("\nSummary:\n")
-            f.write(f"Sorted nets by length:\n")
-            for net_name, _, length in sorted_nets:
-                f.write(f"{net_name}: {length}\n")
+            f.write(f"Sorted nets by {self.net_order}:\n")
+            for net_name, _, key in sorted_nets:
+                f.write(f"{net_name}: {key:.3f}\n" if isinstance(key, float) else f"{net_name}: {key}\n")
             f.write(f"Total cost of routing: {self.total_cost}\n")
             f.write(f"Total wire length: {self.total_wire_length}\n")
             f.write(f"Longest route length: {self.longest_route_length}\n")
             f.write(f"Total vias used: {self.total_vias}\n")
 
+        log.info("Nets routed: %d of %d", len(routed_paths), len(nets))
+        log.info("Total cost of routing: %d", self.total_cost)
+        log.info("Total wire length: %d", self.total_wire_length)
+        log.info("Longest route length: %d", self.longest_route_length)
+        log.info("Total vias used: %d", self.total_vias)
+        log.info("Net ordering by %s (%s): %.3f s, routing: %.3f s",
+                 self.net_order, self.sort_order, ordering_time, routing_time)
+
+
+def net_hpwl(pins):
+    """Half-perimeter wirelength of the pins' bounding box."""
+    xs = [x for _, x, _ in pins]
+    ys = [y for _, _, y in pins]
+    return (max(xs) - min(xs)) + (max(ys) - min(ys))
+
+
+def net_layer_changes(pins):
+    """Number of consecutive pin pairs on different layers, i.e. vias the net needs at least."""
+    return sum(1 for (layer1, _, _), (layer2, _, _) in zip(pins, pins[1:]) if layer1 != layer2)
+
+
+def net_congestion(pins, buffer, grid_width, grid_height):
+    """Share of blocked cells (both layers) inside the pins' bounding box, from obstacle_buffer()."""
+    x1 = min(x for _, x, _ in pins)
+    x2 = max(x for _, x, _ in pins)
+    y1 = min(y for _, _, y in pins)
+    y2 = max(y for _, _, y in pins)
+    blocked = 0
+    for layer in range(2):
+        for y in range(y1, y2 + 1):
+            row = (layer * grid_height + y) * grid_width
+            blocked += buffer.count(1, row + x1, row + x2 + 1)
+    return blocked / (2 * (x2 - x1 + 1) * (y2 - y1 + 1))
+
+
+_worker_router = None  # Router of a calculate_net_lengths worker process
+_worker_memory = None  # Keeps the worker's view of the shared obstacle grid alive
+
+
+def _init_length_worker(shm_name, grid_width, grid_height, bend_penalty, via_penalty):
+    """Process pool initializer: build a router on top of the shared obstacle grid."""
+    global _worker_router, _worker_memory
+    _worker_memory = shared_memory.SharedMemory(name=shm_name)  # Unlinked by the parent
+    _worker_router = MazeRouter(grid_width, grid_height, bend_penalty, via_penalty)
+    _worker_router.base_grid = _worker_memory.buf
+
+
+def _route_net_length(net_name, pins):
+    """Route one net on the bare obstacle grid; return (name, pins, length) or None."""
+    _worker_router.reset_state()
+    path = _worker_router.route_net(net_name, pins)
+    if path:
+        return net_name, pins, len(path) - 1
+    return None
+
 
 def parse_input(input_file):
     nets = {}
@@ -221,16 +395,30 @@ def parse_input(input_file):
                     pins = [tuple(map(int, part.split(')')[0].split(','))) for part in parts[1:]]
                     nets[net_name] = pins
     except Exception as e:
-        print(f"Error parsing input file: {e}")
+        log.error("Error parsing input file: %s", e)
         return None, None
     return router, nets
 
 
 if __name__ == "__main__":
-    if len(sys.argv) < 3:
-        print("Usage: python3 maze_router.py <input_file> <output_file>")
-        sys.exit(1)
-    input_file, output_file = sys.argv[1:3]
-    router, nets = parse_input(input_file)
+    parser = argparse.ArgumentParser(description="Route nets in order of their stand-alone length.")
+    parser.add_argument("input_file")
+    parser.add_argument("output_file")
+    parser.add_argument("sort_order", nargs="?", choices=("asc", "desc"),
+                        help="same as --order, kept for the original command line")
+    parser.add_argument("--order", choices=("asc", "desc"), default="asc",
+                        help="route nets from the smallest key up (asc) or the largest down (desc)")
+    parser.add_argument("--sort-by", choices=NET_ORDERINGS, default="length",
+                        help="length: route each net alone first (slow); hpwl, pins, congestion: estimates, no routing")
+    parser.add_argument("-j", "--workers", type=int, default=1,
+                        help="processes for the net length pass (default 1; try the CPU count for many nets)")
+    parser.add_argument("-v", "--verbose", action="store_true", help="log every net and segment")
+    args = parser.parse_args()
+    logging.basicConfig(level=logging.DEBUG if args.verbose else logging.INFO,
+                        format="%(message)s", stream=sys.stdout)
+    router, nets = parse_input(args.input_file)
     if router and nets:
-        router.generate_output(nets, output_file)
\ No newline at end of file
+        router.workers = args.workers
+        router.net_order = args.sort_by
+        router.sort_order = args.sort_order or args.order
+        router.generate_output(nets, args.output_file)
\ No newline at end of file
@@ -1,10 +1,13 @@
 from heapq import heappop, heappush
+import logging
+
+log = logging.getLogger("maze_router")  # Summary at INFO, per-net/per-segment detail at DEBUG
 
 
 class MazeRouter:
     def _init_(self, grid_width, grid_height, bend_penalty, via_penalty):
-        print(f"Initializing MazeRouter with grid {grid_width}x{grid_height}, "
-              f"bend_penalty={bend_penalty}, via_penalty={via_penalty}")
+        log.debug("Initializing MazeRouter with grid %dx%d, bend_penalty=%s, via_penalty=%s",
+                  grid_width, grid_height, bend_penalty, via_penalty)
         self.grid_width = grid_width
         self.grid_height = grid_height
         self.bend_penalty = bend_penalty
@@ -14,7 +17,7 @@ class MazeRouter:
         self.total_cost = 0  # To store total cost for all routes
 
     def add_obstacle(self, layer, x, y):
-        print(f"Adding obstacle at layer={layer}, ({x}, {y})")
+        log.debug("Adding obstacle at layer=%d, (%d, %d)", layer, x, y)
         self.obstacles.add((layer, x, y))
 
     def is_valid(self, layer, x, y):
@@ -25,7 +28,7 @@ class MazeRouter:
         return valid
 
     def bfs(self, start, end):
-        print(f"Running BFS from {start} to {end}")
+        log.debug("Running BFS from %s to %s", start, end)
         directions = [
             (0, 1),  # Right
             (0, -1),  # Left
@@ -42,7 +45,7 @@ class MazeRouter:
 
             if current == end:
                 self.total_cost += current_cost  # Update total cost
-                print(f"Total cost: {self.total_cost}")
+                log.debug("Total cost: %d", self.total_cost)
 
                 # Backtrack to construct the path
                 path = [end]
@@ -100,7 +103,7 @@ class MazeRouter:
             end = pins[i + 1]
             segment = self.bfs(start, end)
             if segment is None:
-                print(f"Failed to route segment from {start} to {end}")
+                log.debug("Failed to route segment from %s to %s", start, end)
                 return None  # If any segment fails, the whole net fails
             path.extend(segment[:-1])  # Append all but the last point to avoid duplication
         path.append(pins[-1])  # Add the last pin's coordinates
@@ -111,18 +114,18 @@ class MazeRouter:
     def generate_output(self, nets, output_file):
         with open(output_file, 'w') as f:
             for net_name, pins in nets.items():
-                print(f"Routing net: {net_name}")
+                log.debug("Routing net: %s", net_name)
                 path = self.route_net(pins)
                 if path:
                     f.write(f"{net_name} ")
                     for (layer, x, y) in path:
                         f.write(f"({layer}, {x}, {y}) ")
                     f.write("\n")
-                    print(f"Net {net_name} routed successfully.")
+                    log.debug("Net %s routed successfully.", net_name)
                 else:
                     f.write(f"{net_name} failed to route.\n")
-                    print(f"Failed to route net: {net_name}")
-        print(f"Total cost of routing: {self.total_cost}")
+                    log.debug("Failed to route net: %s", net_name)
+        log.info("Total cost of routing: %d", self.total_cost)
 
 
 def parse_input(input_file):
@@ -159,7 +162,7 @@ def parse_input(input_file):
         return router, nets
 
     except Exception as e:
-        print(f"Error while parsing input file: {e}")
+        log.error("Error while parsing input file: %s", e)
         return None, {}
 
 
@@ -167,15 +170,16 @@ def main():
     input_file = r'C:\Users\ae912\OneDrive\Desktop\DSP\pythonProject\input.txt'
     output_file = r'C:\Users\ae912\OneDrive\Desktop\DSP\pythonProject\output.txt'
 
-    print("Starting routing process...")
+    log.debug("Starting routing process...")
     router, nets = parse_input(input_file)
 
     if router and nets:
         router.generate_output(nets, output_file)
-        print(f"Routing completed. Output saved to {output_file}")
+        log.info("Routing completed. Output saved to %s", output_file)
     else:
-        print("Failed to initialize router or parse nets. Exiting...")
+        log.error("Failed to initialize router or parse nets. Exiting...")
 
 
 if __name__ == "__main__":
-    main()
+    logging.basicConfig(level=logging.INFO, format="%(message)s")
+    main()
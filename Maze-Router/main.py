@@ -1,7 +1,7 @@
 from collections import deque
 
 class MazeRouter:
-    def _init_(self, grid_width, grid_height, bend_penalty, via_penalty):
+    def __init__(self, grid_width, grid_height, bend_penalty, via_penalty):
         print(f"Initializing MazeRouter with grid {grid_width}x{grid_height}, "
               f"bend_penalty={bend_penalty}, via_penalty={via_penalty}")
         self.grid_width = grid_width
@@ -3,21 +3,23 @@ from collections import deque
 
 
 class MazeRouter:
-    def _init_(self, grid_width, grid_height, bend_penalty, via_penalty):
-        print(f"Initializing MazeRouter with grid {grid_width}x{grid_height}, "
+    def __init__(self, grid_width, grid_height, bend_penalty, via_penalty, layers=2):
+        print(f"Initializing MazeRouter with grid {grid_width}x{grid_height}x{layers}, "
               f"bend_penalty={bend_penalty}, via_penalty={via_penalty}")
         self.grid_width = grid_width
         self.grid_height = grid_height
         self.bend_penalty = bend_penalty
         self.via_penalty = via_penalty
         self.obstacles = set()  # Set of tuples (layer, x, y)
+        self.layers = layers  # Vias only join adjacent layers of the stack
 
     def add_obstacle(self, layer, x, y):
         print(f"Adding obstacle at layer={layer}, ({x}, {y})")
         self.obstacles.add((layer, x, y))
 
     def is_valid(self, layer, x, y):
-        valid = (0 <= x < self.grid_width and
+        valid = (0 <= layer < self.layers and
+                 0 <= x < self.grid_width and
                  0 <= y < self.grid_height and
                  (layer, x, y) not in self.obstacles)
         return valid
@@ -55,16 +57,15 @@ class MazeRouter:
                         came_from[neighbor] = current
 
 
-            for new_layer in range(3):  #  3 layers only
-                if new_layer != layer:
-                    neighbor = (new_layer, x, y)
-                    if self.is_valid(*neighbor):
-                        new_cost = current_cost + self.via_penalty
-                        if neighbor not in cost_so_far or new_cost < cost_so_far[neighbor]:
-                            cost_so_far[neighbor] = new_cost
-                            priority = new_cost
-                            heappush(queue, (priority, neighbor))
-                            came_from[neighbor] = current
+            for new_layer in (layer - 1, layer + 1):  # Adjacent layers only, is_valid() drops the missing one
+                neighbor = (new_layer, x, y)
+                if self.is_valid(*neighbor):
+                    new_cost = current_cost + self.via_penalty
+                    if neighbor not in cost_so_far or new_cost < cost_so_far[neighbor]:
+                        cost_so_far[neighbor] = new_cost
+                        priority = new_cost
+                        heappush(queue, (priority, neighbor))
+                        came_from[neighbor] = current
 
         return None  # If no path is found
 
@@ -107,9 +108,11 @@ def parse_input(input_file):
             grid_info = f.readline().strip()
             grid_info = grid_info.split(', ')
             grid_width, grid_height = map(int, grid_info[:2])
-            bend_penalty, via_penalty = map(int, grid_info[2:])
+            bend_penalty, via_penalty = map(int, grid_info[2:4])
+            # The header of Router.py: an optional layer count follows, the preferred directions are not used here
+            layers = int(grid_info[4]) if len(grid_info) > 4 else 2
 
-            router = MazeRouter(grid_width, grid_height, bend_penalty, via_penalty)
+            router = MazeRouter(grid_width, grid_height, bend_penalty, via_penalty, layers)
 
             for line in f:
                 line = line.strip()
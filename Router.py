@@ -1,209 +1,1281 @@
-from heapq import heappop, heappush
-import sys  # For argc and argv
+from array import array
+import argparse
+import json
+import logging
+import mmap
+import os
+import sys
+import warnings
+
+try:
+    import numpy
+except ImportError:  # Optional: only speeds up bulk input decoding
+    numpy = None
+
+from frontier import FRONTIERS, choose_frontier
+from negotiation import Negotiation
+from output_writer import WRITERS, compress_path, expand_runs
+import parallel
+import snapshot
+import wavefront
+from distance_cache import DistanceCache, explored_box, settled_search
+from global_routing import DEFAULT_GLOBAL_HALO, GlobalRouting
+from routing_grid import RoutingGrid, FREE, BLOCKED
+from search_stats import SearchStats, cprofile_hook
+from tiled import DEFAULT_HALO, MappedGrid, TiledRouting
+
+NO_DIRECTION = 4  # Incoming direction of the start state (directions are 0-3)
+STATES_PER_CELL = 5  # Search states per grid cell: one per incoming direction
+FROM_START = 255  # came_from code of the start state
+VIA_FROM_LAYER = 5  # came_from code base for a via; code - VIA_FROM_LAYER is the source layer
+UNREACHED = 2 ** 31 - 1  # cost_so_far of a state not reached yet
+WRONG_WAY = {"H": (0, 1), "V": (2, 3)}  # Preferred axis of a layer -> directions that move across it
+
+log = logging.getLogger("maze_router")  # Summary at INFO, per-net/per-segment detail at DEBUG
+trace_log = logging.getLogger("maze_router.trace")  # One JSON line per net, see enable_trace()
+trace_log.propagate = False
+
+
+def enable_trace(trace_file):
+    """Write a JSON record for every routed net to trace_file."""
+    handler = logging.FileHandler(trace_file, mode='w')
+    handler.setFormatter(logging.Formatter("%(message)s"))
+    trace_log.addHandler(handler)
+    trace_log.setLevel(logging.DEBUG)
 
 class MazeRouter:
-    def __init__(self, grid_width, grid_height, bend_penalty, via_penalty):
-        print(f"Initializing MazeRouter with grid {grid_width}x{grid_height}, "
-              f"bend_penalty={bend_penalty}, via_penalty={via_penalty}")
+    def __init__(self, grid_width, grid_height, bend_penalty, via_penalty, search="dijkstra", frontier="auto",
+                 layers=2, preferred_directions=None, wrong_way_penalties=0, grid=None):
+        if not isinstance(wrong_way_penalties, (list, tuple)):
+            wrong_way_penalties = [wrong_way_penalties] * layers
+        if frontier == "auto":
+            frontier = choose_frontier(bend_penalty, via_penalty, *wrong_way_penalties)
+        log.debug("Initializing MazeRouter with grid %dx%dx%d, bend_penalty=%s, via_penalty=%s, search=%s, frontier=%s",
+                  layers, grid_width, grid_height, bend_penalty, via_penalty, search, frontier)
         self.grid_width = grid_width
         self.grid_height = grid_height
         self.bend_penalty = bend_penalty
         self.via_penalty = via_penalty
-        self.obstacles = set()  # Set of tuples (layer, x, y)
-        self.used_pins = set()  # Set of pins used by other nets
+        self.layers = layers
+        self.preferred_directions = preferred_directions  # One "H" (along x) or "V" (along y) per layer, or None
+        self.wrong_way_penalties = list(wrong_way_penalties)  # Extra cost per step across a layer's preferred axis
+        # Obstacles and routed nets; a given grid (e.g. a MappedGrid) is used as is
+        self.grid = RoutingGrid(grid_width, grid_height, layers) if grid is None else grid
+        # Cost of one step in direction i on layer l at move_costs[l * 4 + i]
+        self.move_costs = [1] * (4 * layers)
+        for layer, axis in enumerate(preferred_directions or ""):
+            for direction in WRONG_WAY[axis]:
+                self.move_costs[layer * 4 + direction] += self.wrong_way_penalties[layer]
+        # (index offset, new layer) of every via out of a layer; vias only join adjacent layers
+        self.via_steps = [[((new_layer - layer) * self.grid.layer_size, new_layer)
+                           for new_layer in (layer - 1, layer + 1) if 0 <= new_layer < layers]
+                          for layer in range(layers)]
+        self.net_ids = {}  # Net name -> occupancy code in the grid
         self.total_cost = 0  # Total routing cost
         self.total_wire_length = 0  # Total wire length
         self.longest_route_length = 0  # Length of the longest routed net
         self.total_vias = 0  # Total number of vias used
+        self.search = search  # "dijkstra" (uniform cost), "astar", "bidirectional" or "wavefront"
+        self.frontier = frontier  # Priority queue kind, a key of frontier.FRONTIERS
+        self.nodes_expanded = 0  # Queue pops over all searches
+        self.stale_pops = 0  # Popped queue entries that a cheaper push had superseded
+        self.states_reached = 0  # Search states given a cost over all searches
+        self.negotiation_iterations = 0  # Rounds of negotiated congestion routing, 0 routes nets one by one
+        self.tree = False  # Route multi-pin nets as trees (route_tree) instead of pin-to-pin chains
+        self.window_margin = None  # Search only the pins' bounding box plus this margin, see _windowed_bfs()
+        self.windowed_searches = 0
+        self.window_growths = 0  # Windowed searches retried in a larger window
+        self._state_cost = None  # Search arrays, see _search_arrays()
+        self._state_parent = None
+        self._reverse_cost = None  # Second pair for the backward half of a bidirectional search
+        self._reverse_next = None
+        self._wave_distance = None  # Distance map of the wavefront engine, see wavefront.route()
+        self.distance_cache = None  # DistanceCache of finished dijkstra searches, None to search every time
+        self.output_format = "cells"  # Output file layout, a key of output_writer.WRITERS
+        self.routes = None  # Net name -> branches (None if failed) of routed nets, kept for snapshots; None keeps none
+        self.snapshot_file = None  # Where generate_output saves a snapshot every snapshot_every routed nets
+        self.snapshot_every = 0
+        self.stats = None  # search_stats.SearchStats recording every bfs() call, None records nothing
+        self.jobs = 1  # Worker processes for routing nets with disjoint pin boxes at once, see parallel.py
+        self.explored = None  # If a list, every search appends the bounding box of the cells it looked at
+        self.tile_size = None  # Route tile by tile with tiled.TiledRouting, None routes on the whole grid
+        self.gcell_size = None  # Route globally on GCells first with global_routing.GlobalRouting
+        self.tile_halo = None  # Cells loaded around a tile or corridor, None for the mode's default
+        self.obstacle_rects = False  # Write larger obstacle blocks as OBSRECT lines; set when the input had one
 
     def add_obstacle(self, layer, x, y):
-        print(f"Adding obstacle at layer={layer}, ({x}, {y})")
-        self.obstacles.add((layer, x, y))
+        log.debug("Adding obstacle at layer=%d, (%d, %d)", layer, x, y)
+        self.grid.block(layer, x, y)
+
+    def add_obstacle_rect(self, layer, x1, y1, x2, y2):
+        """Block the inclusive rectangle (x1, y1)-(x2, y2) on layer."""
+        log.debug("Adding obstacle rectangle at layer=%d, (%d, %d)-(%d, %d)", layer, x1, y1, x2, y2)
+        self.grid.block_rect(layer, x1, y1, x2, y2)
+
+    def net_id(self, net_name):
+        """Return the grid occupancy code of a net, assigning one on first use."""
+        if net_name not in self.net_ids:
+            self.net_ids[net_name] = len(self.net_ids) + 1
+        return self.net_ids[net_name]
+
+    def reserve_pins(self, nets):
+        """Hold the FREE pin cells of every net in {net name: pins} for that net, assigning net ids in order.
+
+        A net routed earlier then goes around the pins of the nets after
+        it instead of through them, which would leave those nets unroutable
+        or let them start on its wire. bfs() frees a net's own end pin for
+        the search that connects it. A pin on an obstacle or on a pin of an
+        earlier net keeps that code.
+        """
+        grid = self.grid
+        for net_name, pins in nets.items():
+            grid.claim([grid.index(*pin) for pin in pins], self.net_id(net_name))
 
     def is_valid(self, layer, x, y):
         """Check if the given position is valid for routing (not out of bounds or blocked)."""
-        return (0 <= x < self.grid_width and
-                0 <= y < self.grid_height and
-                (layer, x, y) not in self.obstacles and
-                (layer, x, y) not in self.used_pins)  # Block pins used by other nets
-
-    def bfs(self, start, end):
-        """Perform BFS to find the shortest path between two pins, considering bend and via penalties."""
-        print(f"Running BFS from {start} to {end}")
+        return self.grid.is_free(layer, x, y)  # Blocks obstacles and pins used by other nets
+
+    def _search_arrays(self, backward=False):
+        """Per-state cost and parent arrays, allocated once and reused by every search.
+
+        A search state is cell_index * STATES_PER_CELL + incoming direction, so
+        the same cell reached from different directions is tracked separately.
+        With backward=True the second pair, used by the backward half of
+        _bidirectional_bfs(), is returned.
+        """
+        size = len(self.grid) * STATES_PER_CELL
+        if backward:
+            if self._reverse_cost is None or len(self._reverse_cost) != size:
+                self._reverse_cost = array('i', [UNREACHED]) * size
+                self._reverse_next = bytearray(size)
+            return self._reverse_cost, self._reverse_next
+        if self._state_cost is None or len(self._state_cost) != size:
+            self._state_cost = array('i', [UNREACHED]) * size
+            self._state_parent = bytearray(size)
+        return self._state_cost, self._state_parent
+
+    def bfs(self, start, end, net_id=BLOCKED, cell_cost=None):
+        """Perform BFS to find the shortest path between two pins, considering bend and via penalties.
+
+        The search runs over (layer, x, y, incoming direction) states, so a
+        cheap arrival from the wrong direction cannot hide a path that is
+        cheaper once the next bend is paid. Costs live in preallocated arrays;
+        queue entries made obsolete by a cheaper push are skipped when popped.
+        The queue is the router's frontier (bucket queue or binary heap).
+        With search="astar" the queue is ordered by cost plus heuristic_cost(),
+        a consistent lower bound, so both modes return equally cheap paths.
+        The path cells are claimed for net_id once the segment is found.
+        cell_cost, if given, holds a non-negative extra cost per grid cell that
+        is paid on entering the cell (used by negotiation.py).
+        start may also be a list of positions, e.g. the cells of a partial
+        tree, which are all searched from at cost 0.
+        With a distance_cache, a single-source dijkstra search without
+        cell_cost is answered from an earlier search from the same pin when
+        no cell near that search has been freed since and its path to end is
+        still free (see DistanceCache). Searches in a window (window_margin)
+        neither use nor fill the cache.
+        With stats set, the call is timed and counted as one segment.
+        An end pin that reserve_pins() holds for net_id is freed for the
+        search and held again if no path is found.
+        """
+        grid = self.grid
+        if net_id > FREE and grid.get(*end) == net_id:
+            end_index = grid.index(*end)
+            grid.set_cells([end_index], FREE)  # Logged as freed, so cached searches that saw it held are dropped
+            path = self.bfs(start, end, net_id, cell_cost)
+            if path is None:
+                grid.set_cells([end_index], net_id)
+            return path
+        if self.stats is not None and not self.stats.active:
+            return self.stats.record_segment(self, start, end, net_id, cell_cost)
+        if self.window_margin is not None:
+            return self._windowed_bfs(start, end, net_id, cell_cost)
+        if self.search == "bidirectional":
+            return self._bidirectional_bfs(start, end, net_id, cell_cost)
+        if self.search == "wavefront" and wavefront.supported(self, cell_cost):
+            return wavefront.route(self, start, end, net_id)
+        log.debug("Running BFS from %s to %s", start, end)
+        grid = self.grid
+        cells = grid.cells
+        width = grid.width
+        height = grid.height
+        layer_size = grid.layer_size
+        bend_penalty = self.bend_penalty
+        via_penalty = self.via_penalty
+        move_costs = self.move_costs
+        via_steps = self.via_steps
+        astar = self.search == "astar"
+        end_layer, end_x, end_y = end
+        # (index offset, dx, dy) for Right, Left, Down, Up as in (x, y) = (x + dx, y + dy)
         directions = [
-            (0, 1),  # Right
-            (0, -1),  # Left
-            (1, 0),  # Down
-            (-1, 0),  # Up
+            (width, 0, 1),  # Right
+            (-width, 0, -1),  # Left
+            (1, 1, 0),  # Down
+            (-1, -1, 0),  # Up
         ]
-        queue = []
-        heappush(queue, (0, start, None))  # (cost, position, last_direction)
-        came_from = {start: None}
-        cost_so_far = {start: 0}
-
-        while queue:
-            current_cost, current, last_direction = heappop(queue)
-
-            if current == end:
-                self.total_cost += current_cost  # Update total cost
-                path = []
-                while current is not None:
-                    path.append(current)
-                    current = came_from[current]
-                path.reverse()
-
-                # Add all visited points as obstacles (pins)
-                for pin in path:
-                    self.obstacles.add(pin)
+        # Neighbors are pushed Up, Down, Left, Right. The bucket queue pops equal priorities in push order, so
+        # this order picks among equally cheap paths; it is the one that routes every shipped sample
+        neighbors = list(enumerate(directions))[::-1]
+        cost_so_far, came_from = self._search_arrays()
+        end_index = grid.index(*end)
+        cache_key = None
+        if self.distance_cache is not None and self.search == "dijkstra" and cell_cost is None \
+                and not isinstance(start, list):
+            cache_key = (grid.index(*start), bend_penalty, via_penalty, tuple(move_costs))
+            entry = self.distance_cache.lookup(cache_key, grid)
+            if entry is not None:
+                found, path = self._cached_bfs(entry, end_index, net_id)
+                if found:
+                    self.distance_cache.hits += 1
+                    return path
+            self.distance_cache.misses += 1
+        touched = []  # States to reset to UNREACHED afterwards
+        queue = self._frontier(cell_cost)
+        push = queue.push
+        pop = queue.pop
+        for source in (start if isinstance(start, list) else [start]):
+            start_state = grid.index(*source) * STATES_PER_CELL + NO_DIRECTION
+            cost_so_far[start_state] = 0
+            came_from[start_state] = FROM_START
+            touched.append(start_state)
+            push(self.heuristic_cost(source, end) if astar else 0, (0, start_state))  # priority, (cost, state)
+        expanded = 0
+        stale = 0
+
+        try:
+            while True:
+                entry = pop()
+                if entry is None:
+                    break
+                current_cost, state = entry
+                if current_cost > cost_so_far[state]:
+                    stale += 1  # Superseded by a cheaper push of the same state
+                    continue
+                expanded += 1
+                current, last_direction = divmod(state, STATES_PER_CELL)
+
+                if current == end_index:
+                    self.total_cost += current_cost  # Update total cost
+                    log.debug("Segment routed with cost %d, %d nodes expanded", current_cost, expanded)
+                    if cache_key is not None:
+                        self.distance_cache.store(cache_key, settled_search(
+                            touched, cost_so_far, came_from, current_cost, grid, STATES_PER_CELL))
+                    path = self._trace_back(state, came_from)
+                    grid.claim(path, net_id)  # Claim the segment so later searches avoid it
+                    return [grid.coords(index) for index in path]
+
+                layer, cell = divmod(current, layer_size)
+                y, x = divmod(cell, width)
+                layer_moves = layer * 4
+
+                # Explore neighbors
+                for i, (offset, dx, dy) in neighbors:
+                    nx = x + dx
+                    ny = y + dy
+                    if not (0 <= nx < width and 0 <= ny < height):
+                        continue
+                    neighbor = current + offset
+                    if cells[neighbor] == FREE:
+                        # Calculate movement cost
+                        movement_cost = move_costs[layer_moves + i]  # 1, plus the wrong-way penalty
+                        if last_direction != NO_DIRECTION and last_direction != i:
+                            movement_cost += bend_penalty  # Add bend penalty if direction changes
+                        if cell_cost is not None:
+                            movement_cost += cell_cost[neighbor]
+
+                        new_cost = current_cost + movement_cost
+                        new_state = neighbor * STATES_PER_CELL + i
+                        if new_cost < cost_so_far[new_state]:
+                            if cost_so_far[new_state] == UNREACHED:
+                                touched.append(new_state)
+                            cost_so_far[new_state] = new_cost
+                            came_from[new_state] = last_direction
+                            priority = new_cost
+                            if astar:  # Inlined heuristic_cost(), this is the hot loop
+                                rx = end_x - nx
+                                ry = end_y - ny
+                                priority += abs(rx) + abs(ry)
+                                bends = 0
+                                if ry:
+                                    bends += i != (0 if ry > 0 else 1)
+                                if rx:
+                                    bends += i != (2 if rx > 0 else 3)
+                                priority += bends * bend_penalty
+                                if layer != end_layer:
+                                    priority += abs(layer - end_layer) * via_penalty
+                            push(priority, (new_cost, new_state))
+
+                # Handle layer changes (via) to the adjacent layers
+                for offset, new_layer in via_steps[layer]:
+                    neighbor = current + offset
+                    if cells[neighbor] == FREE:
+                        new_cost = current_cost + via_penalty
+                        if cell_cost is not None:
+                            new_cost += cell_cost[neighbor]
+                        new_state = neighbor * STATES_PER_CELL + last_direction
+                        if new_cost < cost_so_far[new_state]:
+                            if cost_so_far[new_state] == UNREACHED:
+                                touched.append(new_state)
+                            cost_so_far[new_state] = new_cost
+                            came_from[new_state] = VIA_FROM_LAYER + layer
+                            priority = new_cost
+                            if astar:
+                                priority += self.heuristic_cost((new_layer, x, y), end, last_direction)
+                            push(priority, (new_cost, new_state))
+
+            if cache_key is not None:  # Exhausted: every reachable state is settled
+                self.distance_cache.store(cache_key, settled_search(
+                    touched, cost_so_far, came_from, UNREACHED, grid, STATES_PER_CELL))
+            return None  # No path found
+        finally:
+            self.nodes_expanded += expanded
+            self.stale_pops += stale
+            self.states_reached += len(touched)
+            if self.explored is not None:
+                self.explored.append(explored_box(touched, grid, STATES_PER_CELL))
+            for state in touched:
+                cost_so_far[state] = UNREACHED
+
+    def _frontier(self, cell_cost=None):
+        """A new search queue, wrapped to count its operations when stats are on.
+
+        A search with cell_cost gets a heap whatever the frontier setting:
+        negotiation's congestion costs grow every iteration, and a bucket
+        queue would grow to a bucket per priority up to those costs.
+        """
+        queue = FRONTIERS["heap" if cell_cost is not None else self.frontier]()
+        return queue if self.stats is None else self.stats.counting(queue)
 
+    def _trace_back(self, state, came_from):
+        """Cell indices of the path from the start to state, following the parent codes in came_from."""
+        width = self.grid.width
+        layer_size = self.grid.layer_size
+        offsets = (width, -width, 1, -1)  # Index offsets of Right, Left, Down, Up as in bfs()
+        current, last_direction = divmod(state, STATES_PER_CELL)
+        path = []
+        while True:
+            path.append(current)
+            parent = came_from[state]
+            if parent == FROM_START:
+                break
+            if parent < STATES_PER_CELL:  # Moved in last_direction from a state facing parent
+                current -= offsets[last_direction]
+                last_direction = parent
+            else:  # Via from layer (parent - VIA_FROM_LAYER)
+                current = (parent - VIA_FROM_LAYER) * layer_size + current % layer_size
+            state = current * STATES_PER_CELL + last_direction
+        path.reverse()
+        return path
+
+    def _cached_bfs(self, entry, end_index, net_id):
+        """Answer bfs() from a cached search: (True, path or None) if the entry settles end_index, else (False, None).
+
+        Cells may have been claimed since the search, so its cheapest path is
+        only used if every cell after the start is still FREE.
+        """
+        first = end_index * STATES_PER_CELL
+        arrivals = [(entry.cost(state), state) for state in range(first, first + STATES_PER_CELL)
+                    if entry.cost(state) is not None]
+        if not arrivals:
+            return entry.radius == UNREACHED, None  # An exhausted search never reached end
+        cost, state = min(arrivals)
+        path = self._trace_back(state, entry)
+        cells = self.grid.cells
+        if any(cells[index] != FREE for index in path[1:]):
+            return False, None  # Partly claimed since, a detour may cost more
+        self.total_cost += cost
+        log.debug("Segment routed with cost %d from the distance cache", cost)
+        self.grid.claim(path, net_id)
+        return True, [self.grid.coords(index) for index in path]
+
+    def _windowed_bfs(self, start, end, net_id=BLOCKED, cell_cost=None):
+        """bfs() restricted to the bounding box of the pins plus window_margin cells.
+
+        The window is copied into a router of its own, so the search arrays
+        are sized by the window and any search mode and frontier can run in
+        it. When no path exists inside, the margin doubles and the search is
+        repeated until the window covers the whole grid. A path found in a
+        window can cost more than the best one on the full grid.
+        """
+        grid = self.grid
+        sources = start if isinstance(start, list) else [start]
+        xs = [x for _, x, _ in sources] + [end[1]]
+        ys = [y for _, _, y in sources] + [end[2]]
+        margin = self.window_margin
+        self.windowed_searches += 1
+        while True:
+            x1 = max(min(xs) - margin, 0)
+            y1 = max(min(ys) - margin, 0)
+            x2 = min(max(xs) + margin, grid.width - 1)
+            y2 = min(max(ys) + margin, grid.height - 1)
+            whole_grid = x1 == 0 and y1 == 0 and x2 == grid.width - 1 and y2 == grid.height - 1
+            if self.explored is not None:
+                self.explored.append((x1, y1, x2, y2))  # The window search cannot look further
+            width = x2 - x1 + 1
+            window = MazeRouter(width, y2 - y1 + 1, self.bend_penalty, self.via_penalty, self.search, self.frontier,
+                                self.layers, self.preferred_directions, self.wrong_way_penalties)
+            window.stats = self.stats  # Active inside record_segment(), so the window only adds queue counts
+            window_cost = None if cell_cost is None else array('i', bytes(4 * len(window.grid)))
+            for layer in range(grid.layers):
+                for y in range(y1, y2 + 1):
+                    row = grid.index(layer, x1, y)
+                    local = window.grid.index(layer, 0, y - y1)
+                    window.grid.cells[local:local + width] = grid.cells[row:row + width]
+                    if cell_cost is not None:
+                        window_cost[local:local + width] = cell_cost[row:row + width]
+            local_start = [(layer, x - x1, y - y1) for layer, x, y in sources]
+            local_end = (end[0], end[1] - x1, end[2] - y1)
+            path = window.bfs(local_start if isinstance(start, list) else local_start[0],
+                              local_end, net_id, window_cost)
+            self.nodes_expanded += window.nodes_expanded
+            self.stale_pops += window.stale_pops
+            self.states_reached += window.states_reached
+            if path is not None:
+                self.total_cost += window.total_cost
+                path = [(layer, x + x1, y + y1) for layer, x, y in path]
+                grid.claim([grid.index(*position) for position in path], net_id)  # One logged change
                 return path
+            if whole_grid:
+                return None
+            margin = margin * 2 if margin else 1
+            self.window_growths += 1
+            log.debug("No path inside the window, growing the margin to %d", margin)
+
+    def _bidirectional_bfs(self, start, end, net_id=BLOCKED, cell_cost=None):
+        """bfs() growing one uniform-cost search from start and one from end.
+
+        The backward search runs on the reversed state graph: it starts from
+        every (end, direction) state at cost 0, and a state (cell, d) reached
+        by a move in direction d has the predecessors (cell - step d, d') for
+        every heading d', paying the bend when d' != d, plus the via
+        predecessors on the adjacent layers with the same heading. Headless
+        states only exist in the start's column, so the bend at the meeting
+        cell is always counted exactly once. Searches alternate; mu, the best
+        forward + backward cost over states reached by both, is final once
+        the last popped costs of the two sides add up to at least mu.
+        """
+        log.debug("Running bidirectional BFS from %s to %s", start, end)
+        grid = self.grid
+        cells = grid.cells
+        width = grid.width
+        height = grid.height
+        layer_size = grid.layer_size
+        bend_penalty = self.bend_penalty
+        via_penalty = self.via_penalty
+        move_costs = self.move_costs
+        via_steps = self.via_steps
+        directions = [
+            (width, 0, 1),  # Right
+            (-width, 0, -1),  # Left
+            (1, 1, 0),  # Down
+            (-1, -1, 0),  # Up
+        ]
+        cost_so_far, came_from = self._search_arrays()
+        cost_to_end, goes_to = self._search_arrays(backward=True)  # Backward costs and successor codes
+        sources = [grid.index(*source) for source in (start if isinstance(start, list) else [start])]
+        start_columns = {index % layer_size for index in sources}  # Cells that can hold headless states
+        end_index = grid.index(*end)
+        touched = []
+        touched_backward = []
+        forward = self._frontier(cell_cost)
+        backward = self._frontier(cell_cost)
+        best = UNREACHED  # mu
+        meeting = None
+        for index in sources:
+            state = index * STATES_PER_CELL + NO_DIRECTION
+            cost_so_far[state] = 0
+            came_from[state] = FROM_START
+            touched.append(state)
+            forward.push(0, (0, state))
+        for direction in range(STATES_PER_CELL):
+            state = end_index * STATES_PER_CELL + direction
+            cost_to_end[state] = 0
+            goes_to[state] = FROM_START
+            touched_backward.append(state)
+            backward.push(0, (0, state))
+            if cost_so_far[state] == 0:
+                best, meeting = 0, state
+        last_forward = 0
+        last_backward = 0
+        expanded = 0
+        stale = 0
+
+        try:
+            # Once either side runs empty best is final as well: every start
+            # state has forward cost 0 and every end state backward cost 0.
+            while last_forward + last_backward < best:
+                # Forward step, the same relaxation as bfs()
+                entry = forward.pop()
+                if entry is None:
+                    break
+                current_cost, state = entry
+                if current_cost > cost_so_far[state]:
+                    stale += 1
+                else:
+                    expanded += 1
+                    last_forward = current_cost
+                    current, last_direction = divmod(state, STATES_PER_CELL)
+                    layer, cell = divmod(current, layer_size)
+                    y, x = divmod(cell, width)
+                    for i, (offset, dx, dy) in enumerate(directions):
+                        if not (0 <= x + dx < width and 0 <= y + dy < height):
+                            continue
+                        neighbor = current + offset
+                        if cells[neighbor] != FREE:
+                            continue
+                        new_cost = current_cost + move_costs[layer * 4 + i]
+                        if last_direction != NO_DIRECTION and last_direction != i:
+                            new_cost += bend_penalty
+                        if cell_cost is not None:
+                            new_cost += cell_cost[neighbor]
+                        new_state = neighbor * STATES_PER_CELL + i
+                        if new_cost < cost_so_far[new_state]:
+                            if cost_so_far[new_state] == UNREACHED:
+                                touched.append(new_state)
+                            cost_so_far[new_state] = new_cost
+                            came_from[new_state] = last_direction
+                            forward.push(new_cost, (new_cost, new_state))
+                            if new_cost + cost_to_end[new_state] < best:
+                                best, meeting = new_cost + cost_to_end[new_state], new_state
+                    for offset, _ in via_steps[layer]:
+                        neighbor = current + offset
+                        if cells[neighbor] != FREE:
+                            continue
+                        new_cost = current_cost + via_penalty
+                        if cell_cost is not None:
+                            new_cost += cell_cost[neighbor]
+                        new_state = neighbor * STATES_PER_CELL + last_direction
+                        if new_cost < cost_so_far[new_state]:
+                            if cost_so_far[new_state] == UNREACHED:
+                                touched.append(new_state)
+                            cost_so_far[new_state] = new_cost
+                            came_from[new_state] = VIA_FROM_LAYER + layer
+                            forward.push(new_cost, (new_cost, new_state))
+                            if new_cost + cost_to_end[new_state] < best:
+                                best, meeting = new_cost + cost_to_end[new_state], new_state
 
-            layer, x, y = current
-
-            # Explore neighbors
-            for i, direction in enumerate(directions):
-                neighbor = (layer, x + direction[0], y + direction[1])
-                if self.is_valid(*neighbor):
-                    # Calculate movement cost
-                    movement_cost = 1
-                    if last_direction is not None and last_direction != i:
-                        movement_cost += self.bend_penalty  # Add bend penalty if direction changes
-
-                    new_cost = current_cost + movement_cost
-                    if neighbor not in cost_so_far or new_cost < cost_so_far[neighbor]:
-                        cost_so_far[neighbor] = new_cost
-                        heappush(queue, (new_cost, neighbor, i))
-                        came_from[neighbor] = current
-
-            # Handle layer changes (via)
-            for new_layer in range(2):  # Assuming 2 layers
-                if new_layer != layer:
-                    neighbor = (new_layer, x, y)
-                    if self.is_valid(*neighbor):
-                        new_cost = current_cost + self.via_penalty
-                        if neighbor not in cost_so_far or new_cost < cost_so_far[neighbor]:
-                            cost_so_far[neighbor] = new_cost
-                            heappush(queue, (new_cost, neighbor, last_direction))
-                            came_from[neighbor] = current
-
-        return None  # No path found
-
-    def route_net(self, pins):
+                # Backward step over the reversed edges
+                entry = backward.pop()
+                if entry is None:
+                    break
+                current_cost, state = entry
+                if current_cost > cost_to_end[state]:
+                    stale += 1
+                    continue
+                expanded += 1
+                last_backward = current_cost
+                current, direction = divmod(state, STATES_PER_CELL)
+                if cells[current] != FREE:
+                    continue  # Only the start can be a claimed cell and nothing moves into it
+                enter_cost = cell_cost[current] if cell_cost is not None else 0
+                layer, cell = divmod(current, layer_size)
+                y, x = divmod(cell, width)
+                if direction != NO_DIRECTION:
+                    # Entered by a move in this direction from the cell one step back
+                    offset, dx, dy = directions[direction]
+                    if 0 <= x - dx < width and 0 <= y - dy < height:
+                        previous = current - offset
+                        for heading in range(STATES_PER_CELL):
+                            if heading == NO_DIRECTION:
+                                if previous % layer_size not in start_columns:
+                                    continue
+                            elif cells[previous] != FREE:
+                                continue
+                            new_cost = current_cost + move_costs[layer * 4 + direction] + enter_cost
+                            if heading != NO_DIRECTION and heading != direction:
+                                new_cost += bend_penalty
+                            new_state = previous * STATES_PER_CELL + heading
+                            if new_cost < cost_to_end[new_state]:
+                                if cost_to_end[new_state] == UNREACHED:
+                                    touched_backward.append(new_state)
+                                cost_to_end[new_state] = new_cost
+                                goes_to[new_state] = direction
+                                backward.push(new_cost, (new_cost, new_state))
+                                if new_cost + cost_so_far[new_state] < best:
+                                    best, meeting = new_cost + cost_so_far[new_state], new_state
+                # Entered by a via keeping the heading
+                for offset, _ in via_steps[layer]:
+                    previous = current + offset
+                    if direction != NO_DIRECTION and cells[previous] != FREE:
+                        continue
+                    new_cost = current_cost + via_penalty + enter_cost
+                    new_state = previous * STATES_PER_CELL + direction
+                    if new_cost < cost_to_end[new_state]:
+                        if cost_to_end[new_state] == UNREACHED:
+                            touched_backward.append(new_state)
+                        cost_to_end[new_state] = new_cost
+                        goes_to[new_state] = VIA_FROM_LAYER + layer
+                        backward.push(new_cost, (new_cost, new_state))
+                        if new_cost + cost_so_far[new_state] < best:
+                            best, meeting = new_cost + cost_so_far[new_state], new_state
+
+            if meeting is None:
+                return None  # No path found
+            self.total_cost += best
+            log.debug("Segment routed with cost %d, %d nodes expanded", best, expanded)
+            # Meeting state back to the start, then forward along the successor codes to the end
+            path = self._trace_back(meeting, came_from)
+            current, direction = divmod(meeting, STATES_PER_CELL)
+            state = meeting
+            while goes_to[state] != FROM_START:
+                successor = goes_to[state]
+                if successor < STATES_PER_CELL:  # Next move in direction successor
+                    current += directions[successor][0]
+                    direction = successor
+                else:  # Via to layer (successor - VIA_FROM_LAYER)
+                    current = (successor - VIA_FROM_LAYER) * layer_size + current % layer_size
+                state = current * STATES_PER_CELL + direction
+                path.append(current)
+            grid.claim(path, net_id)  # Claim the segment so later searches avoid it
+            return [grid.coords(index) for index in path]
+        finally:
+            self.nodes_expanded += expanded
+            self.stale_pops += stale
+            self.states_reached += len(touched) + len(touched_backward)
+            if self.explored is not None:
+                self.explored.append(explored_box(touched + touched_backward, grid, STATES_PER_CELL))
+            for state in touched:
+                cost_so_far[state] = UNREACHED
+            for state in touched_backward:
+                cost_to_end[state] = UNREACHED
+
+    def heuristic_cost(self, position, end, direction=NO_DIRECTION):
+        """Lower bound on the cost from position to end used by the A* search.
+
+        Manhattan distance, plus one via for every layer between the two
+        points, plus one bend for every direction the remaining route must
+        take other than the one it is heading in. Without a heading that is
+        one bend when the two points are not on a common row or column.
+        """
+        layer, x, y = position
+        end_layer, end_x, end_y = end
+        cost = abs(x - end_x) + abs(y - end_y)
+        needed = []  # Directions the route still has to move in
+        if end_y != y:
+            needed.append(0 if end_y > y else 1)
+        if end_x != x:
+            needed.append(2 if end_x > x else 3)
+        if direction == NO_DIRECTION:
+            bends = max(len(needed) - 1, 0)
+        else:
+            bends = sum(1 for d in needed if d != direction)
+        cost += bends * self.bend_penalty
+        cost += abs(layer - end_layer) * self.via_penalty  # Vias only join adjacent layers
+        return cost
+
+    def route_net(self, pins, net_name=None):
         """Route a net by connecting its pins while avoiding obstacles."""
+        net_id = self.net_id(net_name)
+        tracing = trace_log.isEnabledFor(logging.DEBUG)
+        segments = []  # Per-segment trace records, only filled when tracing
         path = []
         for i in range(len(pins) - 1):
             start = pins[i]
             end = pins[i + 1]
-            segment = self.bfs(start, end)
+            if tracing:
+                cost_before, expanded_before = self.total_cost, self.nodes_expanded
+            segment = self.bfs(start, end, net_id)
+            if tracing:
+                segments.append({"from": start, "to": end, "routed": segment is not None,
+                                 "cost": self.total_cost - cost_before,
+                                 "nodes_expanded": self.nodes_expanded - expanded_before})
             if segment is None:
-                print(f"Failed to route segment from {start} to {end}")
+                log.debug("Failed to route segment from %s to %s", start, end)
+                if tracing:
+                    trace_log.debug(json.dumps({"net": net_name, "routed": False, "segments": segments}))
                 return None  # If any segment fails, the whole net fails
             path.extend(segment[:-1])  # Append all but the last point to avoid duplication
         path.append(pins[-1])  # Add the last pin's coordinates
 
-        # Update metrics
-        wire_length = len(path) - 1
+        wire_length, vias = self.record_route([path])
+        if tracing:
+            trace_log.debug(json.dumps({"net": net_name, "routed": True, "wire_length": wire_length, "vias": vias,
+                                        "cost": sum(s["cost"] for s in segments), "segments": segments}))
+        return path
+
+    def route_tree(self, pins, net_name=None):
+        """Route a net as a tree in which every new pin joins the nearest part of the wiring.
+
+        Pins are connected nearest first (Prim's order), measured as Manhattan
+        distance to the tree plus a via per layer of difference, and each
+        search starts from every cell already on the tree. Returns the list
+        of branches, each a path from a tree cell to the pin it connects, or
+        None if a pin cannot be reached.
+        """
+        net_id = self.net_id(net_name)
+        tracing = trace_log.isEnabledFor(logging.DEBUG)
+        segments = []  # Per-branch trace records, only filled when tracing
+        via_penalty = self.via_penalty
+
+        def distance(pin, branch):
+            layer, x, y = pin
+            return min(abs(x - bx) + abs(y - by) + abs(layer - bl) * via_penalty for bl, bx, by in branch)
+
+        tree = [pins[0]]
+        on_tree = {pins[0]}
+        self.grid.claim([self.grid.index(*pins[0])], net_id)  # Unless an obstacle or another net holds it
+        remaining = {pin: distance(pin, tree) for pin in pins[1:] if pin not in on_tree}
+        branches = []
+        while remaining:
+            pin = min(remaining, key=remaining.get)
+            del remaining[pin]
+            if pin in on_tree:  # An earlier branch already runs through it
+                continue
+            if tracing:
+                cost_before, expanded_before = self.total_cost, self.nodes_expanded
+            branch = self.bfs(tree, pin, net_id)
+            if tracing:
+                segments.append({"from": branch[0] if branch else None, "to": pin, "routed": branch is not None,
+                                 "cost": self.total_cost - cost_before,
+                                 "nodes_expanded": self.nodes_expanded - expanded_before})
+            if branch is None:
+                log.debug("Failed to connect pin %s to the tree of net %s", pin, net_name)
+                if tracing:
+                    trace_log.debug(json.dumps({"net": net_name, "routed": False, "segments": segments}))
+                return None
+            branches.append(branch)
+            tree.extend(branch[1:])
+            on_tree.update(branch)
+            for other in remaining:
+                remaining[other] = min(remaining[other], distance(other, branch))
+        if not branches:
+            branches.append([pins[0]])
+
+        wire_length, vias = self.record_route(branches)
+        if tracing:
+            trace_log.debug(json.dumps({"net": net_name, "routed": True, "wire_length": wire_length, "vias": vias,
+                                        "cost": sum(s["cost"] for s in segments), "segments": segments}))
+        return branches
+
+    def record_route(self, branches):
+        """Add a routed net (a list of paths) to the wire length, longest route and via totals.
+
+        Returns (wire_length, vias) of the net.
+        """
+        wire_length = sum(len(path) - 1 for path in branches)
         self.total_wire_length += wire_length
         self.longest_route_length = max(self.longest_route_length, wire_length)
-        self.total_vias += sum(1 for (layer1, x, y), (layer2, _, _) in zip(path, path[1:]) if layer1 != layer2)
+        vias = sum(1 for path in branches
+                   for (layer1, x, y), (layer2, _, _) in zip(path, path[1:]) if layer1 != layer2)
+        self.total_vias += vias
+        return wire_length, vias
 
-        # Add all routed pins to the used_pins set
-        self.used_pins.update(path)
-        return path
+    def header(self):
+        """Header line of the input and output files; the layer stack fields only when not the default."""
+        fields = [self.grid_width, self.grid_height, self.bend_penalty, self.via_penalty]
+        if self.layers != 2 or self.preferred_directions:
+            fields.append(self.layers)
+        if self.preferred_directions:
+            fields.append(self.preferred_directions)
+            fields.append(":".join(map(str, self.wrong_way_penalties)))
+        return ", ".join(map(str, fields))
+
+    def save_snapshot(self, path, nets):
+        """Save the grid, penalties, layer stack, nets and routes so far to a binary snapshot (see snapshot.py)."""
+        routes = self.routes or {}
+        metadata = {
+            "width": self.grid_width,
+            "height": self.grid_height,
+            "layers": self.layers,
+            "bend_penalty": self.bend_penalty,
+            "via_penalty": self.via_penalty,
+            "preferred_directions": self.preferred_directions,
+            "wrong_way_penalties": self.wrong_way_penalties,
+            "tree": self.tree,
+            "obstacle_rects": self.obstacle_rects,
+            "net_ids": self.net_ids,
+            "totals": [self.total_cost, self.total_wire_length, self.longest_route_length, self.total_vias],
+            "nets": nets,
+            "routes": {net_name: None if branches is None else
+                       [[branch[0], compress_path(branch)] for branch in branches]
+                       for net_name, branches in routes.items()},
+        }
+        snapshot.write_snapshot(path, metadata, self.grid.cells)
+        log.debug("Saved snapshot %s with %d of %d nets routed", path, len(routes), len(nets))
+
+    @classmethod
+    def load_snapshot(cls, path, search="dijkstra", frontier="auto", mapped=False):
+        """Restore a router saved with save_snapshot(); return (router, {net name: pins}).
+
+        The grid is read with a single read into the router's cell array, or
+        with mapped=True mapped copy-on-write from the file (see MappedGrid).
+        Nets routed before the snapshot are kept in router.routes, and
+        generate_output writes them without routing them again.
+        """
+        metadata = snapshot.read_metadata(path)
+        router = cls(metadata["width"], metadata["height"], metadata["bend_penalty"], metadata["via_penalty"],
+                     search, frontier, layers=metadata["layers"],
+                     preferred_directions=metadata["preferred_directions"],
+                     wrong_way_penalties=metadata["wrong_way_penalties"],
+                     grid=MappedGrid.from_snapshot(path, metadata) if mapped else None)
+        if not mapped:
+            snapshot.read_cells(path, metadata, router.grid.cells)
+        router.tree = metadata["tree"]
+        router.obstacle_rects = metadata.get("obstacle_rects", False)
+        router.net_ids = metadata["net_ids"]
+        router.total_cost, router.total_wire_length, router.longest_route_length, router.total_vias = metadata["totals"]
+        router.routes = {net_name: None if branches is None else
+                         [expand_runs(tuple(start), runs) for start, runs in branches]
+                         for net_name, branches in metadata["routes"].items()}
+        nets = {net_name: [tuple(pin) for pin in pins] for net_name, pins in metadata["nets"].items()}
+        return router, nets
 
     def generate_output(self, nets, output_file):
-        """Generate the output file with routing results."""
-        with open(output_file, 'w') as f:
+        """Generate the output file with routing results.
+
+        Nets are written through an OutputWriter as they are routed, so the
+        file is produced in large blocks and finished paths are not kept.
+        output_format picks the layout: every cell, run-length text or binary.
+        With stats set, the nets it names are routed inside its profile hook.
+        With jobs > 1, nets are routed in worker processes by parallel.route_nets().
+        With tile_size set, they are routed tile by tile (see tiled.TiledRouting),
+        with gcell_size inside corridors from a global routing stage.
+        """
+        with WRITERS[self.output_format](output_file) as out:
             # Write grid info (first line)
-            f.write(f"{self.grid_width}, {self.grid_height}, {self.bend_penalty}, {self.via_penalty}\n")
-            print(f"Grid Info: {self.grid_width}, {self.grid_height}, {self.bend_penalty}, {self.via_penalty}")
+            out.header(self.header())
+            log.debug("Grid Info: %s", self.header())
+
+            # Write obstacles as OBS lines, or larger blocks as OBSRECT if the input used them; the
+            # visualizers in Final_Maze-Router and Maze-Router only read OBS
+            if self.obstacle_rects:
+                out.obstacles(self.grid.blocked_rects())
+            else:
+                out.obstacles((layer, x, y, x, y) for layer, x, y in self.grid.blocked_cells())
+
+            # Route each net and write results; nets restored from a snapshot are only written
+            routes = self.routes
+            pending = {net_name: pins for net_name, pins in nets.items() if not routes or net_name not in routes}
+            self.reserve_pins(pending)
+            routed = None
+            if self.negotiation_iterations:
+                negotiated = Negotiation(self, self.negotiation_iterations).run(pending)
+
+                def route(pins, net_name):
+                    return negotiated[net_name]
+            elif self.tile_size or self.gcell_size:
+                if self.gcell_size:
+                    routing = GlobalRouting(self, self.gcell_size)
+                else:
+                    routing = TiledRouting(self, self.tile_size)
+                if self.tile_halo is not None:
+                    routing.halo = self.tile_halo
+                tiled_routes = routing.route(pending)
 
-            # Write obstacles
-            for (layer, x, y) in self.obstacles:
-                f.write(f"OBS({layer}, {x}, {y})\n")
+                def route(pins, net_name):
+                    branches = tiled_routes.pop(net_name)  # Expanded only when written
+                    if branches is None:
+                        return None
+                    branches = [expand_runs(start, runs) for start, runs in branches]
+                    return branches if self.tree else branches[0]
+            elif self.jobs > 1 and pending:
+                routed = parallel.route_nets(self, pending, self.jobs)
 
-            # Route each net and write results
+                def route(pins, net_name):
+                    return next(routed)  # Routes come in the order of pending
+            elif self.tree:
+                route = self.route_tree
+            else:
+                route = self.route_net
+            failed = 0
+            routed_now = 0
             for net_name, pins in nets.items():
-                print(f"Routing net: {net_name}")
-                path = self.route_net(pins)
-                if path:
-                    f.write(f"{net_name} ")
-                    for (layer, x, y) in path:
-                        f.write(f"({layer}, {x}, {y}) ")
-                    f.write("\n")
+                if net_name in pending:
+                    if self.stats is None:
+                        path = route(pins, net_name)
+                    else:
+                        with self.stats.profile(net_name):
+                            path = route(pins, net_name)
+                    branches = path if self.tree or path is None else [path]  # A chained net is one branch
+                    if routes is not None:
+                        routes[net_name] = branches
+                        routed_now += 1
+                        if self.snapshot_every and routed_now % self.snapshot_every == 0:
+                            self.save_snapshot(self.snapshot_file, nets)
                 else:
-                    f.write(f"{net_name} failed to route.\n")
+                    branches = routes[net_name]
+                log.debug("Routed net: %s", net_name)
+                if branches:
+                    out.tree_net(net_name, branches)
+                else:
+                    failed += 1
+                    out.failed(net_name)
+            if routed is not None:
+                routed.close()  # Stops the workers and frees the shared grid
 
             # Write summary to the output file
-            f.write("\nSummary:\n")
-            f.write(f"Total cost of routing: {self.total_cost}\n")
-            f.write(f"Total wire length: {self.total_wire_length}\n")
-            f.write(f"Longest route length: {self.longest_route_length}\n")
-            f.write(f"Total vias used: {self.total_vias}\n")
+            out.summary(self.total_cost, self.total_wire_length, self.longest_route_length, self.total_vias)
 
         # Print summary of routing to console
-        print(f"Total cost of routing: {self.total_cost}")
-        print(f"Total wire length: {self.total_wire_length}")
-        print(f"Longest route length: {self.longest_route_length}")
-        print(f"Total vias used: {self.total_vias}")
+        log.info("Nets routed: %d of %d", len(nets) - failed, len(nets))
+        log.info("Total cost of routing: %d", self.total_cost)
+        log.info("Total wire length: %d", self.total_wire_length)
+        log.info("Longest route length: %d", self.longest_route_length)
+        log.info("Total vias used: %d", self.total_vias)
+        log.info("Nodes expanded (%s): %d, stale queue entries skipped: %d",
+                 self.search, self.nodes_expanded, self.stale_pops)
+        if self.window_margin is not None:
+            log.info("Search windows: %d searches, %d grown after failing", self.windowed_searches, self.window_growths)
+        if self.distance_cache is not None:
+            cache = self.distance_cache
+            log.info("Distance cache: %d hits, %d misses, %d invalidated, %d evicted, %d entries (%d bytes)",
+                     cache.hits, cache.misses, cache.invalidated, cache.evicted, len(cache.entries), cache.nbytes)
+        if self.stats is not None:
+            self.stats.log_slowest()
 
 
-def parse_input(input_file):
-    nets = {}
-    router = None
+class InputFormatError(ValueError):
+    """Malformed input file; the message starts with file:line."""
 
-    try:
-        with open(input_file, 'r') as f:
-            grid_info = f.readline().strip()
-            grid_info = grid_info.split(', ')
-            grid_width, grid_height = map(int, grid_info[:2])
-            bend_penalty, via_penalty = map(int, grid_info[2:])
+    def __init__(self, input_file, line_number, message):
+        super().__init__(f"{input_file}:{line_number}: {message}")
+        self.input_file = input_file
+        self.line_number = line_number
 
-            router = MazeRouter(grid_width, grid_height, bend_penalty, via_penalty)
 
-            for line in f:
-                line = line.strip()
-                if not line:
-                    continue
-                if line.startswith('OBS'):
-                    parts = line.split('(')[1].split(')')[0].split(',')
-                    layer, x, y = map(int, parts)
-                    router.add_obstacle(layer, x, y)
-                elif line.startswith('net'):
-                    parts = line.split('(')
-                    net_name = parts[0].strip()
-                    pins = []
-                    for part in parts[1:]:
-                        part = part.split(')')[0]
-                        layer, x, y = map(int, part.split(','))
-                        pins.append((layer, x, y))
-                    nets[net_name] = pins
+PARSE_CHUNK_SIZE = 1 << 23  # Bytes decoded per batch, extended to the next line break
+OBSTACLE_CHARS = b"OBS(),0123456789- \t\r\n"  # Everything an all-OBS batch may contain
 
+
+def parse_input(input_file, search="dijkstra", frontier="auto", mapped_dir=None):
+    """Build a router with every obstacle of input_file and return (router, {net name: pins}).
+
+    Raises InputFormatError (with the line number) on malformed input.
+    input_file may also be a snapshot written by MazeRouter.save_snapshot().
+    With mapped_dir the grid is not kept in memory but in a MappedGrid: a
+    temporary file in mapped_dir, or the snapshot's own cells.
+    """
+    if snapshot.is_snapshot(input_file):
+        router, nets = MazeRouter.load_snapshot(input_file, search, frontier, mapped=mapped_dir is not None)
+        log.info("Resumed %s: %dx%d grid, %d nets, %d already routed", input_file, router.grid_width,
+                 router.grid_height, len(nets), len(router.routes))
         return router, nets
+    router, nets = read_input(input_file, search, frontier, mapped_dir)
+    nets = dict(nets)
+    log.info("Parsed %s: %dx%d grid, %d nets", input_file, router.grid_width, router.grid_height, len(nets))
+    return router, nets
+
 
-    except Exception as e:
-        print(f"Error while parsing input file: {e}")
-        return None, {}
+def read_input(input_file, search="dijkstra", frontier="auto", mapped_dir=None):
+    """Load the header and all obstacles of input_file; return (router, generator of (net name, pins)).
+
+    The file is memory-mapped and decoded in batches of PARSE_CHUNK_SIZE bytes.
+    Batches holding only OBS lines are converted to grid indices in bulk and
+    OBSRECT(layer, x1, y1, x2, y2) rectangles are filled row by row; net lines are kept as raw bytes and only parsed when the generator reaches them.
+    """
+    with open(input_file, 'rb') as f:
+        size = os.fstat(f.fileno()).st_size
+        if not size:
+            raise InputFormatError(input_file, 1, "empty file, expected 'width, height, bend_penalty, via_penalty'")
+        with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as data:
+            header_end = data.find(b'\n')
+            if header_end == -1:
+                header_end = size
+            grid_width, grid_height, bend_penalty, via_penalty, stack = _parse_header(input_file, data[:header_end])
+            grid = None
+            if mapped_dir is not None:
+                grid = MappedGrid.temporary(grid_width, grid_height, stack["layers"], mapped_dir)
+            router = MazeRouter(grid_width, grid_height, bend_penalty, via_penalty, search, frontier, grid=grid, **stack)
+
+            net_lines = []  # (line number, raw line)
+            line_number = 2
+            position = header_end + 1
+            while position < size:
+                end = data.find(b'\n', min(position + PARSE_CHUNK_SIZE, size))
+                if end == -1:
+                    end = size
+                chunk = data[position:end]
+                if _load_chunk(input_file, router.grid, chunk, line_number, net_lines):
+                    router.obstacle_rects = True
+                line_number += chunk.count(b'\n') + 1
+                position = end + 1
+
+    return router, _iter_nets(input_file, router.grid, net_lines)
+
+
+def _parse_header(input_file, line):
+    """Return (width, height, bend_penalty, via_penalty, layer stack keyword arguments).
+
+    The four required fields may be followed by the layer count (default 2),
+    the preferred direction of every layer as a string of H and V ("-" for
+    none) and the wrong-way penalty, one value or one per layer joined by ':'.
+    """
+    fields = [field.strip() for field in line.decode(errors='replace').split(',')]
+    try:
+        if len(fields) > 7:
+            raise ValueError
+        grid_width, grid_height, bend_penalty, via_penalty = map(int, fields[:4])
+        layers = int(fields[4]) if len(fields) > 4 else 2
+    except ValueError:
+        raise InputFormatError(input_file, 1, "expected 'width, height, bend_penalty, via_penalty"
+                                              "[, layers[, directions[, wrong_way_penalties]]]', "
+                                              f"got {', '.join(fields)!r}") from None
+    if grid_width <= 0 or grid_height <= 0:
+        raise InputFormatError(input_file, 1, f"grid size must be positive, got {grid_width}x{grid_height}")
+    if not 1 <= layers <= 255 - VIA_FROM_LAYER:
+        raise InputFormatError(input_file, 1, f"layer count must be between 1 and {255 - VIA_FROM_LAYER}, got {layers}")
+    stack = {"layers": layers}
+    if len(fields) > 5 and fields[5] != "-":
+        directions = fields[5].upper()
+        if len(directions) != layers or set(directions) - set(WRONG_WAY):
+            raise InputFormatError(input_file, 1, f"expected one preferred direction (H or V) for each of the "
+                                                  f"{layers} layers, got {fields[5]!r}")
+        stack["preferred_directions"] = directions
+    if len(fields) > 6:
+        try:
+            penalties = [int(value) for value in fields[6].split(":")]
+        except ValueError:
+            penalties = []
+        if len(penalties) not in (1, layers):
+            raise InputFormatError(input_file, 1, f"expected one wrong-way penalty or one per layer joined by ':', "
+                                                  f"got {fields[6]!r}")
+        stack["wrong_way_penalties"] = penalties if len(penalties) > 1 else penalties[0]
+    return grid_width, grid_height, bend_penalty, via_penalty, stack
+
+
+def _load_chunk(input_file, grid, chunk, first_line, net_lines):
+    """Add the obstacles of one batch of lines to grid and collect its net lines; True if it had an OBSRECT line."""
+    if not chunk.translate(None, OBSTACLE_CHARS):
+        indices = _decode_obstacles(chunk, grid)  # Nothing but OBS characters: decode the batch as is
+        if indices is not None:
+            grid.block_indices(indices)
+            return False
+
+    # Sort the lines out one by one, so that lines like 'OB(0, 1, 1)' are reported as in any other batch
+    rects = False
+    obstacle_lines = []  # (line number, raw line)
+    for line_number, line in enumerate(chunk.split(b'\n'), first_line):
+        line = line.strip()  # Indented lines are fine, as in the original parser
+        if line.startswith(b'OBSRECT'):
+            grid.block_rect(*_parse_rect_line(input_file, line_number, line, grid))
+            rects = True
+        elif line.startswith(b'OBS'):
+            obstacle_lines.append((line_number, line))
+        elif line.startswith(b'net'):
+            net_lines.append((line_number, line))
+        elif line.decode(errors='replace').strip():  # Lines of non-ASCII spaces are blank to str.strip() too
+            log.warning("%s:%d: ignoring unrecognized line %r",
+                        input_file, line_number, line.decode(errors='replace'))
+
+    indices = _decode_obstacles(b'\n'.join(line for _, line in obstacle_lines), grid)
+    if indices is None:
+        # The bulk decoder rejects the lines as a whole: parse them one by one, which reports the first bad line
+        indices = [grid.index(*_parse_obstacle_line(input_file, line_number, line, grid))
+                   for line_number, line in obstacle_lines]
+    grid.block_indices(indices)
+    return rects
+
+
+def _decode_obstacles(block, grid):
+    """Flat grid indices for a block of 'OBS(layer, x, y)' lines, or None if any line is malformed.
+
+    ')' is replaced by a -1 marker and commas by spaces, so that every
+    well-formed line yields exactly four numbers, with or without spaces
+    after the commas; a misplaced field shows up as a missing marker.
+    """
+    count = block.count(b'OBS')
+    if block.count(b'(') != count or block.count(b',') != 2 * count:
+        return None
+    fields = block.replace(b')', b' -1 ').replace(b',', b' ').translate(None, b'OBS(')
+    if numpy is not None:
+        with warnings.catch_warnings():
+            warnings.simplefilter("ignore", DeprecationWarning)
+            values = numpy.fromstring(fields, dtype=numpy.int64, sep=' ')
+        if len(values) != 4 * count:
+            return None
+        values = values.reshape(-1, 4)
+        layers, xs, ys, markers = values.T
+        if count and ((markers != -1).any() or
+                      layers.min() < 0 or layers.max() >= grid.layers or
+                      xs.min() < 0 or xs.max() >= grid.width or
+                      ys.min() < 0 or ys.max() >= grid.height):
+            return None
+        return layers * grid.layer_size + ys * grid.width + xs
+
+    tokens = fields.split()
+    if len(tokens) != 4 * count or tokens[3::4].count(b'-1') != count:
+        return None
+    try:
+        layers = list(map(int, tokens[0::4]))
+        xs = list(map(int, tokens[1::4]))
+        ys = list(map(int, tokens[2::4]))
+    except ValueError:
+        return None
+    if count and (min(layers) < 0 or max(layers) >= grid.layers or
+                  min(xs) < 0 or max(xs) >= grid.width or
+                  min(ys) < 0 or max(ys) >= grid.height):
+        return None
+    layer_size = grid.layer_size
+    width = grid.width
+    return [layer * layer_size + y * width + x for layer, x, y in zip(layers, xs, ys)]
+
+
+def _parse_position(input_file, line_number, text, grid, what):
+    """Parse 'layer, x, y' and check it lies on the grid."""
+    try:
+        layer, x, y = map(int, text.split(b','))
+    except ValueError:
+        raise InputFormatError(input_file, line_number, f"expected {what} 'layer, x, y', "
+                                                        f"got {text.decode(errors='replace').strip()!r}") from None
+    if not grid.in_bounds(layer, x, y):
+        raise InputFormatError(input_file, line_number, f"{what} ({layer}, {x}, {y}) is outside the "
+                                                        f"{grid.layers}x{grid.width}x{grid.height} grid")
+    return layer, x, y
+
+
+def _parse_obstacle_line(input_file, line_number, line, grid):
+    body, close, rest = line.partition(b')')
+    keyword, open_, text = body.partition(b'(')
+    if keyword.strip() != b'OBS' or not open_ or not close or rest.strip():
+        raise InputFormatError(input_file, line_number, f"expected 'OBS(layer, x, y)', "
+                                                        f"got {line.decode(errors='replace').strip()!r}")
+    return _parse_position(input_file, line_number, text, grid, "obstacle")
+
+
+def _parse_rect_line(input_file, line_number, line, grid):
+    """Parse 'OBSRECT(layer, x1, y1, x2, y2)'; both corners are included and must lie on the grid."""
+    body, close, rest = line.partition(b')')
+    keyword, open_, text = body.partition(b'(')
+    try:
+        if keyword.strip() != b'OBSRECT' or not open_ or not close or rest.strip():
+            raise ValueError
+        layer, x1, y1, x2, y2 = map(int, text.split(b','))
+    except ValueError:
+        raise InputFormatError(input_file, line_number, f"expected 'OBSRECT(layer, x1, y1, x2, y2)', "
+                                                        f"got {line.decode(errors='replace').strip()!r}") from None
+    if not (grid.in_bounds(layer, x1, y1) and grid.in_bounds(layer, x2, y2)):
+        raise InputFormatError(input_file, line_number, f"rectangle ({layer}, {x1}, {y1}, {x2}, {y2}) is outside "
+                                                        f"the {grid.layers}x{grid.width}x{grid.height} grid")
+    return layer, x1, y1, x2, y2
+
+
+def _iter_nets(input_file, grid, net_lines):
+    """Yield (net name, [(layer, x, y), ...]) for every net line, in file order.
+
+    Like the original format, a pin is whatever follows a '(' up to the next ')'.
+    """
+    for line_number, line in net_lines:
+        name, *pieces = line.split(b'(')
+        if not pieces:
+            raise InputFormatError(input_file, line_number, "net has no pins")
+        pins = [_parse_position(input_file, line_number, piece.split(b')')[0], grid, "pin") for piece in pieces]
+        yield name.strip().decode(), pins
 
 
 def main():
-    # Check for the correct number of arguments
-    if len(sys.argv) != 3:
-        print("Usage: python router.py <input_file> <output_file>")
-        return
+    parser = argparse.ArgumentParser(description="Route nets on a two-layer grid.")
+    parser.add_argument("input_file")
+    parser.add_argument("output_file")
+    parser.add_argument("--search", choices=("dijkstra", "astar", "bidirectional", "wavefront"), default="dijkstra",
+                        help="uniform-cost search, A* with a bend/via-aware lower bound, "
+                             "uniform-cost search from both pins at once, "
+                             "or a NumPy Lee wavefront (bend penalty 0 only)")
+    parser.add_argument("--frontier", choices=("auto", "bucket", "heap"), default="auto",
+                        help="search queue; auto picks the bucket queue for integer penalties")
+    parser.add_argument("--negotiate", type=int, default=0, metavar="ITERATIONS",
+                        help="negotiated congestion routing (rip-up and reroute) for up to this many iterations")
+    parser.add_argument("--tree", action="store_true",
+                        help="route multi-pin nets as trees; branches are separated by '|' in the output")
+    parser.add_argument("--window", type=int, metavar="MARGIN",
+                        help="search only the pins' bounding box plus MARGIN cells, growing it when no path fits")
+    parser.add_argument("--distance-cache", type=float, metavar="MB",
+                        help="keep finished dijkstra searches in an LRU cache of this many megabytes and reuse them "
+                             "while the cells they explored are unchanged")
+    parser.add_argument("--format", choices=("cells", "runs", "binary"), default="cells",
+                        help="output paths cell by cell, as a start point plus straight runs, "
+                             "or as runs in a binary record file")
+    parser.add_argument("--save-snapshot", metavar="FILE",
+                        help="save the grid, nets and routes to a binary snapshot after routing; "
+                             "pass the snapshot as input_file to resume from it")
+    parser.add_argument("--snapshot-every", type=int, default=0, metavar="NETS",
+                        help="also save the snapshot every NETS routed nets")
+    parser.add_argument("--jobs", type=int, default=1, metavar="N",
+                        help="route consecutive nets with disjoint pin boxes in N worker processes; "
+                             "the output is the same as with one")
+    parser.add_argument("--tiles", type=int, metavar="SIZE",
+                        help="route tile by tile on SIZE x SIZE tiles, keeping the grid in a memory-mapped file; "
+                             "nets spanning tiles go through a corridor chosen on the tile graph")
+    parser.add_argument("--global-route", type=int, metavar="GCELL",
+                        help="route every net on GCELL x GCELL blocks first, balancing their capacity, "
+                             "then search each net only inside the blocks it was given")
+    parser.add_argument("--halo", type=int, metavar="CELLS",
+                        help=f"cells loaded around each tile or corridor (default {DEFAULT_HALO} with --tiles, "
+                             f"{DEFAULT_GLOBAL_HALO} with --global-route)")
+    parser.add_argument("--stats", action="store_true",
+                        help="record per-segment and per-net search counters and write them next to output_file "
+                             "as .segments.csv, .nets.csv and .stats.json")
+    parser.add_argument("--profile-net", action="append", default=[], metavar="NET",
+                        help="run cProfile while routing this net (repeatable) and save it as "
+                             "<output_file>.<NET>.prof; implies --stats")
+    parser.add_argument("-v", "--verbose", action="store_true",
+                        help="log every net, segment and obstacle instead of the summary only")
+    parser.add_argument("-q", "--quiet", action="store_true", help="log errors only")
+    parser.add_argument("--trace-file", help="write one JSON record per net to this file")
+    args = parser.parse_args()
+    if args.tree and args.negotiate:
+        parser.error("--tree cannot be combined with --negotiate")
+    if args.window is not None and args.distance_cache:
+        parser.error("--window cannot be combined with --distance-cache: window searches run on a copy of the "
+                     "window and never consult the cache")
+    if args.jobs > 1 and (args.negotiate or args.distance_cache or args.stats or args.profile_net):
+        parser.error("--jobs cannot be combined with --negotiate, --distance-cache, --stats or --profile-net")
+    if (args.tiles or args.global_route) and (args.negotiate or args.jobs > 1 or args.window is not None
+                                              or args.distance_cache or args.stats or args.profile_net):
+        parser.error("--tiles and --global-route cannot be combined with --negotiate, --jobs, --window, "
+                     "--distance-cache, --stats or --profile-net")
+    if args.tiles and args.global_route:
+        parser.error("--tiles and --global-route cannot be combined")
+    if (args.tiles is not None and args.tiles <= 0) or (args.global_route is not None and args.global_route <= 0):
+        parser.error("--tiles and --global-route need a positive size")
+    if args.snapshot_every and not args.save_snapshot:
+        parser.error("--snapshot-every needs --save-snapshot")
+
+    level = logging.DEBUG if args.verbose else logging.ERROR if args.quiet else logging.INFO
+    logging.basicConfig(level=level, format="%(message)s", stream=sys.stdout)
+    if args.trace_file:
+        enable_trace(args.trace_file)
 
     # Get file paths from command-line arguments
-    input_file = sys.argv[1]
-    output_file = sys.argv[2]
+    input_file = args.input_file
+    output_file = args.output_file
 
-    print("Starting routing process...")
-    router, nets = parse_input(input_file)
+    log.debug("Starting routing process...")
+    try:
+        mapped_dir = os.path.dirname(os.path.abspath(output_file)) if args.tiles else None  # Not /tmp, often in RAM
+        router, nets = parse_input(input_file, args.search, args.frontier, mapped_dir)
+    except (ValueError, OSError) as e:  # InputFormatError, or a snapshot that cannot be read
+        log.error("Error while parsing input file: %s", e)
+        sys.exit(1)
 
+    if router and args.search == "wavefront" and not wavefront.supported(router):
+        log.warning("--search wavefront needs NumPy, no bend or wrong-way penalty and an integer via penalty; "
+                    "using dijkstra")
     if router and nets:
+        router.negotiation_iterations = args.negotiate
+        router.tree = args.tree or router.tree  # A resumed snapshot keeps its routing mode
+        router.window_margin = args.window
+        router.output_format = args.format
+        router.jobs = args.jobs
+        router.tile_size = args.tiles
+        router.gcell_size = args.global_route
+        router.tile_halo = args.halo
+        if args.distance_cache:
+            router.distance_cache = DistanceCache(int(args.distance_cache * 2 ** 20))
+        if args.save_snapshot:
+            if router.routes is None:
+                router.routes = {}
+            router.snapshot_file = args.save_snapshot
+            router.snapshot_every = args.snapshot_every
+        if args.stats or args.profile_net:
+            router.stats = SearchStats(args.profile_net, cprofile_hook(output_file))
         router.generate_output(nets, output_file)
-        print(f"Routing completed. Output saved to {output_file}")
+        if router.stats is not None:
+            log.info("Search statistics saved to %s", ", ".join(router.stats.dump(output_file)))
+        if args.save_snapshot:
+            router.save_snapshot(args.save_snapshot, nets)
+        log.info("Routing completed. Output saved to %s", output_file)
     else:
-        print("Failed to initialize router or parse nets. Exiting...")
+        log.error("Failed to initialize router or parse nets. Exiting...")
 
 if __name__ == "__main__":
     main()
@@ -0,0 +1,2 @@
+"""Benchmarks for the routers: design generator (generate.py), suite runner with JSON history (run.py)
+and the frontier comparison (bench_frontier.py)."""
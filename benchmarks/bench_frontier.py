@@ -0,0 +1,76 @@
+"""Compare the heap and bucket-queue frontiers of MazeRouter.bfs.
+
+Usage:
+    python benchmarks/bench_frontier.py [--sizes 100,250,500,1000] [--search astar]
+    python benchmarks/bench_frontier.py --sizes 2000,4000 --segments 1 --density 0.005
+
+Each size builds a square two-layer grid with random obstacles and routes the
+same segments with both frontiers, printing wall time and expanded nodes.
+Segments are routed one after another and claim their cells, so totals can
+differ slightly between frontiers when equal-cost paths are broken differently.
+"""
+import argparse
+import os
+import random
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from Router import MazeRouter  # noqa: E402
+
+
+def build_router(size, density, seed, search, frontier):
+    rng = random.Random(seed)
+    router = MazeRouter(size, size, 3, 10, search, frontier)
+    for _ in range(int(2 * size * size * density)):
+        router.grid.block(rng.randrange(2), rng.randrange(size), rng.randrange(size))
+    return router
+
+
+def segments(size, count, seed):
+    """Long diagonal segments between random points in opposite corners."""
+    rng = random.Random(seed + 1)
+    corner = max(size // 10, 1)
+    for _ in range(count):
+        start = (rng.randrange(2), rng.randrange(corner), rng.randrange(corner))
+        end = (rng.randrange(2), size - 1 - rng.randrange(corner), size - 1 - rng.randrange(corner))
+        yield start, end
+
+
+def run(size, frontier, args):
+    router = build_router(size, args.density, args.seed, args.search, frontier)
+    routed = 0
+    elapsed = 0.0
+    for start, end in segments(size, args.segments, args.seed):
+        for pin in (start, end):
+            router.grid.cells[router.grid.index(*pin)] = 0  # Keep the pins reachable
+        began = time.perf_counter()
+        if router.bfs(start, end) is not None:
+            routed += 1
+        elapsed += time.perf_counter() - began
+    return elapsed, router.nodes_expanded, router.total_cost, routed
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--sizes", default="100,250,500,1000")
+    parser.add_argument("--search", choices=("dijkstra", "astar", "bidirectional"), default="astar")
+    parser.add_argument("--density", type=float, default=0.02)
+    parser.add_argument("--segments", type=int, default=3)
+    parser.add_argument("--seed", type=int, default=1)
+    args = parser.parse_args()
+
+    print(f"{'size':>6} {'frontier':>8} {'seconds':>9} {'expanded':>10} {'cost':>8} {'routed':>6}")
+    for size in map(int, args.sizes.split(",")):
+        results = {}
+        for frontier in ("heap", "bucket"):
+            results[frontier] = run(size, frontier, args)
+            elapsed, expanded, cost, routed = results[frontier]
+            print(f"{size:>6} {frontier:>8} {elapsed:>9.3f} {expanded:>10} {cost:>8} {routed:>6}")
+        speedup = results["heap"][0] / max(results["bucket"][0], 1e-9)
+        print(f"{size:>6} {'speedup':>8} {speedup:>9.2f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,83 @@
+"""Seeded generator of synthetic designs in the router input format.
+
+Usage:
+    python -m benchmarks.generate design.txt --width 200 --height 200 --density 0.03 --macros 8 --nets 50 --pins 3
+    python -m benchmarks.generate design.txt --seed 7 --no-rects
+
+A design is a two-layer grid with randomly scattered single-cell obstacles
+(density is the share of cells blocked that way), rectangular macros that
+block a block of cells on one layer, and nets whose pins sit on distinct
+free cells. The same arguments and seed always give the same file.
+"""
+import argparse
+import random
+
+
+def generate_design(width, height, density=0.02, macros=0, nets=10, pins=2, bend_penalty=3, via_penalty=10,
+                    seed=1, rects=True):
+    """Return the lines of a random design (without line breaks).
+
+    Macros are written as OBSRECT lines, or expanded into OBS lines with
+    rects=False for routers that only read single-cell obstacles. Each macro
+    spans 5-15% of the grid in each direction.
+    """
+    rng = random.Random(seed)
+    blocked = set()
+    lines = [f"{width}, {height}, {bend_penalty}, {via_penalty}"]
+    for _ in range(macros):
+        layer = rng.randrange(2)
+        w = max(1, int(width * rng.uniform(0.05, 0.15)))
+        h = max(1, int(height * rng.uniform(0.05, 0.15)))
+        x1 = rng.randrange(width - w + 1)
+        y1 = rng.randrange(height - h + 1)
+        x2, y2 = x1 + w - 1, y1 + h - 1
+        cells = [(layer, x, y) for y in range(y1, y2 + 1) for x in range(x1, x2 + 1)]
+        blocked.update(cells)
+        if rects:
+            lines.append(f"OBSRECT({layer}, {x1}, {y1}, {x2}, {y2})")
+        else:
+            lines.extend(f"OBS({layer}, {x}, {y})" for layer, x, y in cells)
+    for _ in range(int(2 * width * height * density)):
+        cell = (rng.randrange(2), rng.randrange(width), rng.randrange(height))
+        if cell not in blocked:
+            blocked.add(cell)
+            lines.append(f"OBS({cell[0]}, {cell[1]}, {cell[2]})")
+    if 2 * width * height - len(blocked) < nets * pins:
+        raise ValueError("not enough free cells for the pins")
+    for net in range(1, nets + 1):
+        net_pins = []
+        while len(net_pins) < pins:
+            cell = (rng.randrange(2), rng.randrange(width), rng.randrange(height))
+            if cell not in blocked:
+                blocked.add(cell)  # No two pins share a cell
+                net_pins.append(cell)
+        lines.append(f"net{net} " + " ".join(f"({layer}, {x}, {y})" for layer, x, y in net_pins))
+    return lines
+
+
+def write_design(path, **parameters):
+    """Write generate_design(**parameters) to path."""
+    with open(path, 'w') as f:
+        f.write("\n".join(generate_design(**parameters)) + "\n")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("output_file")
+    parser.add_argument("--width", type=int, default=100)
+    parser.add_argument("--height", type=int, default=100)
+    parser.add_argument("--density", type=float, default=0.02, help="share of cells blocked by single obstacles")
+    parser.add_argument("--macros", type=int, default=0, help="number of rectangular macros")
+    parser.add_argument("--nets", type=int, default=10)
+    parser.add_argument("--pins", type=int, default=2, help="pins per net")
+    parser.add_argument("--bend-penalty", type=int, default=3)
+    parser.add_argument("--via-penalty", type=int, default=10)
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--no-rects", dest="rects", action="store_false", help="write macros as OBS lines")
+    args = parser.parse_args()
+    parameters = vars(args)
+    write_design(parameters.pop("output_file"), **parameters)
+
+
+if __name__ == "__main__":
+    main()
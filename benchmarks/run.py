@@ -0,0 +1,261 @@
+"""Run every router variant on generated designs and keep the results in a JSON history.
+
+Usage:
+    python -m benchmarks.run [--suite quick|standard|large] [--variants router-dijkstra,final,lee]
+    python -m benchmarks.run --compare
+
+Each (design, variant) pair runs in a fresh process and reports wall time
+(parsing, routing and writing the output), nodes expanded, priority queue
+operations, peak resident memory of the process, routed nets and total cost.
+The run is appended to benchmarks/history.json (ignored by git, so runs do
+not dirty the tree) together with the commit it was made on, and --compare
+prints the last run against the one before it.
+
+Variants:
+    router-<search>  top-level Router.py with --search dijkstra, astar, bidirectional or wavefront
+    final            Final_Maze-Router/Router.py (length ordering, one process)
+    lee              the plain BFS of Maze-Router/main.py; it has no vias and does not
+                     claim routed cells, its cost is recomputed from the output paths
+"""
+import argparse
+import contextlib
+from datetime import datetime, timezone
+import importlib.util
+import io
+import json
+import multiprocessing
+import os
+import platform
+import subprocess
+import sys
+import tempfile
+import time
+
+try:
+    import resource
+except ImportError:  # Not on Windows; peak memory is then not reported
+    resource = None
+
+from benchmarks.generate import write_design
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+HISTORY_FILE = os.path.join(ROOT, "benchmarks", "history.json")
+
+SUITES = {
+    "quick": [
+        {"name": "open-40", "width": 40, "height": 40, "density": 0.02, "macros": 0, "nets": 10, "pins": 2},
+        {"name": "macros-60", "width": 60, "height": 60, "density": 0.03, "macros": 6, "nets": 15, "pins": 3},
+    ],
+    "standard": [
+        {"name": "open-150", "width": 150, "height": 150, "density": 0.02, "macros": 0, "nets": 40, "pins": 2},
+        {"name": "macros-200", "width": 200, "height": 200, "density": 0.03, "macros": 10, "nets": 60, "pins": 3},
+        {"name": "dense-100", "width": 100, "height": 100, "density": 0.15, "macros": 4, "nets": 40, "pins": 4},
+    ],
+    "large": [
+        {"name": "macros-500", "width": 500, "height": 500, "density": 0.02, "macros": 20, "nets": 100, "pins": 3},
+    ],
+}
+VARIANTS = ("router-dijkstra", "router-astar", "router-bidirectional", "final", "lee")
+
+
+def _load_module(name, path):
+    """Import a router script that is not on sys.path under a module name of its own."""
+    spec = importlib.util.spec_from_file_location(name, path)
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module
+
+
+def _run_router(design_file, output_file, search):
+    import frontier
+    import Router
+
+    counts = {"queue_ops": 0}
+    for name, frontier_class in list(frontier.FRONTIERS.items()):
+        class CountingFrontier(frontier_class):
+            def push(self, priority, item):
+                counts["queue_ops"] += 1
+                super().push(priority, item)
+
+            def pop(self):
+                counts["queue_ops"] += 1
+                return super().pop()
+
+        frontier.FRONTIERS[name] = CountingFrontier
+    router, nets = Router.parse_input(design_file, search)
+    router.generate_output(nets, output_file)
+    return {"nodes_expanded": router.nodes_expanded, "queue_ops": counts["queue_ops"],
+            "total_cost": router.total_cost, "nets": len(nets)}
+
+
+def _run_final(design_file, output_file):
+    final = _load_module("final_router", os.path.join(ROOT, "Final_Maze-Router", "Router.py"))
+    counts = {"pops": 0, "pushes": 0}
+    heappush, heappop = final.heappush, final.heappop
+
+    def counting_push(heap, item):
+        counts["pushes"] += 1
+        heappush(heap, item)
+
+    def counting_pop(heap):
+        counts["pops"] += 1
+        return heappop(heap)
+
+    final.heappush, final.heappop = counting_push, counting_pop
+    router, nets = final.parse_input(design_file)
+    router.workers = 1
+    router.generate_output(nets, output_file)
+    return {"nodes_expanded": counts["pops"], "queue_ops": counts["pops"] + counts["pushes"],
+            "total_cost": router.total_cost, "nets": len(nets)}
+
+
+def _run_lee(design_file, output_file):
+    from negotiation import segment_cost
+
+    lee = _load_module("lee_router", os.path.join(ROOT, "Maze-Router", "main.py"))
+    counts = {"pops": 0, "pushes": 0}
+
+    class CountingDeque(lee.deque):
+        def append(self, item):
+            counts["pushes"] += 1
+            super().append(item)
+
+        def popleft(self):
+            counts["pops"] += 1
+            return super().popleft()
+
+    lee.deque = CountingDeque
+    with contextlib.redirect_stdout(io.StringIO()):  # It prints every obstacle and net
+        router, nets = lee.parse_input(design_file)
+        router.generate_output(nets, output_file)
+    total_cost = sum(segment_cost(path, router.bend_penalty, router.via_penalty)
+                     for path in _routed_paths(output_file))
+    return {"nodes_expanded": counts["pops"], "queue_ops": counts["pops"] + counts["pushes"],
+            "total_cost": total_cost, "nets": len(nets)}
+
+
+def _routed_paths(output_file):
+    """Paths of the routed nets in an output file, as lists of (layer, x, y)."""
+    with open(output_file) as f:
+        for line in f:
+            if line.startswith("Summary:"):
+                break
+            if not line.startswith("net") or "failed to route" in line:
+                continue
+            yield [tuple(map(int, part.split(")")[0].split(","))) for part in line.split("(")[1:]]
+
+
+def _measure(variant, design_file, cells_design_file):
+    """Run one variant in this (fresh) process and return its metrics."""
+    with tempfile.TemporaryDirectory() as directory:
+        output_file = os.path.join(directory, "output.txt")
+        started = time.perf_counter()
+        if variant.startswith("router-"):
+            metrics = _run_router(design_file, output_file, variant[len("router-"):])
+        elif variant == "final":
+            metrics = _run_final(cells_design_file, output_file)
+        elif variant == "lee":
+            metrics = _run_lee(cells_design_file, output_file)
+        else:
+            raise ValueError(f"unknown variant {variant!r}, expected router-<search>, final or lee")
+        metrics["seconds"] = round(time.perf_counter() - started, 4)
+        metrics["routed"] = sum(1 for _ in _routed_paths(output_file))
+    if resource is not None:
+        peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss  # KiB on Linux, bytes on macOS
+        metrics["peak_rss_mb"] = round(peak / (2 ** 20 if sys.platform == "darwin" else 2 ** 10), 1)
+    return metrics
+
+
+def _git(*args):
+    try:
+        return subprocess.run(["git", *args], cwd=ROOT, capture_output=True, text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def run_suite(designs, variants, seed):
+    """Route every design with every variant; return the list of result records."""
+    results = []
+    context = multiprocessing.get_context("spawn")
+    with tempfile.TemporaryDirectory() as directory:
+        for design in designs:
+            parameters = {key: value for key, value in design.items() if key != "name"}
+            design_file = os.path.join(directory, f"{design['name']}.txt")
+            cells_design_file = os.path.join(directory, f"{design['name']}-cells.txt")
+            write_design(design_file, seed=seed, **parameters)
+            write_design(cells_design_file, seed=seed, rects=False, **parameters)  # For routers without OBSRECT
+            for variant in variants:
+                with context.Pool(1) as pool:  # A fresh process per run keeps peak memory and patches separate
+                    metrics = pool.apply(_measure, (variant, design_file, cells_design_file))
+                record = {"design": design["name"], "variant": variant, "seed": seed, **parameters, **metrics}
+                results.append(record)
+                print(f"{design['name']:>12} {variant:>22} {metrics['seconds']:>9.3f} "
+                      f"{metrics['nodes_expanded']:>10} {metrics['queue_ops']:>10} "
+                      f"{metrics.get('peak_rss_mb', '-'):>8} {metrics['routed']:>4}/{metrics['nets']:<4} "
+                      f"{metrics['total_cost']:>8}", flush=True)
+    return results
+
+
+def load_history(history_file=HISTORY_FILE):
+    if not os.path.exists(history_file):
+        return []
+    with open(history_file) as f:
+        return json.load(f)
+
+
+def compare(previous, latest):
+    """Print the latest run against the previous one for every (design, variant) in both."""
+    before = {(record["design"], record["variant"]): record for record in previous["results"]}
+    print(f"{previous['commit'] or '?'} -> {latest['commit'] or '?'}")
+    print(f"{'design':>12} {'variant':>22} {'seconds':>17} {'speedup':>8} {'expanded':>21} {'cost':>17}")
+    for record in latest["results"]:
+        old = before.get((record["design"], record["variant"]))
+        if old is None:
+            continue
+        speedup = old["seconds"] / max(record["seconds"], 1e-9)
+        print(f"{record['design']:>12} {record['variant']:>22} {old['seconds']:>8.3f}{record['seconds']:>9.3f} "
+              f"{speedup:>7.2f}x {old['nodes_expanded']:>10}{record['nodes_expanded']:>11} "
+              f"{old['total_cost']:>8}{record['total_cost']:>9}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--suite", choices=SUITES, default="quick")
+    parser.add_argument("--variants", default=",".join(VARIANTS), help="comma-separated, see the module docstring")
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--history", default=HISTORY_FILE, help="JSON file the run is appended to")
+    parser.add_argument("--no-save", dest="save", action="store_false", help="do not append to the history")
+    parser.add_argument("--compare", action="store_true", help="only compare the last two runs in the history")
+    args = parser.parse_args()
+
+    history = load_history(args.history)
+    if args.compare:
+        if len(history) < 2:
+            parser.error(f"{args.history} holds fewer than two runs")
+        compare(history[-2], history[-1])
+        return
+
+    print(f"{'design':>12} {'variant':>22} {'seconds':>9} {'expanded':>10} {'queue ops':>10} "
+          f"{'peak MB':>8} {'routed':>9} {'cost':>8}")
+    results = run_suite(SUITES[args.suite], args.variants.split(","), args.seed)
+    run = {
+        "date": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+        "commit": _git("rev-parse", "--short", "HEAD"),
+        "dirty": bool(_git("status", "--porcelain", "--untracked-files=no")),
+        "suite": args.suite,
+        "python": platform.python_version(),
+        "machine": platform.machine(),
+        "results": results,
+    }
+    if args.save:
+        history.append(run)
+        with open(args.history, "w") as f:
+            json.dump(history, f, indent=1)
+        previous = [old for old in history[:-1] if old["suite"] == args.suite]
+        if previous:
+            print()
+            compare(previous[-1], run)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,121 @@
+from array import array
+from bisect import bisect_left
+from collections import OrderedDict
+
+
+class CachedSearch:
+    """The settled part of one single-source search: final cost and parent code per state.
+
+    States are kept sorted so a lookup is a binary search. Every state with
+    a cost up to radius is final; a state that is not stored costs more.
+    bbox is the bounding box (x1, y1, x2, y2) of the cells the search
+    looked at, and version the grid version it is known to be valid for.
+    """
+
+    def __init__(self, states, costs, parents, radius, bbox, version):
+        self.states = states
+        self.costs = costs
+        self.parents = parents
+        self.radius = radius
+        self.bbox = bbox
+        self.version = version
+
+    @property
+    def nbytes(self):
+        return self.states.itemsize * len(self.states) + self.costs.itemsize * len(self.costs) + len(self.parents)
+
+    def _position(self, state):
+        position = bisect_left(self.states, state)
+        if position < len(self.states) and self.states[position] == state:
+            return position
+        return None
+
+    def cost(self, state):
+        """Final cost of state, or None if the search did not settle it."""
+        position = self._position(state)
+        return None if position is None else self.costs[position]
+
+    def __getitem__(self, state):
+        """Parent code of a settled state, so the entry can stand in for came_from."""
+        return self.parents[self._position(state)]
+
+
+def settled_search(touched, cost_so_far, came_from, radius, grid, states_per_cell):
+    """Build a CachedSearch from the arrays of a finished search; radius is the last popped cost."""
+    states = sorted(state for state in touched if cost_so_far[state] <= radius)
+    costs = array('i', (cost_so_far[state] for state in states))
+    parents = bytearray(came_from[state] for state in states)
+    return CachedSearch(array('i', states), costs, parents, radius, explored_box(touched, grid, states_per_cell),
+                        grid.version)
+
+
+def explored_box(touched, grid, states_per_cell):
+    """Bounding box (x1, y1, x2, y2) of the cells of the search states in touched."""
+    layer_size = grid.layer_size
+    width = grid.width
+    x1 = y1 = float('inf')
+    x2 = y2 = -1
+    for state in touched:
+        y, x = divmod(state // states_per_cell % layer_size, width)
+        x1 = min(x1, x)
+        x2 = max(x2, x)
+        y1 = min(y1, y)
+        y2 = max(y2, y)
+    return x1, y1, x2, y2
+
+
+def box_changed(box, changes):
+    """True if any change box is within one cell (the reach of a single step) of box."""
+    x1, y1, x2, y2 = box
+    return any(cx1 <= x2 + 1 and x1 - 1 <= cx2 and cy1 <= y2 + 1 and y1 - 1 <= cy2 for cx1, cy1, cx2, cy2 in changes)
+
+
+class DistanceCache:
+    """LRU cache of single-source search results, bounded by their memory use.
+
+    Keys are (source, bend penalty, via penalty, step costs). Blocking or
+    claiming cells can only make paths dearer, so after such changes every
+    cached cost is still a lower bound, and a cached path whose cells are
+    all still FREE is still a cheapest one; MazeRouter._cached_bfs() checks
+    that before using it. A search that could not reach a cell still cannot.
+    Only changes that free cells can open cheaper paths: on lookup those
+    logged since the entry's version are checked against its bounding box
+    grown by one cell, the reach of a single step, and drop the entry.
+    """
+
+    def __init__(self, max_bytes):
+        self.max_bytes = max_bytes
+        self.entries = OrderedDict()
+        self.nbytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.invalidated = 0
+        self.evicted = 0
+
+    def lookup(self, key, grid):
+        """The entry for key if it is still valid for grid, else None."""
+        entry = self.entries.get(key)
+        if entry is None:
+            return None
+        changes = grid.changes_since(entry.version, freed_only=True)
+        if changes is None or box_changed(entry.bbox, changes):
+            self._remove(key)
+            self.invalidated += 1
+            return None
+        entry.version = grid.version
+        self.entries.move_to_end(key)
+        return entry
+
+    def store(self, key, entry):
+        if key in self.entries:
+            self._remove(key)
+        if entry.nbytes > self.max_bytes:
+            return
+        self.entries[key] = entry
+        self.nbytes += entry.nbytes
+        while self.nbytes > self.max_bytes:
+            self._remove(next(iter(self.entries)))
+            self.evicted += 1
+
+    def _remove(self, key):
+        self.nbytes -= self.entries.pop(key).nbytes
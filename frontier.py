@@ -0,0 +1,83 @@
+from collections import deque
+from heapq import heappop, heappush
+
+BUCKET_MAX_PENALTY = 1024  # Above this a bucket per priority costs more than a heap
+
+
+class HeapFrontier:
+    """Binary-heap priority queue; works for any comparable priorities."""
+
+    def __init__(self):
+        self._heap = []
+
+    def push(self, priority, item):
+        heappush(self._heap, (priority, item))
+
+    def pop(self):
+        """Remove and return the item with the lowest priority, or None when empty."""
+        if not self._heap:
+            return None
+        return heappop(self._heap)[1]
+
+
+class BucketFrontier:
+    """Bucket queue (Dial's algorithm) for non-negative integer priorities.
+
+    Items are kept in the list at index priority and popped from the
+    lowest non-empty bucket. The search only ever pushes priorities at or
+    above the one it just popped, so the scan pointer moves forward and
+    finding the next bucket is O(1) amortized. A lower push simply moves the
+    pointer back. Each bucket is a FIFO, so items of equal priority come
+    out in the order they were pushed, without comparing them; HeapFrontier
+    orders them by the items instead, so the two can pick different paths
+    among equally cheap ones.
+    """
+
+    def __init__(self):
+        self._buckets = []  # priority -> deque of items, None if never used
+        self._current = 0  # No item has a priority below this
+        self._size = 0
+
+    def push(self, priority, item):
+        buckets = self._buckets
+        if priority >= len(buckets):
+            buckets.extend([None] * max(priority + 1 - len(buckets), len(buckets)))
+        bucket = buckets[priority]
+        if bucket is None:
+            buckets[priority] = deque((item,))
+        else:
+            bucket.append(item)
+        if priority < self._current:
+            self._current = priority
+        self._size += 1
+
+    def pop(self):
+        """Remove and return an item with the lowest priority, or None when empty."""
+        if not self._size:
+            return None
+        buckets = self._buckets
+        current = self._current
+        while not buckets[current]:
+            current += 1
+        self._current = current
+        self._size -= 1
+        return buckets[current].popleft()
+
+
+FRONTIERS = {
+    "heap": HeapFrontier,
+    "bucket": BucketFrontier,
+}
+
+
+def choose_frontier(*penalties):
+    """Bucket queue when every edge cost is a small non-negative integer, heap otherwise.
+
+    penalties are the costs added to unit steps: bend, via and any wrong-way
+    penalties. The bucket list grows to the largest priority pushed, so with
+    a penalty above BUCKET_MAX_PENALTY it would mostly hold empty buckets.
+    Searches with per-cell costs always use the heap, see MazeRouter._frontier().
+    """
+    if all(isinstance(p, int) and 0 <= p <= BUCKET_MAX_PENALTY for p in penalties):
+        return "bucket"
+    return "heap"
@@ -0,0 +1,135 @@
+import logging
+import time
+
+from output_writer import compress_path
+from routing_grid import FREE
+from tiled import TiledRouting
+
+log = logging.getLogger("maze_router")
+
+GLOBAL_ITERATIONS = 8  # Rounds of rip-up and reroute on the GCell graph
+DEFAULT_GLOBAL_HALO = 2  # Cells around a corridor's GCells that the detailed search may also use
+
+
+class GlobalRouting(TiledRouting):
+    """Two-level routing: every net on a coarse GCell graph first, then cell by cell inside its corridor.
+
+    GCells are gcell_size x gcell_size blocks of the grid. The capacity of
+    the boundary between two adjacent GCells is the number of tracks, one
+    per layer and row (or column), whose cells on both sides of it are
+    free, so obstacles lower it. Global routing joins the GCells of each
+    net's pins like TiledRouting.corridor(); crossing a boundary costs 1
+    plus its history cost plus present_factor per net over its capacity.
+    After a round, every overflowing boundary gets more history cost and
+    only the nets crossing one are routed again (PathFinder on GCells,
+    like negotiation.py on cells). The GCells a net ends up on are its
+    corridor.
+
+    Detailed routing then takes the nets in their normal order and routes
+    each with MazeRouter.route_net (or route_tree) in a window of its
+    corridor plus halo cells, with everything else blocked, so every
+    search only looks at the corridor (in legs if the corridor is sparse,
+    see TiledRouting.route_corridor()). A net that fails there is ripped
+    up and retried in the corridor grown by a ring of GCells, and finally
+    on the whole grid.
+    """
+
+    def __init__(self, router, gcell_size, halo=DEFAULT_GLOBAL_HALO, iterations=GLOBAL_ITERATIONS):
+        super().__init__(router, gcell_size, halo)
+        self.iterations = iterations
+        self.present_factor = 1.0
+        self._capacity = {}  # (GCell, GCell) with the smaller first -> free tracks across their boundary
+        self.demand = {}  # Same keys -> nets crossing the boundary
+        self.history = {}
+        self.rounds = 0
+        self.overflow = 0  # Boundaries still over capacity after the last round
+        self.widened = 0  # Nets routed in a grown corridor
+        self.unrestricted = 0  # Nets routed on the whole grid after failing in their corridor
+
+    def capacity(self, edge):
+        """Free tracks across the boundary between the two adjacent GCells of edge."""
+        if edge not in self._capacity:
+            (ax, ay), (bx, by) = edge
+            grid = self.router.grid
+            cells = grid.cells
+            if ax != bx:  # Side by side: one track per row, from the last column of a into b
+                x1, y1, _, y2 = self.tile_box((bx, by))
+                pairs = [(grid.index(layer, x1 - 1, y), 1) for layer in range(grid.layers) for y in range(y1, y2 + 1)]
+            else:  # Above each other: one track per column
+                x1, y1, x2, _ = self.tile_box((bx, by))
+                pairs = [(grid.index(layer, x, y1 - 1), grid.width)
+                         for layer in range(grid.layers) for x in range(x1, x2 + 1)]
+            self._capacity[edge] = sum(1 for index, step in pairs
+                                       if cells[index] == FREE and cells[index + step] == FREE)
+        return self._capacity[edge]
+
+    def step_cost(self, tile, neighbor):
+        edge = (tile, neighbor) if tile < neighbor else (neighbor, tile)
+        over = self.demand.get(edge, 0) + 1 - self.capacity(edge)
+        return 1 + self.history.get(edge, 0) + self.present_factor * max(over, 0)
+
+    def global_route(self, nets):
+        """Corridor GCells of every net: {net name: set of GCells}."""
+        corridors = {}
+        crossings = {}  # Net -> boundaries it crosses
+        todo = list(nets)
+        for round_number in range(1, self.iterations + 1):
+            self.rounds = round_number
+            for net_name in todo:
+                for edge in crossings.get(net_name, ()):
+                    self.demand[edge] -= 1
+                pins = nets[net_name]
+                tiles = {self.tile_of(pins[0])}
+                edges = set()
+                for pin in pins[1:]:
+                    target = self.tile_of(pin)
+                    if target in tiles:
+                        continue
+                    path = self.tile_path(tiles, target)
+                    tiles.update(path)
+                    edges.update((a, b) if a < b else (b, a) for a, b in zip(path, path[1:]))
+                for edge in edges:
+                    self.demand[edge] = self.demand.get(edge, 0) + 1
+                corridors[net_name] = tiles
+                crossings[net_name] = edges
+            overflowing = {edge for edge, use in self.demand.items() if use > self.capacity(edge)}
+            self.overflow = len(overflowing)
+            log.debug("Global routing round %d: %d nets routed, %d boundaries over capacity",
+                      self.rounds, len(todo), self.overflow)
+            if not overflowing:
+                break
+            for edge in overflowing:
+                self.history[edge] = self.history.get(edge, 0) + 1
+            self.present_factor *= 2
+            todo = [net_name for net_name in nets if crossings[net_name] & overflowing]
+        return corridors
+
+    def route(self, nets):
+        """Route {net name: pins}; return {net name: [(start, runs) per branch] or None} like TiledRouting.route()."""
+        router = self.router
+        started = time.perf_counter()
+        corridors = self.global_route(nets)
+        global_seconds = time.perf_counter() - started
+        routes = {}
+        for net_name, pins in nets.items():
+            tiles = corridors[net_name]
+            branches = None
+            for attempt in range(2):
+                branches = self.route_corridor(net_name, pins, tiles)
+                if branches is not None or attempt:
+                    break
+                self.widened += 1
+                tiles = self.grow(tiles)
+            if branches is None:
+                self.unrestricted += 1
+                result = (router.route_tree if router.tree else router.route_net)(pins, net_name)
+                routes[net_name] = None if result is None else [
+                    (branch[0], compress_path(branch)) for branch in (result if router.tree else [result])]
+                continue
+            router.record_route(branches)
+            routes[net_name] = [(branch[0], compress_path(branch)) for branch in branches]
+        log.info("Global routing: %dx%d GCells of %d cells, %d rounds in %.2f s, %d boundaries over capacity; "
+                 "%d nets routed in legs, %d widened, %d routed on the whole grid",
+                 self.columns, self.rows, self.tile_size, self.rounds, global_seconds, self.overflow,
+                 self.legged_nets, self.widened, self.unrestricted)
+        return routes
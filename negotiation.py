@@ -0,0 +1,172 @@
+from array import array
+import logging
+import time
+
+from routing_grid import FREE
+
+log = logging.getLogger("maze_router")
+
+
+DIRECTIONS = {(0, 1): 0, (0, -1): 1, (1, 0): 2, (-1, 0): 3}  # (dx, dy) -> direction index used by MazeRouter.bfs
+
+
+def segment_cost(segment, bend_penalty, via_penalty, move_costs=None):
+    """Cost of a routed segment as MazeRouter.bfs counts it: steps, bends and vias.
+
+    move_costs is MazeRouter.move_costs, the per-layer step costs including
+    wrong-way penalties; without it every step costs 1.
+    """
+    cost = 0
+    last_direction = None  # A segment starts without a heading
+    for (layer1, x1, y1), (layer2, x2, y2) in zip(segment, segment[1:]):
+        if layer1 != layer2:
+            cost += via_penalty  # The heading carries through a via
+            continue
+        direction = DIRECTIONS[(x2 - x1, y2 - y1)]
+        cost += move_costs[layer1 * 4 + direction] if move_costs else 1
+        if last_direction is not None and direction != last_direction:
+            cost += bend_penalty
+        last_direction = direction
+    return cost
+
+
+class Negotiation:
+    """PathFinder-style negotiated congestion routing on top of a MazeRouter.
+
+    While negotiating, nets may share cells. Entering a cell costs its
+    history cost plus present_factor times the number of other nets already
+    on it, both added to the normal step/bend/via cost through the cell_cost
+    argument of MazeRouter.bfs. After each iteration every overused cell gets
+    history_increment more history cost, present_factor grows by
+    present_growth, and only the nets that touch an overused cell are ripped
+    up and rerouted, together with any net that found no route this time
+    (its own segments can wall each other off as costs change). The loop
+    stops when no cell is shared and every net has a route, or after
+    iterations rounds.
+    """
+
+    def __init__(self, router, iterations=30, history_increment=1, present_factor=1.0, present_growth=1.5):
+        self.router = router
+        self.iterations = iterations
+        self.history_increment = history_increment
+        self.present_factor = present_factor
+        self.present_growth = present_growth
+        size = len(router.grid)
+        self.usage = array('i', bytes(4 * size))  # Nets on each cell
+        self.history = array('i', bytes(4 * size))  # Accumulated history cost of each cell
+        self.cell_cost = array('i', bytes(4 * size))  # history + present congestion, passed to bfs
+        self.cost_cells = set()  # Cells whose cell_cost may be non-zero
+        self.iterations_run = 0
+        self.overflow = 0  # Overused cells after the last iteration
+        self.unrouted = 0  # Nets without a route after the last iteration
+
+    def run(self, nets):
+        """Negotiate routes for nets ({name: pins}) and claim them in the router's grid.
+
+        Returns {name: path or None}. Cells still shared when the loop ends
+        are settled in file order: the first net keeps its route and the
+        later ones are routed again the normal way, which may fail. Nets
+        left without a route are also tried the normal way.
+        """
+        routes = {}  # name -> list of segments, None if the net cannot be routed even with sharing
+        pending = list(nets)
+        for iteration in range(1, self.iterations + 1):
+            started = time.perf_counter()
+            for net_name in pending:
+                if routes.get(net_name):
+                    self._rip_up(routes[net_name])
+                routes[net_name] = self._route(net_name, nets[net_name])
+            overused = self._overused(routes)
+            unrouted = [net_name for net_name, segments in routes.items() if segments is None]
+            self.iterations_run = iteration
+            self.overflow = len(overused)
+            self.unrouted = len(unrouted)
+            log.info("Negotiation iteration %d: %d nets rerouted, %d overused cells, %d nets unrouted, %.3f s",
+                     iteration, len(pending), len(overused), len(unrouted), time.perf_counter() - started)
+            if not overused and not unrouted:
+                break
+            for cell in overused:
+                self.history[cell] += self.history_increment
+            self.present_factor *= self.present_growth
+            self._update_costs()
+            pending = [net_name for net_name, segments in routes.items()
+                       if segments is None or any(self.usage[cell] > 1 for cell in self._cells(segments))]
+        return self._commit(nets, routes)
+
+    def _cells(self, segments):
+        index = self.router.grid.index
+        return {index(*position) for segment in segments for position in segment}
+
+    def _set_cost(self, cell):
+        self.cell_cost[cell] = self.history[cell] + int(self.present_factor * self.usage[cell])
+        self.cost_cells.add(cell)
+
+    def _update_costs(self):
+        for cell in self.cost_cells:
+            self.cell_cost[cell] = self.history[cell] + int(self.present_factor * self.usage[cell])
+
+    def _rip_up(self, segments):
+        for cell in self._cells(segments):
+            self.usage[cell] -= 1
+            self._set_cost(cell)
+
+    def _route(self, net_name, pins):
+        """Route pins as chained segments over the shared grid; return the segments or None."""
+        router = self.router
+        net_id = router.net_id(net_name)
+        grid = router.grid
+        cells = grid.cells
+        held = {grid.index(*pin) for pin in pins if grid.get(*pin) == net_id}  # Reserved pins
+        cost_before = router.total_cost
+        segments = []
+        for start, end in zip(pins, pins[1:]):
+            segment = router.bfs(start, end, net_id, self.cell_cost)
+            if segment is None:
+                break
+            segments.append(segment)
+        router.total_cost = cost_before  # bfs adds congestion costs too, the real cost is set in _commit()
+        net_cells = self._cells(segments)
+        # Other nets may use the claimed cells while negotiating; the net's reserved pins stay held, and a
+        # pin on an obstacle or another net's cell was never claimed and keeps its code
+        grid.set_cells([cell for cell in net_cells if cells[cell] == net_id and cell not in held], FREE)
+        if len(segments) < len(pins) - 1:
+            log.debug("Net %s cannot be routed even with shared cells", net_name)
+            return None
+        for cell in net_cells:
+            self.usage[cell] += 1
+            self._set_cost(cell)
+        return segments
+
+    def _overused(self, routes):
+        overused = set()
+        for segments in routes.values():
+            if segments:
+                overused.update(cell for cell in self._cells(segments) if self.usage[cell] > 1)
+        return overused
+
+    def _commit(self, nets, routes):
+        router = self.router
+        grid = router.grid
+        cells = grid.cells
+        paths = {}
+        for net_name, pins in nets.items():
+            segments = routes.get(net_name)
+            if segments is None:
+                log.debug("Net %s has no negotiated route, routing it normally", net_name)
+                paths[net_name] = router.route_net(pins, net_name)
+                continue
+            net_cells = self._cells(segments)
+            net_id = router.net_id(net_name)
+            if any(cells[cell] != FREE and cells[cell] != net_id for cell in net_cells):
+                log.debug("Net %s still conflicts after negotiation, rerouting it", net_name)
+                paths[net_name] = router.route_net(pins, net_name)
+                continue
+            grid.set_cells(net_cells, net_id)
+            path = []
+            for segment in segments:
+                router.total_cost += segment_cost(segment, router.bend_penalty, router.via_penalty, router.move_costs)
+                path.extend(segment[:-1])
+            path.append(pins[-1])
+            router.record_route([path])
+            paths[net_name] = path
+        return paths
@@ -0,0 +1,239 @@
+from itertools import chain
+import struct
+
+BUFFER_SIZE = 1 << 20  # Characters (or bytes) collected before one write to the file
+AXES = "xyv"  # Run axes: x, y and v (vias, a change of layer)
+BINARY_MAGIC = b"MAZERLE1"  # First bytes of a binary output file
+
+
+def format_path(path):
+    """'(layer, x, y) ' for every point of path, built with a single format operation."""
+    return "(%d, %d, %d) " * len(path) % tuple(chain.from_iterable(path))
+
+
+def compress_path(path):
+    """Straight runs of path as [axis, signed length] pairs, axis an index into AXES.
+
+    Consecutive unit steps along the same axis and in the same direction
+    form one run, so a path is stored as its start point plus one run per
+    straight piece or via stack.
+    """
+    runs = []
+    for (layer1, x1, y1), (layer2, x2, y2) in zip(path, path[1:]):
+        if layer1 != layer2:
+            axis, step = 2, layer2 - layer1
+        elif x1 != x2:
+            axis, step = 0, x2 - x1
+        else:
+            axis, step = 1, y2 - y1
+        if runs and runs[-1][0] == axis and (runs[-1][1] > 0) == (step > 0):
+            runs[-1][1] += step
+        else:
+            runs.append([axis, step])
+    return runs
+
+
+def expand_runs(start, runs):
+    """The cell-by-cell path of a start point and its runs; inverse of compress_path()."""
+    path = [start]
+    position = list(start)  # layer, x, y
+    for axis, length in runs:
+        step = 1 if length > 0 else -1
+        coordinate = (1, 2, 0)[axis]  # Position of x, y and layer in a (layer, x, y) point
+        for _ in range(abs(length)):
+            position[coordinate] += step
+            path.append(tuple(position))
+    return path
+
+
+def format_runs(path):
+    """'(layer, x, y) ' for the start of path followed by 'x+4 ', 'y-2 ', 'v+1 ' ... for its runs."""
+    return format_path(path[:1]) + "".join(f"{AXES[axis]}{length:+d} " for axis, length in compress_path(path))
+
+
+def parse_runs(tokens):
+    """[axis, length] runs of the 'x+4'-style tokens written by format_runs()."""
+    return [[AXES.index(token[0]), int(token[1:])] for token in tokens]
+
+
+class OutputWriter:
+    """Writes the routing output file in large blocks.
+
+    Lines are collected in a list and written with one join once about
+    buffer_size characters are pending, so routing many nets costs a few
+    large writes instead of one per coordinate. Each net is written as soon
+    as it is routed and nothing keeps a reference to its path afterwards.
+    Use as a context manager; the rest is flushed on exit.
+    """
+
+    mode = 'w'
+    empty = ""
+
+    def __init__(self, output_file, buffer_size=BUFFER_SIZE):
+        self.output_file = output_file
+        self.buffer_size = buffer_size
+        self._file = None
+        self._pending = []
+        self._pending_size = 0
+
+    def __enter__(self):
+        self._file = open(self.output_file, self.mode)
+        return self
+
+    def __exit__(self, *exc_info):
+        self.flush()
+        self._file.close()
+        return False
+
+    def write(self, text):
+        self._pending.append(text)
+        self._pending_size += len(text)
+        if self._pending_size >= self.buffer_size:
+            self.flush()
+
+    def flush(self):
+        if self._pending:
+            self._file.write(self.empty.join(self._pending))
+            self._pending = []
+            self._pending_size = 0
+
+    def header(self, text):
+        self.write(f"{text}\n")
+
+    def obstacles(self, rects):
+        """OBS for single cells and OBSRECT for larger blocks of (layer, x1, y1, x2, y2) rectangles."""
+        for layer, x1, y1, x2, y2 in rects:
+            if x1 == x2 and y1 == y2:
+                self.write("OBS(%d, %d, %d)\n" % (layer, x1, y1))
+            else:
+                self.write("OBSRECT(%d, %d, %d, %d, %d)\n" % (layer, x1, y1, x2, y2))
+
+    format_branch = staticmethod(format_path)
+
+    def net(self, net_name, path):
+        self.write(f"{net_name} {self.format_branch(path)}\n")
+
+    def tree_net(self, net_name, branches):
+        """One branch per connected pin, separated by "|"; each starts on the tree."""
+        self.write(f"{net_name} {'| '.join(map(self.format_branch, branches))}\n")
+
+    def failed(self, net_name):
+        self.write(f"{net_name} failed to route.\n")
+
+    def summary(self, total_cost, wire_length, longest_route, vias):
+        self.write("\nSummary:\n"
+                   f"Total cost of routing: {total_cost}\n"
+                   f"Total wire length: {wire_length}\n"
+                   f"Longest route length: {longest_route}\n"
+                   f"Total vias used: {vias}\n")
+
+
+class RunLengthWriter(OutputWriter):
+    """Text output with each path as its start point and straight runs: '(0, 2, 3) x+4 y-2 v+1 '."""
+
+    format_branch = staticmethod(format_runs)
+
+
+class BinaryOutputWriter(OutputWriter):
+    """Binary output of the same content as OutputWriter, paths stored as runs.
+
+    The file starts with BINARY_MAGIC and the header line (uint32 length,
+    UTF-8). Then come records, each led by a one-byte tag; all integers are
+    little-endian:
+      b'O'  obstacle rectangle: 5 int32 (layer, x1, y1, x2, y2)
+      b'N'  routed net: uint16 name length, name, uint32 branch count, and per
+            branch 3 int32 start (layer, x, y), uint32 run count and the runs
+            as int32 (axis, signed length) pairs
+      b'F'  failed net: uint16 name length, name
+      b'S'  summary: 4 int64 (cost, wire length, longest route, vias)
+    read_binary() reads it back.
+    """
+
+    mode = 'wb'
+    empty = b""
+
+    def header(self, text):
+        data = text.encode()
+        self.write(BINARY_MAGIC + struct.pack('<I', len(data)) + data)
+
+    def obstacles(self, rects):
+        for rect in rects:
+            self.write(struct.pack('<c5i', b'O', *rect))
+
+    def net(self, net_name, path):
+        self.tree_net(net_name, [path])
+
+    def tree_net(self, net_name, branches):
+        name = net_name.encode()
+        parts = [struct.pack('<cH', b'N', len(name)), name, struct.pack('<I', len(branches))]
+        for branch in branches:
+            runs = compress_path(branch)
+            parts.append(struct.pack('<3iI', *branch[0], len(runs)))
+            parts.append(struct.pack('<%di' % (2 * len(runs)), *chain.from_iterable(runs)))
+        self.write(b"".join(parts))
+
+    def failed(self, net_name):
+        name = net_name.encode()
+        self.write(struct.pack('<cH', b'F', len(name)) + name)
+
+    def summary(self, total_cost, wire_length, longest_route, vias):
+        self.write(struct.pack('<c4q', b'S', total_cost, wire_length, longest_route, vias))
+
+
+WRITERS = {
+    "cells": OutputWriter,
+    "runs": RunLengthWriter,
+    "binary": BinaryOutputWriter,
+}
+
+
+def read_binary(output_file):
+    """Read a BinaryOutputWriter file.
+
+    Returns (header line, obstacle rectangles, nets, summary). nets maps
+    each net name to a list of branches, each a (start, runs) pair to be
+    passed to expand_runs(), or to None for a net that failed to route;
+    summary is the 4-tuple of totals, or None if the file has none.
+    """
+    with open(output_file, 'rb') as f:
+        data = f.read()
+    if not data.startswith(BINARY_MAGIC):
+        raise ValueError(f"{output_file} is not a binary routing output file")
+    offset = len(BINARY_MAGIC)
+    (length,) = struct.unpack_from('<I', data, offset)
+    offset += 4
+    header = data[offset:offset + length].decode()
+    offset += length
+    rects = []
+    nets = {}
+    summary = None
+    while offset < len(data):
+        tag = data[offset:offset + 1]
+        offset += 1
+        if tag == b'O':
+            rects.append(struct.unpack_from('<5i', data, offset))
+            offset += 20
+        elif tag in (b'N', b'F'):
+            (length,) = struct.unpack_from('<H', data, offset)
+            offset += 2
+            net_name = data[offset:offset + length].decode()
+            offset += length
+            if tag == b'F':
+                nets[net_name] = None
+                continue
+            (count,) = struct.unpack_from('<I', data, offset)
+            offset += 4
+            branches = []
+            for _ in range(count):
+                layer, x, y, run_count = struct.unpack_from('<3iI', data, offset)
+                offset += 16
+                flat = struct.unpack_from('<%di' % (2 * run_count), data, offset)
+                offset += 8 * run_count
+                branches.append(((layer, x, y), [list(flat[i:i + 2]) for i in range(0, len(flat), 2)]))
+            nets[net_name] = branches
+        elif tag == b'S':
+            summary = struct.unpack_from('<4q', data, offset)
+            offset += 32
+        else:
+            raise ValueError(f"{output_file}: unknown record {tag!r} at byte {offset - 1}")
+    return header, rects, nets, summary
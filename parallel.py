@@ -0,0 +1,231 @@
+from collections import deque
+import logging
+import multiprocessing
+from multiprocessing import shared_memory
+
+from distance_cache import box_changed
+from routing_grid import CHANGE_LOG_SIZE, RoutingGrid
+
+log = logging.getLogger("maze_router")
+
+SYNC_HISTORY = 32  # Syncs of the shared cells sent with every task, so a worker can catch up on the rows they changed
+
+_worker = None  # Per worker process: (router, shared cells, number of the last sync the router's grid has)
+
+
+class RecordingGrid(RoutingGrid):
+    """RoutingGrid that also lists every write, so a worker can hand its writes to the parent."""
+
+    def __init__(self, width, height, layers=2):
+        super().__init__(width, height, layers)
+        self.written = []  # (flat indices, code) per write
+
+    def occupy(self, index, net_id):
+        self.written.append(([index], net_id))
+        super().occupy(index, net_id)
+
+    def set_cells(self, indices, code):
+        self.written.append((list(indices), code))
+        super().set_cells(indices, code)
+
+
+def net_box(pins):
+    """Bounding box (x1, y1, x2, y2) of the pins of a net."""
+    xs = [x for _, x, _ in pins]
+    ys = [y for _, _, y in pins]
+    return min(xs), min(ys), max(xs), max(ys)
+
+
+def search_box(router, pins):
+    """Box (x1, y1, x2, y2) that the searches of router for a net are expected to stay in.
+
+    A* heads for the pins and a windowed search cannot leave its window,
+    so their box is the pins' box, grown by the window margin. A
+    uniform-cost search reaches every cell cheaper than the segment it is
+    looking for, in all directions, so the box grows by the estimated cost
+    of the longest segment: its length plus a bend and its vias.
+    """
+    x1, y1, x2, y2 = net_box(pins)
+    if router.window_margin is not None:
+        grow = router.window_margin
+    elif router.search == "astar":
+        grow = 0
+    else:
+        grow = max(abs(ax - bx) + abs(ay - by) + abs(al - bl) * router.via_penalty +
+                   (router.bend_penalty if ax != bx and ay != by else 0)
+                   for (al, ax, ay), (bl, bx, by) in zip(pins, pins[1:]))
+    grid = router.grid
+    return max(x1 - grow, 0), max(y1 - grow, 0), min(x2 + grow, grid.width - 1), min(y2 + grow, grid.height - 1)
+
+
+def batches(nets, reach=net_box, max_pins=CHANGE_LOG_SIZE // 2):
+    """Split {net name: pins}, in order, into runs of consecutive nets whose boxes are at least a cell apart.
+
+    reach(pins) gives the box of a net, by default the pins' box. A run ends
+    at the first net whose box overlaps or touches the box of a net already
+    in it, so nets keep their order across batches. It also ends before its
+    nets hold more than max_pins pins, so the grid's change log still
+    reaches back to the start of the batch when it is committed.
+    """
+    batch = []
+    boxes = []
+    batch_pins = 0
+    for net_name, pins in nets.items():
+        box = reach(pins)
+        if box_changed(box, boxes) or (batch and batch_pins + len(pins) > max_pins):
+            yield batch
+            batch = []
+            boxes = []
+            batch_pins = 0
+        batch.append((net_name, pins))
+        boxes.append(box)
+        batch_pins += len(pins)
+    if batch:
+        yield batch
+
+
+def _init_worker(router_class, settings, shared_name):
+    global _worker
+    router = router_class(*settings["args"])
+    router.grid = RecordingGrid(router.grid_width, router.grid_height, router.layers)
+    router.net_ids = settings["net_ids"]
+    router.tree = settings["tree"]
+    router.window_margin = settings["window_margin"]
+    router.explored = []
+    shared = shared_memory.SharedMemory(name=shared_name)
+    _worker = (router, shared, 0)  # No sync copied yet
+
+
+def _route_in_worker(task):
+    """Route one net against the grid of its batch and undo it locally; return what the parent commits."""
+    global _worker
+    syncs, net_name, pins = task
+    router, shared, synced = _worker
+    cells = router.grid.cells
+    view = shared.buf.cast('i')
+    try:
+        number = syncs[-1][0]
+        if synced != number:  # The parent synced the shared cells for another batch since
+            missed = [boxes for sync, boxes in syncs if sync > synced]
+            if syncs[0][0] > synced + 1 or None in missed:
+                _copy(cells, view, router.grid, None)  # Too far behind: copy the whole grid once
+            else:
+                for boxes in missed:
+                    _copy(cells, view, router.grid, boxes)
+            _worker = (router, shared, number)
+        grid = router.grid
+        grid.written = []
+        router.explored = []
+        cost, expanded, stale = router.total_cost, router.nodes_expanded, router.stale_pops
+        result = (router.route_tree if router.tree else router.route_net)(pins, net_name)
+        for indices, _ in grid.written:  # Back to the batch's grid for the next net
+            for index in indices:
+                cells[index] = view[index]
+        return (result, grid.written, router.explored, router.total_cost - cost,
+                router.nodes_expanded - expanded, router.stale_pops - stale)
+    finally:
+        view.release()
+
+
+def _copy(target, source, grid, boxes):
+    """Copy the rows of the cells inside boxes (all of them for None) from source to target."""
+    target = memoryview(target)
+    try:
+        if boxes is None:
+            target[:] = source
+            return
+        for x1, y1, x2, y2 in boxes:
+            for layer in range(grid.layers):
+                for y in range(y1, y2 + 1):
+                    start = grid.index(layer, x1, y)
+                    target[start:start + x2 - x1 + 1] = source[start:start + x2 - x1 + 1]
+    finally:
+        target.release()
+
+
+def _changed_cells(view, grid, boxes):
+    """(x, y, x, y) of every cell inside boxes whose code differs from the shared cells."""
+    cells = grid.cells
+    changed = set()
+    for x1, y1, x2, y2 in boxes:
+        for layer in range(grid.layers):
+            for y in range(y1, y2 + 1):
+                start = grid.index(layer, x1, y)
+                if view[start:start + x2 - x1 + 1] == cells[start:start + x2 - x1 + 1]:
+                    continue  # Compared at C speed, most rows are unchanged
+                for x in range(x1, x2 + 1):
+                    if cells[start + x - x1] != view[start + x - x1]:
+                        changed.add((x, y, x, y))
+    return changed
+
+
+def route_nets(router, nets, jobs):
+    """Route {net name: pins} with jobs worker processes; yield each net's route in order.
+
+    Nets are split into batches() of consecutive nets with disjoint
+    search_box()es. The shared-memory copy of the grid is brought up to the start
+    of each batch by copying only the rows the parent changed since the
+    last batch, and every task lists those rows for the last SYNC_HISTORY
+    batches, so a worker updates its private copy the same way. Workers
+    send back the route, the cells they wrote and the boxes their searches
+    looked at. The parent commits the nets in order: a net is taken as is
+    when no cell committed since the batch started (a cell whose code now
+    differs from the shared copy) lies within a cell of those boxes,
+    because then a serial search would have seen exactly the same cells;
+    otherwise it is routed again in the parent. Routes, costs and output
+    are therefore the same as routing serially in the same order. A batch
+    of one net is routed in the parent directly.
+    """
+    for net_name in nets:
+        router.net_id(net_name)  # Ids in net order, as a serial run assigns them
+    grid = router.grid
+    settings = {"args": (router.grid_width, router.grid_height, router.bend_penalty, router.via_penalty,
+                         router.search, router.frontier, router.layers, router.preferred_directions,
+                         router.wrong_way_penalties),
+                "net_ids": router.net_ids, "tree": router.tree, "window_margin": router.window_margin}
+    route = router.route_tree if router.tree else router.route_net
+    shared = shared_memory.SharedMemory(create=True, size=grid.cells.itemsize * len(grid))
+    view = shared.buf.cast('i')
+    counts = {"batches": 0, "parallel": 0, "rerouted": 0}
+    try:
+        synced = None  # Grid version last copied to the shared cells
+        syncs = deque(maxlen=SYNC_HISTORY)  # (number, changed boxes or None for all) of the last syncs
+        with multiprocessing.Pool(jobs, _init_worker, (type(router), settings, shared.name)) as pool:
+            for batch in batches(nets, lambda pins: search_box(router, pins)):
+                counts["batches"] += 1
+                if len(batch) == 1:
+                    net_name, pins = batch[0]
+                    yield route(pins, net_name)
+                    continue
+                boxes = None if synced is None else grid.changes_since(synced)
+                _copy(view, grid.cells, grid, boxes)
+                syncs.append((syncs[-1][0] + 1 if syncs else 1, boxes))
+                synced = seen = grid.version
+                changed = set()  # Cells committed since the batch started, as boxes for box_changed()
+                tasks = [(tuple(syncs), net_name, pins) for net_name, pins in batch]
+                for (net_name, pins), (result, written, explored, cost, expanded, stale) in zip(
+                        batch, pool.imap(_route_in_worker, tasks)):
+                    boxes = grid.changes_since(seen)
+                    if boxes is not None:
+                        changed |= _changed_cells(view, grid, boxes)
+                        seen = grid.version
+                    if boxes is None or any(box_changed(box, changed) for box in explored):
+                        counts["rerouted"] += 1
+                        log.debug("Net %s conflicts with a net routed in the same batch, routing it again", net_name)
+                        yield route(pins, net_name)
+                        continue
+                    counts["parallel"] += 1
+                    for indices, code in written:
+                        grid.set_cells(indices, code)
+                    router.total_cost += cost
+                    router.nodes_expanded += expanded
+                    router.stale_pops += stale
+                    if result is not None:
+                        router.record_route(result if router.tree else [result])
+                    yield result
+    finally:  # Also reached through close() once the caller has taken every route
+        view.release()
+        shared.close()
+        shared.unlink()
+        log.info("Parallel routing: %d batches, %d nets routed in %d workers, %d routed again after a conflict",
+                 counts["batches"], counts["parallel"], jobs, counts["rerouted"])
@@ -0,0 +1,191 @@
+from array import array
+from collections import deque
+
+try:
+    import numpy
+except ImportError:  # Optional: only speeds up bulk updates
+    numpy = None
+
+FREE = 0  # Cell is available for routing
+BLOCKED = -1  # Cell is covered by an obstacle (OBS)
+# Any positive code is the id of the net occupying the cell
+
+CHANGE_LOG_SIZE = 4096  # Recent changes kept for changes_since()
+
+
+class RoutingGrid:
+    """Per-cell occupancy of the routing area stored in one flat int32 buffer.
+
+    Cell (layer, x, y) lives at index layer*W*H + y*W + x, so neighbours are a
+    fixed integer offset away: +-1 in x, +-W in y and +-W*H across a via.
+
+    Every write through the methods below bumps version and logs the
+    bounding box of the cells it changed, and whether it freed cells, so a
+    cached search can tell whether anything it looked at has changed since.
+    """
+
+    def __init__(self, width, height, layers=2, cells=None):
+        self.width = width
+        self.height = height
+        self.layers = layers
+        self.layer_size = width * height
+        # All FREE unless an existing int32 buffer of the right size is given
+        self.cells = array('i', bytes(4 * layers * self.layer_size)) if cells is None else cells
+        self.version = 0
+        self.change_log = deque(maxlen=CHANGE_LOG_SIZE)  # (version, x1, y1, x2, y2, freed), oldest first
+
+    def __len__(self):
+        return len(self.cells)
+
+    def index(self, layer, x, y):
+        """Flat index of (layer, x, y)."""
+        return layer * self.layer_size + y * self.width + x
+
+    def coords(self, index):
+        """(layer, x, y) of a flat index."""
+        layer, cell = divmod(index, self.layer_size)
+        y, x = divmod(cell, self.width)
+        return layer, x, y
+
+    def in_bounds(self, layer, x, y):
+        return (0 <= layer < self.layers and
+                0 <= x < self.width and
+                0 <= y < self.height)
+
+    def get(self, layer, x, y):
+        return self.cells[layer * self.layer_size + y * self.width + x]
+
+    def is_free(self, layer, x, y):
+        """True if (layer, x, y) is inside the grid and not occupied."""
+        return self.in_bounds(layer, x, y) and self.get(layer, x, y) == FREE
+
+    def row(self, layer, y):
+        """The cells of row y on layer as an array."""
+        start = layer * self.layer_size + y * self.width
+        return self.cells[start:start + self.width]
+
+    def note_change(self, x1, y1, x2, y2, freed=False):
+        """Record that cells inside (x1, y1)-(x2, y2), on any layer, were written; freed if some became FREE."""
+        self.version += 1
+        self.change_log.append((self.version, x1, y1, x2, y2, freed))
+
+    def changes_since(self, version, freed_only=False):
+        """Bounding boxes of the changes after version, or None if the log no longer reaches back.
+
+        With freed_only, only the changes that made cells FREE are listed.
+        """
+        if version == self.version:
+            return []
+        if not self.change_log or self.change_log[0][0] > version + 1:
+            return None
+        return [change[1:5] for change in self.change_log if change[0] > version and (change[5] or not freed_only)]
+
+    def block(self, layer, x, y):
+        self.cells[layer * self.layer_size + y * self.width + x] = BLOCKED
+        self.note_change(x, y, x, y)
+
+    def block_rect(self, layer, x1, y1, x2, y2):
+        """Mark every cell of the inclusive rectangle (x1, y1)-(x2, y2) on layer as an obstacle."""
+        x1, x2 = min(x1, x2), max(x1, x2)
+        y1, y2 = min(y1, y2), max(y1, y2)
+        row = array('i', [BLOCKED]) * (x2 - x1 + 1)
+        cells = self.cells
+        start = layer * self.layer_size + y1 * self.width + x1
+        for _ in range(y2 - y1 + 1):
+            cells[start:start + len(row)] = row  # One slice assignment per row
+            start += self.width
+        self.note_change(x1, y1, x2, y2)
+
+    def block_indices(self, indices):
+        """Mark many flat indices as obstacles at once (a list or a NumPy array)."""
+        self.note_change(0, 0, self.width - 1, self.height - 1)
+        if numpy is not None:
+            numpy.frombuffer(self.cells, dtype=numpy.int32)[numpy.asarray(indices, dtype=numpy.intp)] = BLOCKED
+            return
+        cells = self.cells
+        for index in indices:
+            cells[index] = BLOCKED
+
+    def occupy(self, index, net_id):
+        self.cells[index] = net_id
+        _, x, y = self.coords(index)
+        self.note_change(x, y, x, y)
+
+    def set_cells(self, indices, code):
+        """Write code (a net id, FREE or BLOCKED) to every flat index, recording one change."""
+        if not indices:
+            return
+        cells = self.cells
+        width = self.width
+        layer_size = self.layer_size
+        x1 = y1 = float('inf')
+        x2 = y2 = -1
+        for index in indices:
+            cells[index] = code
+            y, x = divmod(index % layer_size, width)
+            x1 = min(x1, x)
+            x2 = max(x2, x)
+            y1 = min(y1, y)
+            y2 = max(y2, y)
+        self.note_change(x1, y1, x2, y2, code == FREE)
+
+    def claim(self, indices, net_id):
+        """Give the FREE cells of indices to net_id in one set_cells() write; return the indices claimed.
+
+        Cells held by an obstacle or another net, such as a pin placed on
+        them, keep their code, so undoing a claim only frees what it took.
+        """
+        cells = self.cells
+        claimed = [index for index in indices if cells[index] == FREE]
+        self.set_cells(claimed, net_id)
+        return claimed
+
+    def blocked_runs(self):
+        """Yield (layer, x1, x2, y) for every maximal horizontal run of obstacle cells."""
+        width = self.width
+        for layer in range(self.layers):
+            for y in range(self.height):
+                row = self.row(layer, y)
+                if BLOCKED not in row:
+                    continue
+                x = row.index(BLOCKED)
+                while True:
+                    end = x
+                    while end + 1 < width and row[end + 1] == BLOCKED:
+                        end += 1
+                    yield layer, x, end, y
+                    try:
+                        x = row.index(BLOCKED, end + 1)
+                    except ValueError:
+                        break
+
+    def blocked_rects(self):
+        """Yield (layer, x1, y1, x2, y2) rectangles that together cover every obstacle cell.
+
+        Identical runs on consecutive rows are merged, so a rectangle that was
+        blocked with block_rect() comes back as a single rectangle.
+        """
+        open_rects = {}  # (layer, x1, x2) -> first row of a rectangle still growing
+        last_row = {}  # (layer, x1, x2) -> last row it was seen on
+        for layer, x1, x2, y in self.blocked_runs():
+            key = (layer, x1, x2)
+            if key in open_rects and last_row[key] == y - 1:
+                last_row[key] = y
+                continue
+            if key in open_rects:
+                yield layer, x1, open_rects[key], x2, last_row[key]
+            open_rects[key] = y
+            last_row[key] = y
+        for (layer, x1, x2), y1 in open_rects.items():
+            yield layer, x1, y1, x2, last_row[(layer, x1, x2)]
+
+    def blocked_cells(self):
+        """Yield (layer, x, y) for every obstacle cell, scanning row by row."""
+        for layer in range(self.layers):
+            for y in range(self.height):
+                row = self.row(layer, y)
+                if BLOCKED not in row:  # Skip empty rows at C speed
+                    continue
+                for x, code in enumerate(row):
+                    if code == BLOCKED:
+                        yield layer, x, y
@@ -0,0 +1,168 @@
+import contextlib
+import cProfile
+import csv
+import json
+import logging
+import time
+
+log = logging.getLogger("maze_router")
+
+SEGMENT_FIELDS = ("net", "start", "end", "routed", "failure", "cost", "pushed", "popped", "stale", "expanded",
+                  "peak_frontier", "states_reached", "seconds")
+NET_FIELDS = ("net", "segments", "routed", "failure", "cost", "pushed", "popped", "stale", "expanded",
+              "peak_frontier", "states_reached", "seconds")
+
+
+class CountingFrontier:
+    """Wraps a frontier and counts its pushes, pops and largest size into a SearchStats."""
+
+    def __init__(self, queue, stats):
+        self._push = queue.push
+        self._pop = queue.pop
+        self.stats = stats
+        self.size = 0
+
+    def push(self, priority, item):
+        self._push(priority, item)
+        stats = self.stats
+        stats.pushed += 1
+        self.size += 1
+        if self.size > stats.peak_frontier:
+            stats.peak_frontier = self.size
+
+    def pop(self):
+        entry = self._pop()
+        if entry is not None:
+            self.stats.popped += 1
+            self.size -= 1
+        return entry
+
+
+class SearchStats:
+    """Opt-in per-segment and per-net search counters of a MazeRouter.
+
+    Set router.stats = SearchStats() to enable. Every MazeRouter.bfs call
+    then becomes a segment record with the nodes pushed, popped and popped
+    stale, nodes expanded, the largest queue size, search states reached,
+    wall time, cost and, for a failed segment, why it failed. The queue is
+    only wrapped in a CountingFrontier while stats are on, so with
+    router.stats = None the search loops are unchanged.
+
+    profile_nets names nets to run under profile_hook, a callable taking
+    the net name and returning a context manager; cprofile_hook() gives one
+    that saves a cProfile file per net, and a sampling profiler can be
+    attached the same way.
+    """
+
+    def __init__(self, profile_nets=(), profile_hook=None):
+        self.segments = []  # One dict per bfs call, keys SEGMENT_FIELDS
+        self.profile_nets = set(profile_nets)
+        self.profile_hook = profile_hook
+        self.active = False  # Inside record_segment(); nested bfs calls (search windows) add to the same record
+        self.pushed = 0  # Counters of the segment being searched, updated by CountingFrontier
+        self.popped = 0
+        self.peak_frontier = 0
+        self._net_names = {}  # Net id -> name, filled from router.net_ids
+
+    def counting(self, queue):
+        return CountingFrontier(queue, self)
+
+    def record_segment(self, router, start, end, net_id, cell_cost):
+        """Run router.bfs(start, end, net_id, cell_cost) and record its counters; return its path."""
+        self.pushed = self.popped = self.peak_frontier = 0
+        expanded = router.nodes_expanded
+        stale = router.stale_pops
+        reached = router.states_reached
+        cost = router.total_cost
+        failure = None
+        if not router.grid.is_free(*end) and router.grid.get(*end) != net_id:
+            failure = "end pin occupied"
+        self.active = True
+        started = time.perf_counter()
+        try:
+            path = router.bfs(start, end, net_id, cell_cost)
+        finally:
+            self.active = False
+        seconds = time.perf_counter() - started
+        if path is None and failure is None:
+            failure = "no path"
+        self.segments.append({
+            "net": self._net_name(router, net_id),
+            "start": "multi" if isinstance(start, list) else start,  # A tree branch starts from every tree cell
+            "end": end,
+            "routed": path is not None,
+            "failure": None if path is not None else failure,
+            "cost": router.total_cost - cost,
+            "pushed": self.pushed,
+            "popped": self.popped,
+            "stale": router.stale_pops - stale,
+            "expanded": router.nodes_expanded - expanded,
+            "peak_frontier": self.peak_frontier,
+            "states_reached": router.states_reached - reached,
+            "seconds": seconds,
+        })
+        return path
+
+    def _net_name(self, router, net_id):
+        if net_id not in self._net_names:
+            self._net_names = {code: name for name, code in router.net_ids.items()}
+        return self._net_names.get(net_id, str(net_id))
+
+    def profile(self, net_name):
+        """Context manager around routing net_name: profile_hook for the chosen nets, else nothing."""
+        if net_name in self.profile_nets and self.profile_hook is not None:
+            return self.profile_hook(net_name)
+        return contextlib.nullcontext()
+
+    def nets(self):
+        """Segment counters summed per net: {net name: dict with keys NET_FIELDS}."""
+        nets = {}
+        for segment in self.segments:
+            net = nets.get(segment["net"])
+            if net is None:
+                net = nets[segment["net"]] = {"net": segment["net"], "segments": 0, "routed": True, "failure": None,
+                                              "cost": 0, "pushed": 0, "popped": 0, "stale": 0, "expanded": 0,
+                                              "peak_frontier": 0, "states_reached": 0, "seconds": 0.0}
+            net["segments"] += 1
+            if not segment["routed"]:
+                net["routed"] = False
+                net["failure"] = net["failure"] or segment["failure"]
+            for field in ("cost", "pushed", "popped", "stale", "expanded", "states_reached", "seconds"):
+                net[field] += segment[field]
+            net["peak_frontier"] = max(net["peak_frontier"], segment["peak_frontier"])
+        return nets
+
+    def dump(self, prefix):
+        """Write prefix.segments.csv, prefix.nets.csv and prefix.stats.json; return their paths."""
+        nets = list(self.nets().values())
+        paths = [f"{prefix}.segments.csv", f"{prefix}.nets.csv", f"{prefix}.stats.json"]
+        for path, fields, rows in ((paths[0], SEGMENT_FIELDS, self.segments), (paths[1], NET_FIELDS, nets)):
+            with open(path, 'w', newline='') as f:
+                writer = csv.DictWriter(f, fields)
+                writer.writeheader()
+                writer.writerows(rows)
+        with open(paths[2], 'w') as f:
+            json.dump({"segments": self.segments, "nets": nets}, f, indent=1)
+        return paths
+
+    def log_slowest(self, count=5):
+        for net in sorted(self.nets().values(), key=lambda net: net["seconds"], reverse=True)[:count]:
+            log.info("Slow net %s: %.3f s, %d pushed, %d popped (%d stale), peak queue %d%s",
+                     net["net"], net["seconds"], net["pushed"], net["popped"], net["stale"], net["peak_frontier"],
+                     f", failed: {net['failure']}" if net["failure"] else "")
+
+
+def cprofile_hook(prefix):
+    """profile_hook that profiles a net with cProfile and saves it as prefix.<net>.prof."""
+    @contextlib.contextmanager
+    def hook(net_name):
+        profiler = cProfile.Profile()
+        profiler.enable()
+        try:
+            yield profiler
+        finally:
+            profiler.disable()
+            path = f"{prefix}.{net_name}.prof"
+            profiler.dump_stats(path)
+            log.info("Profile of net %s saved to %s (python -m pstats %s)", net_name, path, path)
+    return hook
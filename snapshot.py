@@ -0,0 +1,74 @@
+import json
+import os
+import struct
+import sys
+
+try:
+    import numpy
+except ImportError:  # Only needed by memmap_cells()
+    numpy = None
+
+SNAPSHOT_MAGIC = b"MAZESNAP"
+SNAPSHOT_VERSION = 1
+CELLS_ALIGNMENT = 4096  # The cell array starts on a page boundary so it can be memory-mapped
+_HEADER = struct.Struct('<8sII')  # magic, version, metadata length
+
+
+def is_snapshot(path):
+    """True if path starts like a snapshot file."""
+    with open(path, 'rb') as f:
+        return f.read(len(SNAPSHOT_MAGIC)) == SNAPSHOT_MAGIC
+
+
+def write_snapshot(path, metadata, cells):
+    """Write metadata (a JSON-serializable dict) and the int32 cell array of a grid to path.
+
+    Layout: SNAPSHOT_MAGIC, uint32 version, uint32 metadata length, the
+    metadata as UTF-8 JSON, zero padding up to metadata["cells_offset"] (a
+    multiple of CELLS_ALIGNMENT) and the cells as little-endian int32 in
+    grid index order. The file is written next to path and renamed over it,
+    so a run killed while saving leaves the previous snapshot intact.
+    """
+    metadata = dict(metadata, cells_offset=0)
+    data = json.dumps(metadata, separators=(',', ':')).encode()
+    offset = -(-(_HEADER.size + len(data) + 32) // CELLS_ALIGNMENT) * CELLS_ALIGNMENT  # 32: room for the offset
+    metadata["cells_offset"] = offset
+    data = json.dumps(metadata, separators=(',', ':')).encode()
+    if sys.byteorder == 'big':
+        cells = cells[:]
+        cells.byteswap()
+    temporary = f"{path}.tmp"
+    with open(temporary, 'wb') as f:
+        f.write(_HEADER.pack(SNAPSHOT_MAGIC, SNAPSHOT_VERSION, len(data)))
+        f.write(data)
+        f.write(bytes(offset - _HEADER.size - len(data)))
+        f.write(cells)  # Straight from the array's buffer, no copy
+    os.replace(temporary, path)
+
+
+def read_metadata(path):
+    """The metadata dict of a snapshot; raises ValueError for other files or versions."""
+    with open(path, 'rb') as f:
+        magic, version, length = _HEADER.unpack(f.read(_HEADER.size))
+        if magic != SNAPSHOT_MAGIC:
+            raise ValueError(f"{path} is not a grid snapshot")
+        if version != SNAPSHOT_VERSION:
+            raise ValueError(f"{path}: snapshot version {version} is not supported (expected {SNAPSHOT_VERSION})")
+        return json.loads(f.read(length))
+
+
+def read_cells(path, metadata, cells):
+    """Fill cells, an int32 array of the grid's size, from the snapshot in a single read."""
+    with open(path, 'rb') as f:
+        f.seek(metadata["cells_offset"])
+        if f.readinto(cells) != cells.itemsize * len(cells):
+            raise ValueError(f"{path}: snapshot is truncated")
+    if sys.byteorder == 'big':
+        cells.byteswap()
+
+
+def memmap_cells(path):
+    """The cells of a snapshot as a read-only numpy.memmap of shape (layers, height, width)."""
+    metadata = read_metadata(path)
+    return numpy.memmap(path, dtype='<i4', mode='r', offset=metadata["cells_offset"],
+                        shape=(metadata["layers"], metadata["height"], metadata["width"]))
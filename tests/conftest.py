@@ -0,0 +1,186 @@
+import importlib.util
+import os
+import random
+import re
+import sys
+
+import pytest
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)  # The router's modules live at the top level of the repository
+
+SAMPLES = os.path.join(ROOT, "Final_Maze-Router")
+POSITION = re.compile(r"\((\d+), (\d+), (\d+)\)")
+
+
+def sample(number):
+    """Path of Final_Maze-Router/input_test<number>.txt."""
+    return os.path.join(SAMPLES, f"input_test{number}.txt")
+
+
+@pytest.fixture(scope="session")
+def final_router():
+    """Final_Maze-Router/Router.py, imported as final_router since its name clashes with the top-level Router.py."""
+    if "final_router" not in sys.modules:
+        spec = importlib.util.spec_from_file_location("final_router", os.path.join(SAMPLES, "Router.py"))
+        module = importlib.util.module_from_spec(spec)
+        sys.modules["final_router"] = module  # Lets the length workers unpickle its functions
+        spec.loader.exec_module(module)
+    return sys.modules["final_router"]
+
+
+@pytest.fixture
+def write_input(tmp_path):
+    """Write the given lines to an input file in tmp_path and return its path."""
+    def write(*lines, name="input.txt"):
+        path = tmp_path / name
+        path.write_text("\n".join(lines) + "\n")
+        return str(path)
+    return write
+
+
+def reference_cost(router, start, end):
+    """Cheapest cost from start to end on the router's grid by a plain Dijkstra, or None.
+
+    Written independently of MazeRouter.bfs: states are (layer, x, y,
+    heading), a step costs router.move_costs plus the bend penalty when the
+    heading changes, a via costs the via penalty and keeps the heading, and
+    only FREE cells can be entered.
+    """
+    import heapq
+
+    from routing_grid import FREE
+
+    grid = router.grid
+    steps = ((0, 0, 1), (1, 0, -1), (2, 1, 0), (3, -1, 0))  # (heading, dx, dy), headings numbered as in bfs
+    queue = [(0, start, None)]
+    best = {(start, None): 0}
+    while queue:
+        cost, (layer, x, y), heading = heapq.heappop(queue)
+        if (layer, x, y) == end:
+            return cost
+        if cost > best[((layer, x, y), heading)]:
+            continue
+        moves = []
+        for direction, dx, dy in steps:
+            step = router.move_costs[layer * 4 + direction]
+            if heading is not None and heading != direction:
+                step += router.bend_penalty
+            moves.append(((layer, x + dx, y + dy), direction, step))
+        for new_layer in (layer - 1, layer + 1):
+            moves.append(((new_layer, x, y), heading, router.via_penalty))
+        for position, new_heading, step in moves:
+            if grid.in_bounds(*position) and grid.get(*position) == FREE:
+                key = (position, new_heading)
+                if cost + step < best.get(key, float('inf')):
+                    best[key] = cost + step
+                    heapq.heappush(queue, (cost + step, position, new_heading))
+    return None
+
+
+def random_router(seed, search="dijkstra", bend_penalty=2, via_penalty=5, size=16, layers=2, **stack):
+    """A router with a quarter of its cells blocked at random, and six pairs of free cells.
+
+    stack holds further MazeRouter arguments, such as preferred_directions.
+    """
+    from Router import MazeRouter
+
+    rng = random.Random(seed)
+    router = MazeRouter(size, size, bend_penalty, via_penalty, search, layers=layers, **stack)
+    for _ in range(layers * size * size // 8):
+        router.grid.block(rng.randrange(layers), rng.randrange(size), rng.randrange(size))
+    free = [(layer, x, y) for layer in range(layers) for x in range(size) for y in range(size)
+            if router.is_valid(layer, x, y)]
+    return router, [tuple(rng.sample(free, 2)) for _ in range(6)]
+
+
+def check_against_reference(search, window=None, bend_penalty=2, **stack):
+    """Route the pairs of random_router(seed) for five seeds with search; compare each cost with reference_cost().
+
+    Every path is freed again after the comparison, so each pair is searched
+    on the random obstacles alone. A windowed search may return a dearer
+    path than the reference, but must find one whenever one exists.
+    stack is passed on to random_router().
+    """
+    for seed in range(5):
+        router, pairs = random_router(seed, search, bend_penalty, **stack)
+        router.window_margin = window
+        for start, end in pairs:
+            expected = reference_cost(router, start, end)
+            before = router.total_cost
+            path = router.bfs(start, end, 1)
+            if expected is None:
+                assert path is None
+                continue
+            if window is None:
+                assert router.total_cost - before == expected
+            else:
+                assert router.total_cost - before >= expected
+            assert path[0] == start and path[-1] == end
+            router.grid.set_cells([router.grid.index(*position) for position in path], 0)  # Free it again
+
+
+def read_output(path):
+    """Split a text output file into (header, obstacle cells, {net name: branches or None}, summary)."""
+    with open(path) as f:
+        lines = f.read().split("\n")
+    obstacles = set()
+    routes = {}
+    summary = {}
+    for line in lines[1:]:
+        if line.startswith("OBSRECT("):
+            layer, x1, y1, x2, y2 = map(int, line[8:-1].split(", "))
+            obstacles.update((layer, x, y) for x in range(x1, x2 + 1) for y in range(y1, y2 + 1))
+        elif line.startswith("OBS("):
+            obstacles.add(tuple(map(int, line[4:-1].split(", "))))
+        elif ": " in line:
+            key, value = line.split(": ")
+            summary[key] = int(value)
+        elif line and line != "Summary:":
+            net_name, rest = line.split(" ", 1)
+            routes[net_name] = None if rest == "failed to route." else [
+                [tuple(map(int, position)) for position in POSITION.findall(branch)] for branch in rest.split("|")]
+    return lines[0], obstacles, routes, summary
+
+
+def check_output(input_path, output_path):
+    """Assert that every route in output_path is a legal wiring of its net from input_path; return the routes."""
+    from Router import parse_input
+
+    _, nets = parse_input(input_path)
+    header, obstacles, routes, summary = read_output(output_path)
+    assert list(routes) == list(nets)
+    owner = {}
+    for net_name, branches in routes.items():
+        if branches is None:
+            continue
+        cells = set()
+        for branch in branches:
+            for (l1, x1, y1), (l2, x2, y2) in zip(branch, branch[1:]):
+                assert abs(l1 - l2) + abs(x1 - x2) + abs(y1 - y2) == 1 and (l1 == l2 or (x1, y1) == (x2, y2))
+            if cells:
+                assert branch[0] in cells or branch[-1] in cells  # Joins the wiring routed so far
+            cells.update(branch)
+        assert set(nets[net_name]) <= cells
+        assert not cells & obstacles
+        for position in cells:
+            assert owner.setdefault(position, net_name) == net_name
+    routed = [branches for branches in routes.values() if branches is not None]
+    assert summary["Total wire length"] == sum(len(branch) - 1 for branches in routed for branch in branches)
+    assert summary["Longest route length"] == max((sum(len(branch) - 1 for branch in branches)
+                                                   for branches in routed), default=0)
+    assert summary["Total vias used"] == sum(1 for branches in routed for branch in branches
+                                             for a, b in zip(branch, branch[1:]) if a[0] != b[0])
+    return routes
+
+
+def route_and_check(tmp_path, input_path, **options):
+    """Route input_path with the given router attributes set, check_output() the result and return its routes."""
+    from Router import parse_input
+
+    router, nets = parse_input(input_path)
+    for name, value in options.items():
+        setattr(router, name, value)
+    output = str(tmp_path / "out.txt")
+    router.generate_output(nets, output)
+    return check_output(input_path, output)
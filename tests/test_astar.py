@@ -0,0 +1,19 @@
+from conftest import check_against_reference, random_router
+
+
+def test_astar_matches_a_reference_dijkstra():
+    check_against_reference("astar")
+
+
+def test_astar_expands_no_more_than_dijkstra():
+    # The heuristic is admissible, so A* settles the same costs while skipping states that cannot beat them
+    for seed in range(5):
+        expanded = {}
+        for search in ("dijkstra", "astar"):
+            router, pairs = random_router(seed, search)
+            for start, end in pairs:
+                path = router.bfs(start, end, 1)
+                if path is not None:
+                    router.grid.set_cells([router.grid.index(*position) for position in path], 0)
+            expanded[search] = router.nodes_expanded
+        assert expanded["astar"] <= expanded["dijkstra"]
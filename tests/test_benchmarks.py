@@ -0,0 +1,56 @@
+import json
+import sys
+
+from benchmarks import run
+from benchmarks.generate import generate_design
+
+TINY = {"name": "tiny-12", "width": 12, "height": 12, "density": 0.05, "macros": 1, "nets": 3, "pins": 2}
+
+
+def blocked_cells(lines):
+    cells = set()
+    for line in lines:
+        if line.startswith("OBSRECT("):
+            layer, x1, y1, x2, y2 = map(int, line[len("OBSRECT("):-1].split(","))
+            cells.update((layer, x, y) for x in range(x1, x2 + 1) for y in range(y1, y2 + 1))
+        elif line.startswith("OBS("):
+            cells.add(tuple(map(int, line[len("OBS("):-1].split(","))))
+    return cells
+
+
+def test_designs_are_seeded_and_macros_expand_to_the_same_cells():
+    parameters = {key: value for key, value in TINY.items() if key != "name"}
+    lines = generate_design(seed=3, **parameters)
+    assert generate_design(seed=3, **parameters) == lines
+    assert generate_design(seed=4, **parameters) != lines
+    cells = generate_design(seed=3, rects=False, **parameters)
+    assert not any(line.startswith("OBSRECT") for line in cells)
+    assert blocked_cells(cells) == blocked_cells(lines)
+    assert [line for line in cells if line.startswith("net")] == [line for line in lines if line.startswith("net")]
+
+
+def test_runs_every_variant_and_compares_with_the_previous_run(tmp_path, monkeypatch, capsys):
+    history = tmp_path / "history.json"
+    monkeypatch.setitem(run.SUITES, "tiny", [TINY])
+    monkeypatch.setattr(sys, "argv", ["run", "--suite", "tiny", "--variants", ",".join(run.VARIANTS),
+                                      "--history", str(history)])
+    run.main()
+    run.main()
+    runs = json.loads(history.read_text())
+    assert len(runs) == 2
+    for record in runs[-1]["results"]:
+        assert record["nets"] == TINY["nets"] and 0 < record["routed"] <= record["nets"]
+        assert record["nodes_expanded"] > 0 and record["queue_ops"] >= record["nodes_expanded"]
+        assert record["total_cost"] > 0 and record["seconds"] > 0
+    assert [record["variant"] for record in runs[-1]["results"]] == list(run.VARIANTS)
+    # The searches are deterministic, so only the timings may differ between the two runs
+    assert [{key: value for key, value in record.items() if key not in ("seconds", "peak_rss_mb")}
+            for record in runs[0]["results"]] == \
+        [{key: value for key, value in record.items() if key not in ("seconds", "peak_rss_mb")}
+         for record in runs[1]["results"]]
+
+    capsys.readouterr()
+    monkeypatch.setattr(sys, "argv", ["run", "--compare", "--history", str(history)])
+    run.main()
+    compared = capsys.readouterr().out.splitlines()
+    assert len(compared) == 2 + len(run.VARIANTS)
@@ -0,0 +1,20 @@
+import pytest
+
+from conftest import check_against_reference
+from Router import MazeRouter
+
+
+@pytest.mark.parametrize("bend_penalty", [0, 2, 7])
+def test_bidirectional_matches_a_reference_dijkstra(bend_penalty):
+    check_against_reference("bidirectional", bend_penalty=bend_penalty)
+
+
+def test_meeting_cell_pays_its_bend_once():
+    # Both halves reach the corner (0, 3, 0) at once; the path turns there a single time
+    router = MazeRouter(4, 4, 5, 10, "bidirectional")
+    for y in range(1, 4):
+        for x in range(3):
+            router.grid.block(0, x, y)
+    path = router.bfs((0, 0, 0), (0, 3, 3), 1)
+    assert path == [(0, x, 0) for x in range(4)] + [(0, 3, y) for y in range(1, 4)]
+    assert router.total_cost == 6 + 5
@@ -0,0 +1,83 @@
+import random
+import sys
+
+import pytest
+
+import Router
+from distance_cache import DistanceCache
+from Router import MazeRouter
+from routing_grid import FREE
+
+from conftest import reference_cost
+
+
+def cached_router(width=12, height=12, bend_penalty=1, via_penalty=3):
+    router = MazeRouter(width, height, bend_penalty, via_penalty)
+    router.distance_cache = DistanceCache(1 << 20)
+    return router
+
+
+def routed_cost(router, start, end, net_id):
+    before = router.total_cost
+    path = router.bfs(start, end, net_id)
+    return None if path is None else router.total_cost - before
+
+
+def test_repeated_query_hits():
+    router = cached_router()
+    router.bfs((0, 5, 5), (0, 10, 5), 1)
+    path = router.bfs((0, 5, 5), (0, 0, 5), 2)  # Settled by the first search, away from its path
+    cache = router.distance_cache
+    assert (cache.hits, cache.misses, cache.invalidated) == (1, 1, 0)
+    assert path == [(0, x, 5) for x in range(5, -1, -1)]
+    assert router.total_cost == 10
+    assert all(router.grid.get(*position) == 2 for position in path[1:])
+
+
+def test_claimed_path_is_searched_again():
+    router = cached_router()
+    router.bfs((0, 5, 5), (0, 10, 5), 1)
+    expected = reference_cost(router, (0, 5, 5), (0, 9, 6))
+    assert routed_cost(router, (0, 5, 5), (0, 9, 6), 2) == expected  # The cached path runs over net 1
+    assert router.distance_cache.hits == 0
+    assert router.bfs((0, 5, 5), (0, 8, 5), 3) is None  # Now owned by net 1
+
+
+def test_freed_cells_invalidate():
+    router = cached_router()
+    for y in range(12):
+        if y != 0:
+            router.grid.block(0, 7, y)
+            router.grid.block(1, 7, y)
+    router.bfs((0, 5, 5), (0, 9, 5), 1)
+    router.grid.set_cells([router.grid.index(0, 7, 6)], FREE)  # Opens a shorter way through the wall
+    expected = reference_cost(router, (0, 5, 5), (0, 9, 7))
+    assert routed_cost(router, (0, 5, 5), (0, 9, 7), 2) == expected
+    assert router.distance_cache.invalidated == 1
+
+
+def test_cached_costs_match_a_fresh_search():
+    rng = random.Random(7)
+    router = cached_router(20, 20, 2, 4)
+    for _ in range(120):
+        router.grid.block(rng.randrange(2), rng.randrange(20), rng.randrange(20))
+    sources = [(0, 2, 2), (1, 17, 3), (0, 10, 16)]
+    for source in sources:
+        router.grid.cells[router.grid.index(*source)] = FREE
+    for net_id in range(1, 40):
+        start = rng.choice(sources)
+        end = (rng.randrange(2), rng.randrange(20), rng.randrange(20))
+        if end == start:
+            continue
+        expected = reference_cost(router, start, end)
+        assert routed_cost(router, start, end, net_id) == expected
+    assert router.distance_cache.hits > 0
+
+
+def test_window_and_cache_are_rejected_together(tmp_path, monkeypatch, capsys):
+    # Window searches run on a copy of the window and would leave the cache at 0 hits and 0 misses
+    monkeypatch.setattr(sys, "argv", ["Router.py", "in.txt", str(tmp_path / "out.txt"), "--window", "4",
+                                      "--distance-cache", "8"])
+    with pytest.raises(SystemExit):
+        Router.main()
+    assert "--window cannot be combined with --distance-cache" in capsys.readouterr().err
@@ -0,0 +1,108 @@
+import pytest
+
+
+def used(router):
+    """Positions marked in the overlay of routed cells."""
+    size = router.grid_width * router.grid_height
+    return {(index // size, index % size % router.grid_width, index % size // router.grid_width)
+            for index, value in enumerate(router.overlay) if value}
+
+
+def test_rollback_frees_only_what_was_routed_after_the_mark(final_router):
+    router = final_router.MazeRouter(6, 6, 1, 3)
+    first = router.route_net("a", [(0, 0, 0), (0, 5, 0)])
+    mark = router.checkpoint()
+    router.route_net("b", [(0, 0, 2), (0, 5, 2)])
+    router.route_net("c", [(1, 0, 4), (1, 5, 4)])
+    router.rollback(mark)
+    assert used(router) == set(first)
+    assert list(router.net_spans) == ["a"]
+    router.reset_state()
+    assert not any(router.overlay) and not router.journal and not router.net_spans
+
+
+def test_rip_up_frees_one_net_and_keeps_later_spans(final_router):
+    router = final_router.MazeRouter(6, 6, 1, 3)
+    router.route_net("a", [(0, 0, 0), (0, 5, 0)])
+    second = router.route_net("b", [(0, 0, 2), (0, 5, 2)])
+    router.rip_up("a")
+    assert used(router) == set(second)
+    mark = router.checkpoint()
+    third = router.route_net("c", [(0, 0, 0), (0, 5, 0)])  # Takes the cells net a gave back
+    assert used(router) == set(second) | set(third)
+    router.rip_up("b")
+    assert used(router) == set(third)
+    router.rollback(mark)
+    assert not any(router.overlay) and list(router.net_spans) == []
+
+
+@pytest.mark.parametrize("position", [(2, 0, 0), (0, 6, 0), (0, 0, -1)])
+def test_obstacle_outside_the_grid_is_rejected(final_router, write_input, position):
+    with pytest.raises(ValueError, match="outside the 2x6x6 grid"):
+        final_router.MazeRouter(6, 6, 1, 3).add_obstacle(*position)
+    path = write_input("6, 6, 1, 3", "OBS({}, {}, {})".format(*position), "net1 (0, 0, 0) (0, 5, 0)")
+    assert final_router.parse_input(path) == (None, None)
+
+
+@pytest.fixture
+def design(final_router):
+    """A 10x10 router with a blocked 3x3 square, and four nets that the orderings rank differently."""
+    router = final_router.MazeRouter(10, 10, 1, 3)
+    for x in range(4, 7):
+        for y in range(4, 7):
+            router.add_obstacle(0, x, y)
+    nets = {
+        "wide": [(0, 0, 0), (0, 9, 0)],  # hpwl 9, no obstacle in its box
+        "square": [(0, 3, 3), (0, 7, 7)],  # hpwl 8, its box is 9 of 25 cells blocked on layer 0
+        "via": [(0, 0, 9), (1, 2, 9)],  # hpwl 2, one layer change
+        "flat": [(0, 0, 8), (0, 1, 8), (0, 2, 8)],  # hpwl 2, three pins
+    }
+    return router, nets
+
+
+@pytest.mark.parametrize("order, expected, descending", [
+    ("hpwl", [("flat", 2), ("via", 2), ("square", 8), ("wide", 9)], ["wide", "square", "via", "flat"]),
+    ("pins", [("wide", 2), ("square", 2), ("via", 2), ("flat", 3)], ["flat", "via", "wide", "square"]),
+    ("congestion", [("wide", 0.0), ("flat", 0.0), ("via", 0.0), ("square", 9 / 50)],
+     ["square", "via", "wide", "flat"]),
+])
+def test_estimated_orderings(design, order, expected, descending):
+    # Equal keys go to the net with fewer layer changes first, "via" has one
+    router, nets = design
+    router.net_order = order
+    assert [(net_name, key) for net_name, _, key in router.sort_nets(nets)] == expected
+    router.sort_order = "desc"
+    assert [net_name for net_name, _, _ in router.sort_nets(nets)] == descending
+
+
+@pytest.mark.parametrize("workers", [1, 2])
+def test_length_ordering_routes_each_net_alone_and_drops_failures(design, workers):
+    # With two workers the lengths come from the process pool on the shared obstacle grid
+    router, nets = design
+    router.workers = workers
+    nets["walled"] = [(0, 5, 5), (0, 0, 5)]  # Starts inside the obstacle
+    router.add_obstacle(1, 5, 5)
+    ordered = router.sort_nets(nets)
+    assert [(net_name, length) for net_name, _, length in ordered] == [("flat", 2), ("via", 3), ("square", 8),
+                                                                       ("wide", 9)]
+    router.sort_order = "desc"
+    assert [net_name for net_name, _, _ in router.sort_nets(nets)] == ["wide", "square", "via", "flat"]
+
+
+def test_unknown_ordering_is_rejected(design):
+    router, nets = design
+    router.net_order = "random"
+    with pytest.raises(ValueError, match="unknown net ordering 'random'"):
+        router.sort_nets(nets)
+
+
+def test_output_lists_the_routing_order(design, tmp_path):
+    router, nets = design
+    router.net_order = "hpwl"
+    output = tmp_path / "out.txt"
+    router.generate_output(nets, str(output))
+    lines = output.read_text().splitlines()
+    start = lines.index("Sorted nets by hpwl:")
+    assert lines[start + 1:start + 5] == ["flat: 2", "via: 2", "square: 8", "wide: 9"]
+    assert [line.split()[0] for line in lines[1:] if line.startswith(tuple(nets))][:4] == \
+        ["flat", "via", "square", "wide"]
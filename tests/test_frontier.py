@@ -0,0 +1,62 @@
+import random
+
+from frontier import BUCKET_MAX_PENALTY, BucketFrontier, HeapFrontier, choose_frontier
+from Router import MazeRouter
+
+
+def drain(queue):
+    items = []
+    while (item := queue.pop()) is not None:
+        items.append(item)
+    return items
+
+
+def test_bucket_pops_by_priority_then_push_order():
+    rng = random.Random(1)
+    heap = HeapFrontier()
+    bucket = BucketFrontier()
+    pushed = 0
+    popped = []
+    for _ in range(200):  # Pushes at or above the last pop, as in a search, with many ties
+        floor = popped[-1][0] if popped else 0
+        for _ in range(rng.randrange(4)):
+            item = (floor + rng.randrange(5), pushed)  # (priority, push number)
+            heap.push(item[0], item)
+            bucket.push(item[0], item)
+            pushed += 1
+        item = heap.pop()  # The heap breaks ties on the push number, which is FIFO
+        assert bucket.pop() == item
+        if item is not None:
+            popped.append(item)
+    assert drain(bucket) == drain(heap)
+
+
+def test_bucket_does_not_compare_items():
+    queue = BucketFrontier()
+    for item in ({"a": 1}, {"b": 2}, {"c": 3}):  # Dicts cannot be ordered
+        queue.push(3, item)
+    assert drain(queue) == [{"a": 1}, {"b": 2}, {"c": 3}]
+
+
+def test_lower_push_moves_back():
+    queue = BucketFrontier()
+    queue.push(5, "late")
+    assert queue.pop() == "late"
+    queue.push(7, "b")
+    queue.push(2, "a")
+    assert drain(queue) == ["a", "b"]
+
+
+def test_choose_frontier():
+    assert choose_frontier(500, 500) == "bucket"
+    assert choose_frontier(0, BUCKET_MAX_PENALTY, 3) == "bucket"
+    assert choose_frontier(3, 10 ** 8) == "heap"
+    assert choose_frontier(1.5, 2) == "heap"
+    assert choose_frontier(-1, 2) == "heap"
+
+
+def test_cell_costs_get_a_heap():
+    router = MazeRouter(4, 4, 1, 2)
+    assert router.frontier == "bucket"
+    assert isinstance(router._frontier(), BucketFrontier)
+    assert isinstance(router._frontier(cell_cost=[0] * len(router.grid)), HeapFrontier)
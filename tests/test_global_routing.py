@@ -0,0 +1,25 @@
+import pytest
+
+from conftest import route_and_check, sample
+from global_routing import GlobalRouting
+from Router import MazeRouter
+
+
+@pytest.mark.parametrize("number", range(1, 9))
+@pytest.mark.parametrize("tree", [False, True])
+def test_sample_outputs_are_valid(tmp_path, number, tree):
+    routes = route_and_check(tmp_path, sample(number), gcell_size=3, tree=tree)
+    assert any(branches is not None for branches in routes.values())
+
+
+def test_blocked_boundary_has_no_capacity_and_is_avoided():
+    router = MazeRouter(12, 8, 1, 3)
+    for layer in (0, 1):
+        for y in range(4):
+            router.grid.block(layer, 3, y)  # Fills the last column of GCell (0, 0) next to (1, 0)
+    routing = GlobalRouting(router, 4)
+    assert routing.capacity(((0, 0), (1, 0))) == 0
+    assert routing.capacity(((0, 1), (1, 1))) == 8  # A track per layer and row
+    corridors = routing.global_route({"net": [(0, 1, 1), (0, 10, 1)]})
+    assert {(0, 1), (1, 1)} <= corridors["net"]  # Around the full boundary through the row below
+    assert routing.overflow == 0
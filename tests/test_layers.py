@@ -0,0 +1,39 @@
+import importlib.util
+import os
+
+import pytest
+
+from conftest import ROOT, check_against_reference
+from Router import MazeRouter
+
+
+@pytest.mark.parametrize("search", ["dijkstra", "astar", "bidirectional"])
+def test_layer_stack_matches_a_reference_dijkstra(search):
+    check_against_reference(search, layers=3, preferred_directions="HVH", wrong_way_penalties=[3, 2, 4])
+
+
+def test_wires_keep_to_their_layer_direction():
+    router = MazeRouter(10, 10, 1, 2, layers=2, preferred_directions="HV", wrong_way_penalties=10)
+    path = router.bfs((0, 0, 0), (0, 9, 9), 1)
+    for (l1, x1, y1), (l2, x2, y2) in zip(path, path[1:]):
+        if l1 == l2:
+            assert (y1 == y2) if l1 == 0 else (x1 == x2)  # Layer 0 runs along x, layer 1 along y
+    assert router.total_cost == 18 + 2 * 2 + 1  # Steps in their preferred direction, two vias, and the turn
+
+
+def test_vias_only_join_adjacent_layers():
+    router = MazeRouter(3, 1, 1, 4, layers=4)
+    path = router.bfs((0, 1, 0), (3, 1, 0), 1)
+    assert path == [(layer, 1, 0) for layer in range(4)]
+    assert router.total_cost == 3 * 4
+
+
+def test_prototype_reads_the_layer_count_from_the_header(write_input):
+    spec = importlib.util.spec_from_file_location("main_new", os.path.join(ROOT, "Maze-Router", "main_new.py"))
+    main_new = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(main_new)
+    router, nets = main_new.parse_input(write_input("3, 1, 1, 4, 4, HVHV, 2", "net1 (0, 1, 0) (3, 1, 0)"))
+    assert router.layers == 4
+    assert router.route_net(nets["net1"]) == [(layer, 1, 0) for layer in range(4)]
+    router, _ = main_new.parse_input(write_input("3, 1, 1, 4"))
+    assert router.layers == 2
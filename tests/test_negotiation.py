@@ -0,0 +1,62 @@
+from Router import MazeRouter, parse_input
+from negotiation import Negotiation, segment_cost
+
+from conftest import sample
+
+
+def test_shared_track_is_negotiated():
+    """Two nets that both want the only gap in a wall end up on separate cells, or one of them fails."""
+    router = MazeRouter(7, 5, 1, 2, layers=1)
+    for y in range(5):
+        if y != 2:
+            router.grid.block(0, 3, y)  # A wall with a single gap at y = 2
+    nets = {"a": [(0, 0, 2), (0, 6, 2)], "b": [(0, 0, 1), (0, 6, 3)]}
+    paths = Negotiation(router, 10).run(nets)
+    assert paths["a"] is not None and paths["b"] is None  # The gap goes to the first net in the file
+    assert router.grid.get(0, 3, 2) == router.net_id("a")
+
+
+def test_failed_net_is_retried(monkeypatch):
+    """A net whose search fails in one iteration is routed again instead of being dropped."""
+    router, nets = parse_input(sample(6))
+    net_name = next(iter(nets))
+    net_id = router.net_id(net_name)
+    bfs = router.bfs
+    failures = []
+
+    def failing_once(start, end, net=None, cell_cost=None):
+        if net == net_id and not failures:
+            failures.append(start)
+            return None
+        return bfs(start, end, net, cell_cost)
+
+    monkeypatch.setattr(router, "bfs", failing_once)
+    negotiation = Negotiation(router, 10)
+    paths = negotiation.run(nets)
+    assert failures
+    assert negotiation.iterations_run >= 2
+    assert negotiation.unrouted == 0
+    assert all(paths.values())
+
+
+def test_committed_paths_are_disjoint_and_costed():
+    router, nets = parse_input(sample(7))
+    paths = Negotiation(router, 30).run(nets)
+    seen = {}
+    cost = 0
+    for net_name, path in paths.items():
+        if path is None:
+            continue
+        cost += segment_cost(path, router.bend_penalty, router.via_penalty, router.move_costs)
+        for position in path:
+            assert seen.setdefault(position, net_name) == net_name
+            assert router.grid.get(*position) == router.net_id(net_name)
+    assert 0 < router.total_cost <= cost  # Each segment starts without a heading, so a bend at a pin is free
+
+
+def test_pin_on_another_net_keeps_its_owner():
+    router = MazeRouter(6, 3, 1, 2)
+    router.grid.set_cells([router.grid.index(0, 0, 1)], 9)  # Wire of a net routed before
+    paths = Negotiation(router, 5).run({"b": [(0, 0, 1), (0, 5, 1)]})
+    assert paths["b"] is not None
+    assert router.grid.get(0, 0, 1) == 9
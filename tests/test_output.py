@@ -0,0 +1,116 @@
+import pytest
+
+from conftest import random_router, read_output, sample
+from output_writer import BUFFER_SIZE, OutputWriter, compress_path, expand_runs, format_runs, parse_runs, read_binary
+from Router import parse_input
+
+
+def route(input_path, output_path):
+    router, nets = parse_input(input_path)
+    router.generate_output(nets, output_path)
+    with open(output_path) as f:
+        return f.read().splitlines()
+
+
+def test_obs_input_gives_obs_output(write_input, tmp_path):
+    path = write_input("6, 4, 1, 2", "OBS(0, 2, 0)", "OBS(0, 2, 1)", "OBS(0, 3, 0)", "OBS(0, 3, 1)",
+                       "net1 (0, 0, 0) (0, 5, 0)")
+    lines = route(path, str(tmp_path / "out.txt"))
+    obstacles = [line for line in lines if line.startswith("OBS")]
+    assert sorted(obstacles) == ["OBS(0, 2, 0)", "OBS(0, 2, 1)", "OBS(0, 3, 0)", "OBS(0, 3, 1)"]
+
+
+def test_obsrect_input_gives_obsrect_output(write_input, tmp_path):
+    path = write_input("6, 4, 1, 2", "OBSRECT(0, 2, 0, 3, 1)", "OBS(1, 5, 3)", "net1 (0, 0, 0) (0, 5, 0)")
+    lines = route(path, str(tmp_path / "out.txt"))
+    obstacles = [line for line in lines if line.startswith("OBS")]
+    assert sorted(obstacles) == ["OBS(1, 5, 3)", "OBSRECT(0, 2, 0, 3, 1)"]
+
+
+def write_design(writer):
+    writer.header("6, 4, 1, 2")
+    writer.obstacles([(0, 2, 0, 3, 1), (1, 5, 3, 5, 3)])
+    writer.net("net1", [(0, 0, 0), (0, 1, 0), (1, 1, 0), (1, 1, 1)])
+    writer.tree_net("net2", [[(0, 0, 3), (0, 1, 3)], [(0, 1, 3), (0, 1, 2)]])
+    writer.failed("net3")
+    writer.summary(12, 5, 3, 1)
+
+
+def test_buffer_size_does_not_change_the_file(tmp_path):
+    contents = []
+    for buffer_size in (1, 50, BUFFER_SIZE):
+        path = tmp_path / f"out{buffer_size}.txt"
+        with OutputWriter(str(path), buffer_size) as writer:
+            write_design(writer)
+        contents.append(path.read_text())
+    assert contents[0] == contents[1] == contents[2]
+    assert contents[0].splitlines() == [
+        "6, 4, 1, 2", "OBSRECT(0, 2, 0, 3, 1)", "OBS(1, 5, 3)", "net1 (0, 0, 0) (0, 1, 0) (1, 1, 0) (1, 1, 1) ",
+        "net2 (0, 0, 3) (0, 1, 3) | (0, 1, 3) (0, 1, 2) ", "net3 failed to route.", "", "Summary:",
+        "Total cost of routing: 12", "Total wire length: 5", "Longest route length: 3", "Total vias used: 1"]
+
+
+def test_writes_wait_for_a_full_buffer(tmp_path):
+    path = tmp_path / "out.txt"
+    with OutputWriter(str(path), buffer_size=40) as writer:
+        writer.header("6, 4, 1, 2")
+        writer.net("net1", [(0, 0, 0), (0, 1, 0)])
+        assert path.stat().st_size == 0  # 37 characters pending
+        writer.net("net2", [(0, 2, 2), (0, 2, 3)])
+        writer._file.flush()
+        assert path.read_text().count("\n") == 3  # Written in one block once 40 were reached
+        writer.failed("net3")
+    assert path.read_text().count("\n") == 4  # The rest on exit
+
+
+def read_runs(path):
+    """(header, {net name: branches or None}, summary) of a run-length text output file."""
+    header, _, _, summary = read_output(path)  # Obstacle and summary lines are the same in both layouts
+    routes = {}
+    with open(path) as f:
+        for line in f.read().split("\n")[1:]:
+            if line.startswith("OBS") or not line or ": " in line or line == "Summary:":
+                continue
+            net_name, rest = line.split(" ", 1)
+            if rest == "failed to route.":
+                routes[net_name] = None
+                continue
+            routes[net_name] = []
+            for branch in rest.split("| "):
+                start, runs = branch.split(") ", 1)
+                routes[net_name].append(expand_runs(tuple(map(int, start[1:].split(", "))), parse_runs(runs.split())))
+    return header, routes, summary
+
+
+@pytest.mark.parametrize("tree", [False, True])
+def test_runs_and_binary_outputs_decode_to_the_cells_output(tmp_path, tree):
+    outputs = {}
+    for output_format in ("cells", "runs", "binary"):
+        router, nets = parse_input(sample(7))
+        router.tree = tree
+        router.output_format = output_format
+        outputs[output_format] = str(tmp_path / f"out.{output_format}")
+        router.generate_output(nets, outputs[output_format])
+    header, _, routes, summary = read_output(outputs["cells"])
+    assert any(routes.values())
+    assert read_runs(outputs["runs"]) == (header, routes, summary)
+
+    binary_header, rects, binary_nets, totals = read_binary(outputs["binary"])
+    assert binary_header == header
+    assert set(rects) == {(layer, x, y, x, y) for layer, x, y in router.grid.blocked_cells()}
+    assert {net_name: None if branches is None else [expand_runs(start, runs) for start, runs in branches]
+            for net_name, branches in binary_nets.items()} == routes
+    assert totals == (router.total_cost, summary["Total wire length"], summary["Longest route length"],
+                      summary["Total vias used"])
+
+
+def test_runs_round_trip():
+    router, pairs = random_router(2, via_penalty=1)
+    for start, end in pairs:
+        path = router.bfs(start, end, 1)
+        if path is not None:
+            runs = compress_path(path)
+            assert expand_runs(path[0], runs) == path
+            assert all(runs[i][0] != runs[i + 1][0] or (runs[i][1] > 0) != (runs[i + 1][1] > 0)
+                       for i in range(len(runs) - 1))  # Merged as far as possible
+            assert expand_runs(path[0], parse_runs(format_runs(path).split()[3:])) == path
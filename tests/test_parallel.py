@@ -0,0 +1,73 @@
+import logging
+import random
+
+import pytest
+
+import parallel
+from conftest import route_and_check, sample
+from Router import parse_input
+
+
+def generated_design(write_input, size=40, nets=16, seed=7):
+    """Input for a size x size grid with scattered obstacles and nets of two or three pins."""
+    rng = random.Random(seed)
+    cells = [(layer, x, y) for layer in (0, 1) for x in range(size) for y in range(size)]
+    rng.shuffle(cells)
+    obstacles = cells[:size * size // 10]
+    pins = iter(cells[size * size // 10:])
+    lines = [f"{size}, {size}, 2, 5"]
+    lines += [f"OBS({layer}, {x}, {y})" for layer, x, y in obstacles]
+    for number in range(nets):
+        net_pins = [next(pins) for _ in range(rng.choice((2, 3)))]
+        lines.append(f"net{number} " + " ".join(f"({layer}, {x}, {y})" for layer, x, y in net_pins))
+    return write_input(*lines)
+
+
+def route(input_path, output_path, jobs=1, search="dijkstra", window=None, tree=False):
+    router, nets = parse_input(input_path)
+    router.search = search
+    router.window_margin = window
+    router.tree = tree
+    router.jobs = jobs
+    router.generate_output(nets, output_path)
+    with open(output_path) as f:
+        return f.read()
+
+
+@pytest.mark.parametrize("options", [{}, {"search": "astar"}, {"window": 3}, {"tree": True}])
+def test_jobs_match_serial_on_generated_design(write_input, tmp_path, options):
+    path = generated_design(write_input)
+    serial = route(path, str(tmp_path / "serial.txt"), **options)
+    assert route(path, str(tmp_path / "jobs.txt"), jobs=2, **options) == serial
+
+
+@pytest.mark.parametrize("number", range(1, 9))
+@pytest.mark.parametrize("tree", [False, True])
+def test_sample_outputs_are_valid(tmp_path, number, tree):
+    routes = route_and_check(tmp_path, sample(number), jobs=2, tree=tree)
+    assert any(branches is not None for branches in routes.values())
+
+
+@pytest.mark.parametrize("number", [1, 3, 5])
+def test_jobs_match_serial_on_samples(tmp_path, number):
+    serial = route(sample(number), str(tmp_path / "serial.txt"), search="astar")
+    assert route(sample(number), str(tmp_path / "jobs.txt"), jobs=2, search="astar") == serial
+
+
+def test_conflicting_nets_are_routed_again(write_input, tmp_path, monkeypatch, caplog):
+    # Batching on pin boxes alone puts dijkstra searches that run into each other in one batch
+    monkeypatch.setattr(parallel, "search_box", lambda router, pins: parallel.net_box(pins))
+    path = generated_design(write_input)
+    serial = route(path, str(tmp_path / "serial.txt"))
+    with caplog.at_level(logging.INFO, logger=parallel.log.name):
+        assert route(path, str(tmp_path / "jobs.txt"), jobs=2) == serial
+    summary = [record.args for record in caplog.records if record.msg.startswith("Parallel routing")]
+    assert summary and summary[0][1] > 0 and summary[0][3] > 0
+
+
+def test_batches_split_on_touching_boxes_and_pin_count():
+    nets = {"a": [(0, 0, 0), (0, 2, 2)], "b": [(0, 4, 0), (0, 6, 2)], "c": [(0, 3, 3), (0, 3, 5)],
+            "d": [(0, 9, 9), (0, 9, 10)]}
+    assert [[name for name, _ in batch] for batch in parallel.batches(nets)] == [["a", "b"], ["c", "d"]]
+    assert [[name for name, _ in batch] for batch in parallel.batches(nets, max_pins=3)] == \
+        [["a"], ["b"], ["c"], ["d"]]
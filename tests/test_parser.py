@@ -0,0 +1,102 @@
+import re
+
+import pytest
+
+import Router
+from Router import InputFormatError, parse_input
+from routing_grid import BLOCKED
+
+
+@pytest.fixture(params=["numpy", "plain"])
+def decoder(request, monkeypatch):
+    """Run each test with the NumPy and the pure-Python obstacle decoder."""
+    if request.param == "numpy":
+        if Router.numpy is None:
+            pytest.skip("NumPy is not installed")
+    else:
+        monkeypatch.setattr(Router, "numpy", None)
+    return request.param
+
+
+def blocked(router):
+    return set(router.grid.blocked_cells())
+
+
+@pytest.mark.parametrize("obstacle", ["OBS(0, 1, 1)", "OBS(0,1,1)", "  OBS(0, 1, 1)", "\tOBS(0,1,1)  ",
+                                      "OBS (0 ,1, 1)"])
+def test_obstacle_spellings(decoder, write_input, obstacle):
+    path = write_input("5, 5, 1, 2", obstacle, "OBS(1,4,3)")
+    router, nets = parse_input(path)
+    assert blocked(router) == {(0, 1, 1), (1, 4, 3)}
+    assert nets == {}
+
+
+def test_obstacles_mixed_with_nets_and_rects(decoder, write_input):
+    path = write_input("6, 4, 1, 2",
+                       "OBS(0,1,1)",
+                       "  OBSRECT(1, 2, 0, 3, 1)",
+                       "",
+                       "   net1 (0, 0, 0) (1,5,3)",
+                       "OBS(0, 5, 0)",
+                       "net2 (0,0,3)(0, 2,3)")
+    router, nets = parse_input(path)
+    assert blocked(router) == {(0, 1, 1), (0, 5, 0), (1, 2, 0), (1, 3, 0), (1, 2, 1), (1, 3, 1)}
+    assert nets == {"net1": [(0, 0, 0), (1, 5, 3)], "net2": [(0, 0, 3), (0, 2, 3)]}
+    assert router.grid.get(1, 2, 0) == BLOCKED
+
+
+def test_header_with_layer_stack(write_input):
+    router, _ = parse_input(write_input("4, 3, 1, 2, 3, HVH, 5"))
+    assert (router.grid_width, router.grid_height, router.layers) == (4, 3, 3)
+    assert router.preferred_directions == "HVH"
+    assert router.wrong_way_penalties == [5, 5, 5]
+
+
+@pytest.mark.parametrize("lines, line_number, message", [
+    (["5, 5, 1"], 1, "expected 'width, height"),
+    (["0, 5, 1, 2"], 1, "grid size must be positive"),
+    (["5, 5, 1, 2", "OBS(0, 1, 1)", "OBS(0, 1)"], 3, "expected obstacle 'layer, x, y'"),
+    (["5, 5, 1, 2", "OBS(0,1,1)", "OBS(0,1,1", "OBS(0,2,2)"], 3, "expected 'OBS(layer, x, y)'"),
+    (["5, 5, 1, 2", "OBS(0, 1, 1)", "  OBS(2, 1, 1)"], 3, "outside the 2x5x5 grid"),
+    (["5, 5, 1, 2", "OBSRECT(0, 1, 1, 5, 1)"], 2, "outside the 2x5x5 grid"),
+    (["5, 5, 1, 2", "net1 (0, 1, 1) (0, 9, 1)"], 2, "pin (0, 9, 1) is outside"),
+    (["5, 5, 1, 2", "net1"], 2, "net has no pins"),
+])
+def test_malformed_input_reports_line(decoder, write_input, lines, line_number, message):
+    path = write_input(*lines)
+    with pytest.raises(InputFormatError, match=re.escape(message)) as error:
+        parse_input(path)
+    assert error.value.line_number == line_number
+    assert str(error.value).startswith(f"{path}:{line_number}: ")
+
+
+def test_line_numbers_across_batches(decoder, write_input, monkeypatch):
+    monkeypatch.setattr(Router, "PARSE_CHUNK_SIZE", 16)  # A few lines per batch
+    lines = ["9, 9, 1, 2"] + [f"OBS(0,{x},{y})" for x in range(9) for y in range(3)] + ["OBS(0, 9, 0)"]
+    with pytest.raises(InputFormatError) as error:
+        parse_input(write_input(*lines))
+    assert error.value.line_number == len(lines)
+    router, _ = parse_input(write_input(*lines[:-1]))
+    assert len(blocked(router)) == 27
+
+
+def test_unrecognized_lines_are_skipped(decoder, write_input, caplog):
+    router, nets = parse_input(write_input("5, 5, 1, 2", "# comment", "OBS(0,1,1)"))
+    assert blocked(router) == {(0, 1, 1)}
+    assert "input.txt:2: ignoring unrecognized line '# comment'" in caplog.text
+
+
+def test_non_ascii_blank_lines_are_skipped_quietly(decoder, write_input, caplog):
+    path = write_input("5, 5, 1, 2", "\u00a0", "OBS(0, 1, 1)", "\u00a0 \u00a0", "net1 (0, 0, 0) (0, 4, 4)")
+    router, nets = parse_input(path)
+    assert blocked(router) == {(0, 1, 1)}
+    assert list(nets) == ["net1"]
+    assert "unrecognized" not in caplog.text
+
+
+@pytest.mark.parametrize("typo", ["OB(0,1,1)", "(0, 1, 1)", "0 1 1"])
+def test_unrecognized_lines_in_an_obstacle_batch_are_reported(decoder, write_input, caplog, typo):
+    # These lines hold nothing but OBS characters, so the batch first goes to the bulk decoder
+    router, _ = parse_input(write_input("5, 5, 1, 2", "OBS(0,2,2)", typo, "OBS(1,4,3)"))
+    assert blocked(router) == {(0, 2, 2), (1, 4, 3)}
+    assert f"input.txt:3: ignoring unrecognized line {typo!r}" in caplog.text
@@ -0,0 +1,35 @@
+import os
+
+import pytest
+
+from conftest import ROOT, check_against_reference, random_router, route_and_check, sample
+
+SHIPPED = [os.path.join(ROOT, "input (1).txt")] + [sample(number) for number in range(1, 9)]
+BASELINE_FAILURES = {sample(5): {"net2"}}  # Nets the original Router.py could not route either
+
+
+def test_search_matches_a_reference_dijkstra():
+    check_against_reference("dijkstra")
+
+
+@pytest.mark.parametrize("path", SHIPPED)
+@pytest.mark.parametrize("options", [{}, {"search": "astar"}, {"tree": True}, {"window_margin": 2}])
+def test_shipped_samples_route_as_well_as_the_baseline(tmp_path, path, options):
+    routes = route_and_check(tmp_path, path, **options)
+    failed = {net_name for net_name, branches in routes.items() if branches is None}
+    assert failed <= BASELINE_FAILURES.get(path, set())
+
+
+def test_earlier_net_goes_around_a_later_pin(tmp_path, write_input):
+    # net1's cheapest path runs straight through net2's first pin, which would leave net2 unroutable
+    path = write_input("5, 3, 1, 50, 1", "net1 (0, 0, 1) (0, 4, 1)", "net2 (0, 2, 1) (0, 2, 0)")
+    routes = route_and_check(tmp_path, path)
+    assert all(routes.values())
+
+
+def test_free_net_id_leaves_the_path_free():
+    router, pairs = random_router(0)
+    cells = bytes(router.grid.cells)
+    for start, end in pairs:
+        router.bfs(start, end, 0)
+    assert bytes(router.grid.cells) == cells
@@ -0,0 +1,79 @@
+import contextlib
+import csv
+import json
+
+import pytest
+
+from conftest import sample
+from Router import MazeRouter, parse_input
+from search_stats import NET_FIELDS, SEGMENT_FIELDS, SearchStats
+
+
+def route(tmp_path, stats=None, **options):
+    router, nets = parse_input(sample(7))
+    router.stats = stats
+    for name, value in options.items():
+        setattr(router, name, value)
+    output = tmp_path / f"out{len(list(tmp_path.iterdir()))}.txt"
+    router.generate_output(nets, str(output))
+    return router, output.read_text()
+
+
+@pytest.mark.parametrize("options", [{}, {"search": "astar"}, {"window_margin": 1}, {"tree": True}])
+def test_counters_add_up_and_do_not_change_routing(tmp_path, options):
+    stats = SearchStats()
+    router, output = route(tmp_path, stats, **options)
+    assert output == route(tmp_path, **options)[1]
+    assert stats.segments
+    for segment in stats.segments:
+        assert segment["popped"] == segment["expanded"] + segment["stale"]
+        assert segment["peak_frontier"] <= segment["pushed"]
+        assert segment["routed"] == (segment["failure"] is None)
+    assert sum(segment["cost"] for segment in stats.segments) == router.total_cost
+    nets = stats.nets()
+    assert set(nets) <= set(router.net_ids)
+    for field in ("cost", "pushed", "popped", "expanded"):
+        assert sum(net[field] for net in nets.values()) == sum(segment[field] for segment in stats.segments)
+
+
+def test_failures_say_why():
+    router = MazeRouter(4, 4, 1, 2)
+    router.stats = SearchStats()
+    router.grid.set_cells([router.grid.index(0, 3, 3)], 7)  # Another net's wire on the end pin
+    for layer in (0, 1):
+        router.grid.block(layer, 1, 0)
+        router.grid.block(layer, 0, 1)
+    assert router.bfs((0, 2, 2), (0, 3, 3), 1) is None
+    assert router.bfs((0, 0, 0), (0, 2, 0), 1) is None  # Walled in
+    assert [segment["failure"] for segment in router.stats.segments] == ["end pin occupied", "no path"]
+
+
+def test_dump_writes_segments_and_nets(tmp_path):
+    stats = SearchStats()
+    route(tmp_path, stats)
+    paths = stats.dump(str(tmp_path / "run"))
+    assert paths == [str(tmp_path / f"run.{name}") for name in ("segments.csv", "nets.csv", "stats.json")]
+    with open(paths[0], newline='') as f:
+        rows = list(csv.DictReader(f))
+    assert len(rows) == len(stats.segments) and list(rows[0]) == list(SEGMENT_FIELDS)
+    assert [int(row["expanded"]) for row in rows] == [segment["expanded"] for segment in stats.segments]
+    with open(paths[1], newline='') as f:
+        rows = list(csv.DictReader(f))
+    assert [row["net"] for row in rows] == list(stats.nets()) and list(rows[0]) == list(NET_FIELDS)
+    with open(paths[2]) as f:
+        data = json.load(f)
+    assert len(data["segments"]) == len(stats.segments) and len(data["nets"]) == len(stats.nets())
+
+
+def test_profile_hook_wraps_only_the_named_nets(tmp_path):
+    profiled = []
+
+    @contextlib.contextmanager
+    def hook(net_name):
+        profiled.append(net_name)
+        yield
+
+    router, nets = parse_input(sample(7))
+    router.stats = SearchStats(["net2"], hook)
+    router.generate_output(nets, str(tmp_path / "out.txt"))
+    assert profiled == ["net2"]
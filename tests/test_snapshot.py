@@ -0,0 +1,73 @@
+import os
+
+import pytest
+
+import snapshot
+from conftest import sample
+from Router import parse_input
+
+
+def route(router, nets, output_path):
+    router.generate_output(nets, output_path)
+    with open(output_path) as f:
+        return f.read()
+
+
+@pytest.mark.parametrize("mapped", [False, True])
+def test_snapshot_round_trip(tmp_path, mapped):
+    router, nets = parse_input(sample(6))
+    router.routes = {}
+    expected = route(router, nets, str(tmp_path / "out.txt"))
+    path = str(tmp_path / "design.snap")
+    router.save_snapshot(path, nets)
+
+    restored, restored_nets = parse_input(path, mapped_dir=str(tmp_path) if mapped else None)
+    assert restored_nets == nets
+    assert restored.routes == router.routes
+    assert restored.net_ids == router.net_ids
+    assert list(restored.grid.cells) == list(router.grid.cells)
+    assert restored.header() == router.header()
+    assert (restored.total_cost, restored.total_wire_length, restored.longest_route_length, restored.total_vias) == \
+        (router.total_cost, router.total_wire_length, router.longest_route_length, router.total_vias)
+    assert route(restored, restored_nets, str(tmp_path / "again.txt")) == expected
+
+
+@pytest.mark.parametrize("tree", [False, True])
+def test_resumed_run_matches_an_uninterrupted_one(tmp_path, tree):
+    router, nets = parse_input(sample(7))
+    router.tree = tree
+    expected = route(router, nets, str(tmp_path / "out.txt"))
+
+    router, nets = parse_input(sample(7))
+    router.tree = tree
+    router.routes = {}
+    first = dict(list(nets.items())[:3])
+    route(router, first, str(tmp_path / "partial.txt"))
+    path = str(tmp_path / "design.snap")
+    router.save_snapshot(path, nets)
+
+    restored, restored_nets = parse_input(path)
+    assert restored.tree == tree
+    assert list(restored.routes) == list(first)
+    assert route(restored, restored_nets, str(tmp_path / "resumed.txt")) == expected
+
+
+def test_cells_start_on_a_page_and_bad_files_are_rejected(tmp_path):
+    router, nets = parse_input(sample(3))
+    path = str(tmp_path / "design.snap")
+    router.save_snapshot(path, nets)
+    metadata = snapshot.read_metadata(path)
+    assert metadata["cells_offset"] % snapshot.CELLS_ALIGNMENT == 0
+    assert os.path.getsize(path) == metadata["cells_offset"] + 4 * len(router.grid)
+
+    with open(path, 'rb') as f:
+        data = bytearray(f.read())
+    truncated = tmp_path / "truncated.snap"
+    truncated.write_bytes(data[:-4])
+    with pytest.raises(ValueError, match="truncated"):
+        parse_input(str(truncated))
+    data[8] += 1  # The version field after the magic
+    newer = tmp_path / "newer.snap"
+    newer.write_bytes(data)
+    with pytest.raises(ValueError, match="version 2 is not supported"):
+        parse_input(str(newer))
@@ -0,0 +1,74 @@
+import pytest
+
+from conftest import random_router, route_and_check, sample
+from negotiation import segment_cost
+from output_writer import expand_runs
+from Router import MazeRouter
+from routing_grid import FREE
+from tiled import TiledRouting
+
+
+@pytest.mark.parametrize("number", range(1, 9))
+@pytest.mark.parametrize("tree", [False, True])
+def test_sample_outputs_are_valid(tmp_path, number, tree):
+    routes = route_and_check(tmp_path, sample(number), tile_size=4, tree=tree)
+    assert any(branches is not None for branches in routes.values())
+
+
+def loaded_windows(routing):
+    """Record the number of cells of every window routing loads."""
+    sizes = []
+    load = routing.load
+
+    def recording_load(tiles):
+        window, x1, y1 = load(tiles)
+        sizes.append(len(window.grid))
+        return window, x1, y1
+    routing.load = recording_load
+    return sizes
+
+
+@pytest.mark.parametrize("tree", [False, True])
+def test_long_diagonal_net_is_routed_in_small_windows(tree):
+    router, _ = random_router(5, size=120)
+    router.tree = tree
+    pins = [(0, 1, 1), (1, 118, 117), (0, 60, 2)]
+    router.grid.set_cells([router.grid.index(*pin) for pin in pins], FREE)
+    routing = TiledRouting(router, 8, halo=2)
+    sizes = loaded_windows(routing)
+    routes = routing.route({"net": pins})
+    assert routing.legged_nets == 1
+    assert max(sizes) * 10 < len(router.grid)  # One window for the corridor would span the grid
+
+    branches = [expand_runs(start, runs) for start, runs in routes["net"]]
+    cells = {position for branch in branches for position in branch}
+    assert set(pins) <= cells
+    for branch in branches:
+        for (l1, x1, y1), (l2, x2, y2) in zip(branch, branch[1:]):
+            assert abs(l1 - l2) + abs(x1 - x2) + abs(y1 - y2) == 1
+    net_id = router.net_id("net")
+    assert {router.grid.coords(index) for index, code in enumerate(router.grid.cells) if code == net_id} == cells
+    if not tree:  # A chain is priced segment by segment, each from pin to pin
+        (path,) = branches
+        ends = [path.index(pin) for pin in pins]
+        assert router.total_cost == sum(segment_cost(path[a:b + 1], router.bend_penalty, router.via_penalty)
+                                        for a, b in zip(ends, ends[1:]))
+
+
+def test_failed_legs_free_every_cell_of_the_net():
+    router = MazeRouter(120, 120, 1, 3)
+    router.tree = True
+    pins = [(0, 1, 1), (0, 118, 118)]
+    for layer in (0, 1):
+        for x, y in ((117, 118), (118, 117), (119, 118), (118, 119)):
+            router.grid.block(layer, x, y)  # Walls the last pin in
+    router.grid.block(1, 118, 118)
+    router.reserve_pins({"net": pins})
+    routing = TiledRouting(router, 8, halo=2)
+    sizes = loaded_windows(routing)
+    assert routing.route({"net": pins}) == {"net": None}
+    assert len(sizes) > 2  # More than one window per attempt, so legs were routed and undone
+    net_id = router.net_id("net")
+    assert [index for index, code in enumerate(router.grid.cells) if code == net_id] == \
+        [router.grid.index(*pin) for pin in pins]  # Only the reserved pins
+    assert router.total_cost == 0
@@ -0,0 +1,37 @@
+from Router import MazeRouter
+from routing_grid import BLOCKED
+from tiled import TiledRouting
+
+from conftest import random_router
+
+
+def test_tree_joins_every_pin():
+    router, pairs = random_router(3)
+    pins = [position for pair in pairs[:2] for position in pair]
+    branches = router.route_tree(pins, "net")
+    assert branches is not None
+    cells = {position for branch in branches for position in branch}
+    assert set(pins) <= cells
+    assert all(branch[0] in cells for branch in branches)
+
+
+def test_first_pin_on_another_net_is_not_taken():
+    router = MazeRouter(6, 6, 1, 2)
+    router.grid.set_cells([router.grid.index(0, 0, 0)], 9)  # Wire of a net routed before
+    branches = router.route_tree([(0, 0, 0), (0, 5, 5)], "net")
+    assert branches is not None
+    assert router.grid.get(0, 0, 0) == 9
+
+
+def test_failed_tree_keeps_the_obstacle_under_its_pin():
+    router = MazeRouter(8, 8, 1, 2)
+    router.tree = True
+    router.grid.block(0, 0, 0)  # Under the first pin
+    for layer in (0, 1):
+        for x, y in ((5, 6), (7, 6), (6, 5), (6, 7)):
+            router.grid.block(layer, x, y)  # Walls the second pin in
+    router.grid.block(1, 6, 6)
+    routes = TiledRouting(router, 4, halo=2).route({"net": [(0, 0, 0), (0, 6, 6)]})
+    assert routes["net"] is None
+    assert router.grid.get(0, 0, 0) == BLOCKED
+    assert [router.grid.get(*position) for position in ((0, 0, 1), (0, 1, 0))] == [0, 0]
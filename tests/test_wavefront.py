@@ -0,0 +1,38 @@
+import pytest
+
+import wavefront
+from conftest import check_against_reference, random_router
+from Router import MazeRouter
+
+
+@pytest.fixture(autouse=True)
+def needs_numpy():
+    if wavefront.numpy is None:
+        pytest.skip("NumPy is not installed")
+
+
+def test_wavefront_matches_a_reference_dijkstra():
+    check_against_reference("wavefront", bend_penalty=0)
+
+
+def test_wavefront_runs_only_when_it_finds_the_same_cost():
+    router, _ = random_router(0, "wavefront", bend_penalty=0)
+    assert wavefront.supported(router)
+    assert not wavefront.supported(router, cell_cost=[0] * len(router.grid))
+    router.via_penalty = 2.5
+    assert not wavefront.supported(router)
+    router.via_penalty = 5
+    router.bend_penalty = 1
+    assert not wavefront.supported(router)
+
+
+def test_wavefront_grows_from_every_tree_cell(monkeypatch):
+    calls = []
+    monkeypatch.setattr(wavefront, "route", lambda *args, route=wavefront.route: calls.append(args) or route(*args))
+    router = MazeRouter(6, 6, 0, 5, "wavefront")
+    router.grid.block(0, 4, 3)
+    tree = [(0, 0, y) for y in range(6)]  # Partial tree of an earlier segment
+    path = router.bfs(tree, (0, 5, 3), 1)
+    assert calls
+    assert path[0] in tree and path[-1] == (0, 5, 3)
+    assert router.total_cost == 6  # From (0, 0, 2) or (0, 0, 4): five steps across the row beside the obstacle, one back
@@ -0,0 +1,24 @@
+import pytest
+
+from conftest import check_against_reference
+from Router import MazeRouter
+
+
+@pytest.mark.parametrize("search, window", [("dijkstra", 2), ("astar", 0), ("bidirectional", 1)])
+def test_windowed_search_finds_a_path_whenever_one_exists(search, window):
+    check_against_reference(search, window)
+
+
+def test_window_grows_around_a_wall():
+    # A wall across the pins' box leaves only a detour through row 6, outside a margin of 1
+    router = MazeRouter(8, 8, 1, 50)
+    router.window_margin = 1
+    router.explored = []
+    for y in range(6):
+        router.grid.block(0, 3, y)
+        router.grid.block(1, 3, y)
+    path = router.bfs((0, 1, 1), (0, 5, 1), 1)
+    assert path[0] == (0, 1, 1) and path[-1] == (0, 5, 1)
+    assert any(y == 6 for _, _, y in path)
+    assert router.windowed_searches == 1 and router.window_growths == 3  # Margins 1, 2, 4, then 8
+    assert router.explored == [(0, 0, 6, 2), (0, 0, 7, 3), (0, 0, 7, 5), (0, 0, 7, 7)]
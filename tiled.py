@@ -0,0 +1,441 @@
+from array import array
+from collections import deque
+import heapq
+import logging
+import mmap
+import sys
+import tempfile
+
+from negotiation import segment_cost
+from output_writer import compress_path
+from parallel import RecordingGrid
+from routing_grid import BLOCKED, FREE, RoutingGrid
+
+log = logging.getLogger("maze_router")
+
+DEFAULT_HALO = 16  # Cells loaded around a tile so nets near its border can route around obstacles
+MIN_FREE_SHARE = 0.02  # Floor of a tile's free share in the tile graph, so crowded tiles stay passable
+SPARSE_CORRIDOR = 4  # A corridor whose bounding box holds more tiles than this many times its own is routed in legs
+LEG_TILES = 6  # Corridor tiles per window of a leg
+LEG_STEP = 3  # Tiles from one leg's window to the next, so they share LEG_TILES - LEG_STEP tiles
+WAYPOINT_TRIES = 3  # Free cells of its last tile a leg may end on, nearest to the pin first
+
+
+class MappedGrid(RoutingGrid):
+    """RoutingGrid whose cells live in a memory-mapped file instead of memory.
+
+    Only the pages that are read or written get loaded, and the operating
+    system can drop clean ones again, so the grid can be larger than RAM.
+    temporary() maps a new sparse file (all FREE); from_snapshot() maps the
+    cells of a snapshot copy-on-write, so routing never changes the file.
+    """
+
+    def __init__(self, width, height, layers, file, offset=0, copy=False):
+        if sys.byteorder == 'big':
+            raise ValueError("memory-mapped grids are little-endian int32 and need a little-endian machine")
+        size = 4 * layers * width * height
+        self._file = file
+        self._map = mmap.mmap(file.fileno(), offset + size, access=mmap.ACCESS_COPY if copy else mmap.ACCESS_WRITE)
+        super().__init__(width, height, layers, memoryview(self._map)[offset:offset + size].cast('i'))
+
+    @classmethod
+    def temporary(cls, width, height, layers=2, directory=None):
+        """A FREE grid in an unnamed temporary file in directory; it is deleted when closed."""
+        file = tempfile.TemporaryFile(dir=directory)
+        file.truncate(4 * layers * width * height)  # Sparse: disk space is only used where cells are set
+        return cls(width, height, layers, file)
+
+    @classmethod
+    def from_snapshot(cls, path, metadata):
+        """The grid of a snapshot file (metadata from snapshot.read_metadata), mapped copy-on-write."""
+        return cls(metadata["width"], metadata["height"], metadata["layers"], open(path, 'rb'),
+                   metadata["cells_offset"], copy=True)
+
+    def row(self, layer, y):
+        start = layer * self.layer_size + y * self.width
+        row = array('i')
+        row.frombytes(self.cells[start:start + self.width].tobytes())
+        return row
+
+    def close(self):
+        self.cells.release()
+        self._map.close()
+        self._file.close()
+
+
+class TiledRouting:
+    """Routes the nets of a MazeRouter tile by tile instead of on the whole grid.
+
+    The grid is cut into tile_size x tile_size tiles. Nets with every pin
+    in one tile are routed together in a window router holding only that
+    tile plus halo cells around it. A net spanning several tiles first
+    gets a corridor on the tile graph: starting from its first pin's tile,
+    each further pin's tile is joined by the cheapest tile path (A*), where
+    entering a tile costs 1 / its free share. The net is then routed in a
+    window covering the corridor tiles plus halo, with every cell outside
+    them blocked. A window needs about 30 bytes per cell of its bounding
+    box, so a sparse corridor, such as the staircase of a long diagonal
+    net, is routed in legs of a few tiles instead (route_legs()). A net
+    that fails is ripped up again and retried once in its corridor grown by
+    a ring of tiles. Windows are read from the router's grid when they are
+    needed and their writes are copied back, so with a MappedGrid only the
+    tiles in use are in memory.
+    """
+
+    def __init__(self, router, tile_size, halo=DEFAULT_HALO):
+        self.router = router
+        self.tile_size = tile_size
+        self.halo = halo
+        self.columns = -(-router.grid.width // tile_size)
+        self.rows = -(-router.grid.height // tile_size)
+        self._fill = {}  # Tile -> share of its cells that are not FREE, computed on demand
+        self.tiles_loaded = 0
+        self.local_nets = 0  # Nets routed inside their tile
+        self.corridor_nets = 0  # Nets routed through a corridor of several tiles
+        self.corridor_tiles = 0
+        self.legged_nets = 0  # Nets routed in legs, see route_legs()
+        self.retried = 0
+
+    def tile_of(self, position):
+        _, x, y = position
+        return x // self.tile_size, y // self.tile_size
+
+    def tile_box(self, tile, margin=0):
+        """Cell box (x1, y1, x2, y2) of tile grown by margin cells, clipped to the grid."""
+        grid = self.router.grid
+        x, y = tile[0] * self.tile_size, tile[1] * self.tile_size
+        last = self.tile_size - 1 + margin
+        return max(x - margin, 0), max(y - margin, 0), min(x + last, grid.width - 1), min(y + last, grid.height - 1)
+
+    def fill(self, tile):
+        """Share of the cells of tile, over all layers, that are blocked or used by a net."""
+        if tile not in self._fill:
+            grid = self.router.grid
+            x1, y1, x2, y2 = self.tile_box(tile)
+            row = array('i')
+            for layer in range(grid.layers):
+                for y in range(y1, y2 + 1):
+                    start = grid.index(layer, x1, y)
+                    row.frombytes(grid.cells[start:start + x2 - x1 + 1].tobytes())
+            self._fill[tile] = 1 - row.count(FREE) / len(row)
+        return self._fill[tile]
+
+    def step_cost(self, tile, neighbor):
+        """Cost of moving from tile into the adjacent neighbor on the tile graph; at least 1."""
+        return 1 / max(1 - self.fill(neighbor), MIN_FREE_SHARE)
+
+    def tile_path(self, sources, target):
+        """Tiles of the cheapest tile-graph path from target back to the tile of sources it starts from."""
+        tx, ty = target
+        cost = {tile: 0 for tile in sources}
+        parent = {}
+        queue = [(abs(x - tx) + abs(y - ty), 0, (x, y)) for x, y in sources]  # Every step costs at least 1
+        heapq.heapify(queue)
+        while queue:
+            _, current_cost, tile = heapq.heappop(queue)
+            if tile == target:
+                break
+            if current_cost > cost[tile]:
+                continue
+            x, y = tile
+            for neighbor in ((x + 1, y), (x - 1, y), (x, y + 1), (x, y - 1)):
+                nx, ny = neighbor
+                if 0 <= nx < self.columns and 0 <= ny < self.rows:
+                    new_cost = current_cost + self.step_cost(tile, neighbor)
+                    if new_cost < cost.get(neighbor, float('inf')):
+                        cost[neighbor] = new_cost
+                        parent[neighbor] = tile
+                        heapq.heappush(queue, (new_cost + abs(nx - tx) + abs(ny - ty), new_cost, neighbor))
+        path = [target]
+        while target not in sources:
+            target = parent[target]
+            path.append(target)
+        return path
+
+    def corridor(self, pins):
+        """The set of tiles joining the tiles of pins, each added by tile_path() from those joined so far."""
+        tiles = {self.tile_of(pins[0])}
+        for pin in pins[1:]:
+            target = self.tile_of(pin)
+            if target not in tiles:
+                tiles.update(self.tile_path(tiles, target))
+        return tiles
+
+    def grow(self, tiles):
+        """tiles plus the ring of tiles around them."""
+        return {(x + dx, y + dy) for x, y in tiles for dx in (-1, 0, 1) for dy in (-1, 0, 1)
+                if 0 <= x + dx < self.columns and 0 <= y + dy < self.rows}
+
+    def load(self, tiles):
+        """A window router for tiles: their cells plus halo, everything else in their bounding box blocked.
+
+        Returns (window, x1, y1), the window's origin on the grid.
+        """
+        router = self.router
+        grid = router.grid
+        boxes = [self.tile_box(tile, self.halo) for tile in tiles]
+        x1 = min(box[0] for box in boxes)
+        y1 = min(box[1] for box in boxes)
+        width = max(box[2] for box in boxes) - x1 + 1
+        height = max(box[3] for box in boxes) - y1 + 1
+        window_grid = RecordingGrid(width, height, grid.layers)
+        window_grid.cells = array('i', [BLOCKED]) * len(window_grid)
+        cells = memoryview(window_grid.cells)
+        for bx1, by1, bx2, by2 in boxes:  # Overlapping halos are simply copied twice
+            length = bx2 - bx1 + 1
+            for layer in range(grid.layers):
+                for y in range(by1, by2 + 1):
+                    start = grid.index(layer, bx1, y)
+                    local = window_grid.index(layer, bx1 - x1, y - y1)
+                    cells[local:local + length] = grid.cells[start:start + length]
+        cells.release()
+        self.tiles_loaded += len(tiles)
+        window = type(router)(width, height, router.bend_penalty, router.via_penalty, router.search, router.frontier,
+                              grid.layers, router.preferred_directions, router.wrong_way_penalties, grid=window_grid)
+        window.net_ids = router.net_ids  # Shared, so the window writes the grid's net ids
+        window.tree = router.tree
+        return window, x1, y1
+
+    def route_in(self, window, x1, y1, net_name, pins):
+        """Route one net in a window; return its branches in grid coordinates, or None after ripping it up."""
+        grid = window.grid
+        first = len(grid.written)
+        cost = window.total_cost
+        local = [(layer, x - x1, y - y1) for layer, x, y in pins]
+        net_id = window.net_id(net_name)
+        held = {grid.index(*pin) for pin in local if grid.get(*pin) == net_id}  # Reserved pins stay held
+        result = (window.route_tree if window.tree else window.route_net)(local, net_name)
+        if result is None:
+            for indices, code in grid.written[first:]:
+                if code == net_id:  # Searches only claim FREE cells (RoutingGrid.claim), so these were FREE
+                    grid.set_cells([index for index in indices if index not in held], FREE)
+            window.total_cost = cost
+            return None
+        return [[(layer, x + x1, y + y1) for layer, x, y in branch] for branch in (result if window.tree else [result])]
+
+    def commit(self, window, x1, y1):
+        """Copy the writes and counters of a window back to the router."""
+        router = self.router
+        grid = router.grid
+        local_grid = window.grid
+        for indices, code in local_grid.written:
+            positions = [local_grid.coords(index) for index in indices]
+            grid.set_cells([grid.index(layer, x + x1, y + y1) for layer, x, y in positions], code)
+            for _, x, y in positions:
+                self._fill.pop(self.tile_of((0, x + x1, y + y1)), None)
+        router.total_cost += window.total_cost
+        router.nodes_expanded += window.nodes_expanded
+        router.stale_pops += window.stale_pops
+        router.states_reached += window.states_reached
+
+    def route_corridor(self, net_name, pins, tiles):
+        """Route one net inside the corridor tiles; return its branches in grid coordinates, or None.
+
+        A corridor whose bounding box holds more than SPARSE_CORRIDOR times
+        its own tiles is routed by route_legs(), any other in one window.
+        """
+        columns = {x for x, _ in tiles}
+        rows = {y for _, y in tiles}
+        if (max(columns) - min(columns) + 1) * (max(rows) - min(rows) + 1) > SPARSE_CORRIDOR * len(tiles):
+            branches = self.route_legs(net_name, pins, tiles)
+            self.legged_nets += branches is not None
+            return branches
+        window, x1, y1 = self.load(tiles)
+        branches = self.route_in(window, x1, y1, net_name, pins)
+        self.commit(window, x1, y1)
+        return branches
+
+    def corridor_path(self, tiles, sources, target):
+        """Fewest-tile path from one of the sources to target that stays on tiles, sources end first."""
+        parent = {tile: None for tile in sources}
+        queue = deque(sources)
+        while queue:
+            tile = queue.popleft()
+            if tile == target:
+                break
+            x, y = tile
+            for neighbor in ((x + 1, y), (x - 1, y), (x, y + 1), (x, y - 1)):
+                if neighbor in tiles and neighbor not in parent:
+                    parent[neighbor] = tile
+                    queue.append(neighbor)
+        path = [target]
+        while parent[path[-1]] is not None:
+            path.append(parent[path[-1]])
+        path.reverse()
+        return path
+
+    def waypoints(self, window, x1, y1, tile, pin):
+        """The WAYPOINT_TRIES free cells of tile in window nearest to pin, in grid coordinates.
+
+        A layer of difference counts as the via penalty.
+        """
+        grid = window.grid
+        bx1, by1, bx2, by2 = self.tile_box(tile)
+        layer, px, py = pin
+        via_penalty = self.router.via_penalty
+        free = [(cell_layer, x, y) for cell_layer in range(grid.layers) for y in range(by1, by2 + 1)
+                for x in range(bx1, bx2 + 1) if grid.get(cell_layer, x - x1, y - y1) == FREE]
+        return heapq.nsmallest(WAYPOINT_TRIES, free, key=lambda cell: abs(cell[1] - px) + abs(cell[2] - py) +
+                               abs(cell[0] - layer) * via_penalty)
+
+    def route_legs(self, net_name, pins, tiles):
+        """route_corridor() for a sparse corridor: each connection is routed in windows of a few tiles.
+
+        Connections are made as MazeRouter.route_net (pin to next pin) or
+        route_tree (nearest pin to the tree so far) make them. Each follows
+        the fewest-tile path through the corridor, cut into overlapping
+        windows of LEG_TILES tiles. A leg runs from the connection's wiring
+        inside its window to a free cell of the window's last tile near the
+        pin, and only the last leg to the pin itself. The next leg may start
+        anywhere on the previous one in the tiles they share, and the rest
+        of the previous leg is freed again. A window is committed before the
+        next one is loaded, so memory follows the leg, not the corridor's
+        bounding box. If a connection fails, every cell the net claimed is
+        freed.
+        """
+        router = self.router
+        grid = router.grid
+        net_id = router.net_id(net_name)
+        held = {grid.index(*pin) for pin in pins if grid.get(*pin) == net_id}  # Reserved pins stay held
+        claimed = set()  # Grid indices the net took, freed again if it fails
+
+        def free(indices):
+            grid.set_cells([index for index in indices if index not in held], FREE)
+            claimed.difference_update(indices)
+            for index in indices:
+                self._fill.pop(self.tile_of(grid.coords(index)), None)
+
+        def connect(sources, pin):
+            """Route from any of the cells of sources to pin; return the path or None."""
+            source_tiles = sorted({self.tile_of(cell) for cell in sources} & tiles)
+            path = self.corridor_path(tiles, source_tiles, self.tile_of(pin))
+            branch = []
+            first = 0
+            while True:
+                chunk = path[first:first + LEG_TILES]
+                last = first + LEG_TILES >= len(path)
+                window, x1, y1 = self.load(chunk)
+                width, height = window.grid.width, window.grid.height
+                starts = [(layer, x - x1, y - y1) for layer, x, y in dict.fromkeys(sources + branch)
+                          if 0 <= x - x1 < width and 0 <= y - y1 < height]
+                leg = None
+                for target in [pin] if last else self.waypoints(window, x1, y1, chunk[-1], pin):
+                    leg = window.bfs(starts, (target[0], target[1] - x1, target[2] - y1), net_id)
+                    if leg is not None:
+                        break
+                window.total_cost = 0  # Priced per connection once its legs are cut, see below
+                self.commit(window, x1, y1)
+                if leg is None:
+                    return None
+                leg = [(layer, x + x1, y + y1) for layer, x, y in leg]
+                claimed.update(grid.index(*cell) for cell in leg[1:])
+                if leg[0] in branch:  # Branches off the previous leg, whose rest is dropped
+                    cut = branch.index(leg[0])
+                    free([grid.index(*cell) for cell in branch[cut + 1:]])
+                    branch = branch[:cut] + leg
+                else:  # Starts on sources again
+                    free([grid.index(*cell) for cell in branch[1:]])
+                    branch = leg
+                if last:
+                    return branch
+                first += LEG_STEP
+
+        connections = []
+        result = None
+        if router.tree:
+            claimed.update(grid.claim([grid.index(*pins[0])], net_id))
+            via_penalty = router.via_penalty
+
+            def distance(pin, branch):
+                layer, x, y = pin
+                return min(abs(x - bx) + abs(y - by) + abs(layer - bl) * via_penalty for bl, bx, by in branch)
+
+            tree = [pins[0]]
+            on_tree = {pins[0]}
+            remaining = {pin: distance(pin, tree) for pin in pins[1:] if pin not in on_tree}
+            while remaining:
+                pin = min(remaining, key=remaining.get)
+                del remaining[pin]
+                if pin in on_tree:  # An earlier branch already runs through it
+                    continue
+                branch = connect(tree, pin)
+                if branch is None:
+                    break
+                connections.append(branch)
+                tree.extend(branch[1:])
+                on_tree.update(branch)
+                for other in remaining:
+                    remaining[other] = min(remaining[other], distance(other, branch))
+            else:
+                result = connections or [[pins[0]]]
+        else:
+            for start, end in zip(pins, pins[1:]):
+                segment = connect([start], end)
+                if segment is None:
+                    break
+                connections.append(segment)
+            else:
+                path = [pins[0]]
+                for segment in connections:
+                    path.extend(segment[1:])
+                result = [path]
+        if result is None:
+            free(list(claimed))
+            return None
+        router.total_cost += sum(segment_cost(connection, router.bend_penalty, router.via_penalty, router.move_costs)
+                                 for connection in connections)
+        return result
+
+    def route(self, nets):
+        """Route {net name: pins}; return {net name: [(start, runs) per branch] or None}.
+
+        Branches are stored as output_writer.compress_path() runs to keep
+        the routes of a large design small until they are written.
+        """
+        routes = {}
+        by_tile = {}
+        spanning = []
+        for net_name, pins in nets.items():
+            tiles = {self.tile_of(pin) for pin in pins}
+            if len(tiles) == 1:
+                by_tile.setdefault(tiles.pop(), []).append((net_name, pins))
+            else:
+                spanning.append(net_name)
+
+        def record(net_name, branches):
+            self.router.record_route(branches)
+            routes[net_name] = [(branch[0], compress_path(branch)) for branch in branches]
+
+        for tile in sorted(by_tile, key=lambda tile: (tile[1], tile[0])):  # Row by row
+            window, x1, y1 = self.load([tile])
+            for net_name, pins in by_tile[tile]:
+                branches = self.route_in(window, x1, y1, net_name, pins)
+                if branches is None:
+                    spanning.append(net_name)  # Retried in a wider corridor below
+                else:
+                    self.local_nets += 1
+                    record(net_name, branches)
+            self.commit(window, x1, y1)
+
+        order = {net_name: position for position, net_name in enumerate(nets)}
+        for net_name in sorted(spanning, key=order.get):
+            pins = nets[net_name]
+            tiles = self.corridor(pins)
+            if len(tiles) == 1:  # Failed inside its own tile
+                tiles = self.grow(tiles)
+            for attempt in range(2):
+                branches = self.route_corridor(net_name, pins, tiles)
+                if branches is not None or attempt:
+                    break
+                self.retried += 1
+                tiles = self.grow(tiles)
+            routes[net_name] = None
+            if branches is not None:
+                self.corridor_nets += 1
+                self.corridor_tiles += len(tiles)
+                record(net_name, branches)
+        log.info("Tiled routing: %dx%d tiles of %d cells, %d loaded, %d nets inside one tile, "
+                 "%d through corridors (%.1f tiles on average, %d routed in legs), %d retried in a wider corridor",
+                 self.columns, self.rows, self.tile_size, self.tiles_loaded, self.local_nets, self.corridor_nets,
+                 self.corridor_tiles / max(self.corridor_nets, 1), self.legged_nets, self.retried)
+        return routes
@@ -1,58 +1,101 @@
 import matplotlib.pyplot as plt
 import matplotlib.patches as patches
 
+from output_writer import BINARY_MAGIC, expand_runs, parse_runs, read_binary
+from routing_grid import RoutingGrid
+
 
 class MazeRouter:
-    def __init__(self, width, height, bend_penalty, via_penalty):
+    def __init__(self, width, height, bend_penalty, via_penalty, layers=2):
         self.width = width
         self.height = height
         self.bend_penalty = bend_penalty
         self.via_penalty = via_penalty
-        self.obstacles = []
+        self.layers = layers
+        self.grid = RoutingGrid(width, height, layers)  # Same occupancy grid the router uses
 
     def add_obstacle(self, layer, x, y):
-        self.obstacles.append((layer, x, y))
+        self.grid.block(layer, x, y)
+
+    def add_obstacle_rect(self, layer, x1, y1, x2, y2):
+        self.grid.block_rect(layer, x1, y1, x2, y2)
+
+
+def parse_binary_file(input_file):
+    """
+    Reads a binary output file of Router.py --format binary.
+
+    Returns the same as parse_input_file(); a failed net has one empty branch.
+    """
+    header, rects, binary_nets, _ = read_binary(input_file)
+    grid_info = header.split(', ')
+    layers = int(grid_info[4]) if len(grid_info) > 4 else 2
+    router = MazeRouter(*map(int, grid_info[:4]), layers)
+    for rect in rects:
+        router.add_obstacle_rect(*rect)
+    nets = {net_name: [expand_runs(start, runs) for start, runs in branches] if branches else [[]]
+            for net_name, branches in binary_nets.items()}
+    return router, nets
 
 
 def parse_input_file(input_file):
     """
     Parses the input file to extract grid dimensions, obstacles, and nets.
 
+    Paths may be listed cell by cell or, as written by Router.py --format
+    runs, as a start cell followed by runs such as x+4, y-2 or v+1.
+    Binary output files (--format binary) are recognized and read too.
+
     Args:
         input_file: Path to the input file.
 
     Returns:
-        Tuple containing a MazeRouter instance and a dictionary of nets.
+        Tuple containing a MazeRouter instance and a dictionary mapping each
+        net to its list of branches (one path for a chained net).
     """
     nets = {}
     router = None
 
     try:
+        with open(input_file, 'rb') as f:
+            if f.read(len(BINARY_MAGIC)) == BINARY_MAGIC:
+                return parse_binary_file(input_file)
+
         with open(input_file, 'r') as f:
             grid_info = f.readline().strip()
             grid_info = grid_info.split(', ')
             grid_width, grid_height = map(int, grid_info[:2])
-            bend_penalty, via_penalty = map(int, grid_info[2:])
+            bend_penalty, via_penalty = map(int, grid_info[2:4])
+            layers = int(grid_info[4]) if len(grid_info) > 4 else 2  # Optional layer stack fields follow
 
-            router = MazeRouter(grid_width, grid_height, bend_penalty, via_penalty)
+            router = MazeRouter(grid_width, grid_height, bend_penalty, via_penalty, layers)
 
             for line in f:
                 line = line.strip()
                 if not line:
                     continue
-                if line.startswith('OBS'):
+                if line.startswith('OBSRECT'):
+                    parts = line.split('(')[1].split(')')[0].split(',')
+                    layer, x1, y1, x2, y2 = map(int, parts)
+                    router.add_obstacle_rect(layer, x1, y1, x2, y2)
+                elif line.startswith('OBS'):
                     parts = line.split('(')[1].split(')')[0].split(',')
                     layer, x, y = map(int, parts)
                     router.add_obstacle(layer, x, y)
                 elif line.startswith('net'):
-                    parts = line.split('(')
-                    net_name = parts[0].strip()
-                    pins = []
-                    for part in parts[1:]:
-                        part = part.split(')')[0]
-                        layer, x, y = map(int, part.split(','))
-                        pins.append((layer, x, y))
-                    nets[net_name] = pins
+                    net_name = line.split('(')[0].strip()
+                    branches = []  # A tree-routed net (Router.py --tree) has "|" between its branches
+                    for branch in line.split('|'):
+                        pins = []
+                        runs = ''
+                        for part in branch.split('(')[1:]:
+                            part, _, runs = part.partition(')')
+                            layer, x, y = map(int, part.split(','))
+                            pins.append((layer, x, y))
+                        if runs.split():  # Run-length path: start cell, then straight runs
+                            pins = expand_runs(pins[0], parse_runs(runs.split()))
+                        branches.append(pins)
+                    nets[net_name] = branches
 
         return router, nets
 
@@ -114,7 +157,7 @@ def visualize_routed_nets(input_file):
 
     grid_width = router.width
     grid_height = router.height
-    obstacles = router.obstacles
+    grid = router.grid
 
     # Set up the plot
     fig, ax = plt.subplots(figsize=(12, 12))
@@ -130,6 +173,8 @@ def visualize_routed_nets(input_file):
 
     # Define layer-specific patterns/colors
     net_color = {0: 'blue', 1: 'yellow'}
+    for layer in range(2, router.layers):  # Further layers of a deeper stack
+        net_color[layer] = ('green', 'orange', 'purple', 'cyan')[layer % 4]
     via_color = 'red'
     obstacle_color_layer1 = 'black'  # Color for layer 1 obstacles
     obstacle_color_layer2 = 'brown'  # Color for layer 2 obstacles
@@ -137,17 +182,18 @@ def visualize_routed_nets(input_file):
     # Set wire thickness to match obstacle size
     wire_thickness = 12  # Same thickness as obstacles
 
-    # Draw obstacles with layer-specific colors
-    for layer, x, y in obstacles:
+    # Draw obstacles with layer-specific colors, one patch per blocked rectangle
+    for layer, x1, y1, x2, y2 in grid.blocked_rects():
         if layer == 0:
-            ax.add_patch(patches.Rectangle((x, y), 1, 1, color=obstacle_color_layer1))
+            ax.add_patch(patches.Rectangle((x1, y1), x2 - x1 + 1, y2 - y1 + 1, color=obstacle_color_layer1))
         elif layer == 1:
-            ax.add_patch(patches.Rectangle((x, y), 1, 1, color=obstacle_color_layer2))
+            ax.add_patch(patches.Rectangle((x1, y1), x2 - x1 + 1, y2 - y1 + 1, color=obstacle_color_layer2))
 
     # Draw each net
-    for net_name, path in nets.items():
-        if path:  # Check if path is valid
-            draw_routed_net(ax, path, net_color, via_color, wire_thickness)
+    for net_name, branches in nets.items():
+        for path in branches:
+            if path:  # Check if path is valid
+                draw_routed_net(ax, path, net_color, via_color, wire_thickness)
 
     # Add legend
     legend_patches = [
@@ -0,0 +1,161 @@
+try:
+    import numpy
+except ImportError:  # The wavefront engine needs NumPy, MazeRouter.bfs is used without it
+    numpy = None
+
+from routing_grid import FREE
+
+
+def supported(router, cell_cost=None):
+    """True if route() finds the same cost as router.bfs for this router.
+
+    Every step has to cost exactly 1 (no bend or wrong-way penalty), the via
+    penalty has to be a non-negative integer and there must be no per-cell
+    costs.
+    """
+    return (numpy is not None and cell_cost is None and router.bend_penalty == 0 and
+            all(cost == 1 for cost in router.move_costs) and
+            isinstance(router.via_penalty, int) and router.via_penalty >= 0)
+
+
+def route(router, start, end, net_id):
+    """Lee wavefront search vectorized with NumPy; same contract as MazeRouter.bfs.
+
+    Wave k holds every cell at distance k. The next wave is built from the
+    whole current wave at once: neighbour indices are computed as arrays,
+    masked by the grid occupancy and the distance map, and deduplicated.
+    Via arrivals are queued for wave k + via_penalty. Work per wave is
+    proportional to the wave, not to the grid. The path is traced back from
+    end through the distance map, preferring to keep going straight.
+    """
+    grid = router.grid
+    cells = numpy.frombuffer(grid.cells, dtype=numpy.int32)
+    width = grid.width
+    height = grid.height
+    layer_size = grid.layer_size
+    layers = grid.layers
+    via_penalty = router.via_penalty
+    if router._wave_distance is None or len(router._wave_distance) != len(cells):
+        router._wave_distance = numpy.full(len(cells), -1, dtype=numpy.int32)
+    distance = router._wave_distance
+
+    sources = numpy.unique([grid.index(*source) for source in (start if isinstance(start, list) else [start])])
+    end_index = grid.index(*end)
+    distance[sources] = 0
+    reached = [sources]  # Reset to -1 afterwards
+    pending = {}  # wave -> via arrivals
+    wave = sources
+    k = 0
+
+    def accept(candidates, k):
+        """Free, unreached candidates as the new part of wave k."""
+        candidates = candidates[(cells[candidates] == FREE) & (distance[candidates] < 0)]
+        candidates = numpy.unique(candidates)
+        distance[candidates] = k
+        reached.append(candidates)
+        return candidates
+
+    def via_targets(wave):
+        layer = wave // layer_size
+        return numpy.concatenate((wave[layer < layers - 1] + layer_size, wave[layer > 0] - layer_size))
+
+    try:
+        while distance[end_index] < 0:
+            if via_penalty == 0:  # Free vias: the wave spreads through the whole stack first
+                added = wave
+                while added.size:
+                    added = accept(via_targets(added), k)
+                    wave = numpy.concatenate((wave, added))
+            elif wave.size:
+                pending.setdefault(k + via_penalty, []).append(via_targets(wave))
+            if wave.size:
+                x = wave % width
+                y = wave % layer_size // width
+                candidates = [wave[x < width - 1] + 1, wave[x > 0] - 1,
+                              wave[y < height - 1] + width, wave[y > 0] - width]
+            elif pending:
+                k = min(pending) - 1  # Nothing left in the plane, jump to the next via arrivals
+                candidates = []
+            else:
+                return None  # No path found
+            k += 1
+            candidates.extend(pending.pop(k, ()))
+            wave = accept(numpy.concatenate(candidates), k) if candidates else sources[:0]
+
+        cost = int(distance[end_index])
+        path = _trace_back(grid, distance, end_index, set(sources.tolist()), via_penalty)
+        path.reverse()
+        grid.claim(path, net_id)  # Claim the segment so later searches avoid it
+        router.total_cost += cost
+        return [grid.coords(index) for index in path]
+    finally:
+        expanded = sum(part.size for part in reached)
+        router.nodes_expanded += expanded
+        router.states_reached += expanded
+        if router.explored is not None:
+            ys, xs = numpy.divmod(numpy.concatenate(reached) % layer_size, width)
+            router.explored.append((int(xs.min()), int(ys.min()), int(xs.max()), int(ys.max())))
+        for part in reached:
+            distance[part] = -1
+
+
+def _trace_back(grid, distance, end_index, sources, via_penalty):
+    """Cell indices from end_index back to a source, each step to a neighbour one wave earlier."""
+    width = grid.width
+    layer_size = grid.layer_size
+    path = [end_index]
+    current = end_index
+    step = None  # Index offset of the last planar step, tried first to avoid bends
+    while current not in sources:
+        d = int(distance[current])
+        layer, cell = divmod(current, layer_size)
+        y, x = divmod(cell, width)
+        moves = []
+        if x > 0:
+            moves.append(-1)
+        if x < width - 1:
+            moves.append(1)
+        if y > 0:
+            moves.append(-width)
+        if y < grid.height - 1:
+            moves.append(width)
+        if step in moves:
+            moves.remove(step)
+            moves.insert(0, step)
+        offset = None
+        if d > 0:
+            offset = next((move for move in moves if distance[current + move] == d - 1), None)
+        if offset is not None:
+            current += offset
+            step = offset
+            path.append(current)
+        elif via_penalty:  # Arrived by a via from a cell via_penalty waves earlier
+            for via in (-layer_size, layer_size):
+                if 0 <= layer + via // layer_size < grid.layers and distance[current + via] == d - via_penalty >= 0:
+                    current += via
+                    path.append(current)
+                    break
+            else:
+                raise AssertionError("distance map has no predecessor")  # Cannot happen for a reached cell
+        else:
+            # Free vias: follow the column up or down to a source or a cell with a planar predecessor
+            path.extend(_free_via_run(grid, distance, current, d, moves, sources))
+            current = path[-1]
+    return path
+
+
+def _free_via_run(grid, distance, current, d, moves, sources):
+    """Cells above or below current, all at distance d, ending at one the trace can continue from."""
+    layer_size = grid.layer_size
+    layer = current // layer_size
+    for via in (-1, 1):
+        run = []
+        neighbor = current
+        for _ in range(layer + via, grid.layers if via > 0 else -1, via):
+            neighbor += via * layer_size
+            if distance[neighbor] != d:
+                break
+            run.append(neighbor)
+            if neighbor in sources or (d > 0 and any(distance[neighbor + move] == d - 1 for move in moves)):
+                return run
+    raise AssertionError("distance map has no predecessor")  # Cannot happen for a reached cell